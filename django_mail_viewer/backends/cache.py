@@ -2,14 +2,35 @@
 Backend for test environment.
 """
 
+import bisect
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from hashlib import sha1
 from os import getpid
-from time import monotonic, sleep
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from django.core import cache
 from django.core.mail.backends.base import BaseEmailBackend
 
 from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .utils import (
+    OutboxQuery,
+    date_index_insert,
+    date_index_range,
+    date_index_remove,
+    header_addresses,
+    message_addresses,
+    message_recipients,
+    message_summary,
+    message_thread_ids,
+    parse_date_header,
+    resolve_thread_id,
+)
 
 
 class EmailBackend(BaseEmailBackend):
@@ -21,74 +42,412 @@ class EmailBackend(BaseEmailBackend):
     when sending an email from a python shell.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, mailbox: Optional[str] = None, cache_alias: Optional[str] = None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.cache = cache.caches[mailviewer_settings.MAILVIEWER_CACHE]
+        self.cache_alias = cache_alias or mailviewer_settings.MAILVIEWER_CACHE
+        self.cache = cache.caches[self.cache_alias]
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
         # a cache entry with a list of the rest of the cache keys
         # This is for get_outbox() so that the system knows which cache keys are there
         # to retrieve them. Django does not have a built in way to get the keys
         # which exist in the cache.
-        self.cache_keys_key = "message_keys"
-        self.cache_keys_lock_key = "message_keys_lock"
+        # Every other key for a mailbox starts with its cache_keys_key, and each mailbox has its own lock, so that
+        # mailboxes never read or wait on each other's entries.
+        self.cache_keys_key = f"message_keys:{self.mailbox}" if self.mailbox else "message_keys"
+        self.cache_keys_lock_key = f"message_keys_lock:{self.mailbox}" if self.mailbox else "message_keys_lock"
+        # Messages and the index entries for them expire together, see MAILVIEWER_CACHE_TIMEOUT
+        self.timeout = mailviewer_settings.MAILVIEWER_CACHE_TIMEOUT
 
     def send_messages(self, messages):
         msg_count = 0
         for message in messages:
             m = message.message()
-            message_id = m.get("message-id")
-            self.cache.set(message_id, m)
-
-            # Use a lock key and spinlock
-            # to avoid clobbering the value stored in the list of keys
-            # if multiple processes are updating this at the same time.
-            is_stored = False
-            loop_count = 0
-            max_loop_count = 100
-            while not is_stored:
-                loop_count += 1
-                if loop_count > max_loop_count:
-                    break
-                with self.cache_lock(self.cache_keys_lock_key, getpid()) as acquired:
-                    if acquired:
-                        current_cache_keys = self.cache.get(self.cache_keys_key)
-                        if not current_cache_keys:
-                            current_cache_keys = []
-                        current_cache_keys.append(message_id)
-                        self.cache.set(self.cache_keys_key, current_cache_keys)
-                        msg_count += 1
-                        is_stored = True
-                    else:
-                        sleep(0.01)
+            mailbox = message_mailbox(m, self.mailbox)
+            backend = self if mailbox == self.mailbox else self._for_mailbox(mailbox)
+            if backend._store_message(m, message_summary(m, message_addresses(message))):
+                msg_count += 1
         return msg_count
 
+    def _for_mailbox(self, mailbox: str) -> "EmailBackend":
+        """
+        Return a backend for another mailbox in the same cache.
+        """
+        return type(self)(mailbox=mailbox, cache_alias=self.cache_alias, fail_silently=self.fail_silently)
+
+    def _store_message(self, m, summary: Dict[str, Any]) -> bool:
+        """
+        Store an email.message.Message, with its summary from utils.message_summary(), in this backend's mailbox.
+
+        Returns whether it was added to the index.
+        """
+        message_id = summary["message_id"]
+        self.cache.set_many({self.message_key(message_id): m, self.summary_key(message_id): summary}, self.timeout)
+
+        def add_to_index():
+            current_cache_keys = self.cache.get(self.cache_keys_key)
+            if not current_cache_keys:
+                current_cache_keys = []
+            current_cache_keys.append(message_id)
+            updates = {self.cache_keys_key: current_cache_keys}
+            address_keys = self._address_keys(summary)
+            current_index = self.cache.get_many(address_keys + [self.date_index_key])
+            for key in address_keys:
+                updates[key] = current_index.get(key, []) + [message_id]
+            date_index = current_index.get(self.date_index_key, [])
+            date_index_insert(date_index, summary)
+            updates[self.date_index_key] = date_index
+            self._add_to_thread(summary, message_thread_ids(m), updates)
+            self.cache.set_many(updates, self.timeout)
+
+        return self._update_index(add_to_index)
+
+    def _update_index(self, update) -> bool:
+        """
+        Call update() while holding the lock on the index entries so that multiple processes updating them at the
+        same time do not clobber each other's changes.
+
+        Returns whether the lock was acquired and update() was called.
+        """
+        # Use a lock key and spinlock
+        # to avoid clobbering the value stored in the list of keys
+        # if multiple processes are updating this at the same time.
+        loop_count = 0
+        max_loop_count = 100
+        while loop_count < max_loop_count:
+            loop_count += 1
+            with self.cache_lock(self.cache_keys_lock_key, getpid()) as acquired:
+                if acquired:
+                    update()
+                    return True
+            sleep(0.01)
+        return False
+
+    def _add_to_thread(self, summary: Dict[str, Any], candidates: List[str], updates: Dict[str, Any]):
+        """
+        Add the message with the given summary to its thread, adding the changed cache entries to `updates`.
+
+        Must be called while holding the index lock.
+        """
+        found = self.cache.get_many(
+            [self.summary_key(c) for c in candidates] + [self.thread_key(c) for c in candidates]
+        )
+
+        def lookup_thread(candidate):
+            candidate_summary = found.get(self.summary_key(candidate))
+            if candidate_summary and candidate_summary.get("thread_id"):
+                return candidate_summary["thread_id"]
+            return candidate if self.thread_key(candidate) in found else None
+
+        thread_id, merged = resolve_thread_id(candidates, lookup_thread)
+        thread = self.cache.get(self.thread_key(thread_id), [])
+        if merged:
+            merged_threads = self.cache.get_many([self.thread_key(t) for t in merged])
+            merged_entries = [entry for entries in merged_threads.values() for entry in entries]
+            merged_summaries = self.cache.get_many([self.summary_key(entry[1]) for entry in merged_entries])
+            for key, merged_summary in merged_summaries.items():
+                merged_summary["thread_id"] = thread_id
+                updates[key] = merged_summary
+            for entry in merged_entries:
+                date_index_insert(thread, {"date": entry[0], "message_id": entry[1]})
+            self.cache.delete_many(list(merged_threads))
+        date_index_insert(thread, summary)
+        summary["thread_id"] = thread_id
+        updates[self.summary_key(summary["message_id"])] = summary
+        updates[self.thread_key(thread_id)] = thread
+
+    @property
+    def generation_key(self) -> str:
+        """
+        Cache key for a number which changes whenever a message is deleted, invalidating the process local LRU.
+        """
+        return f"{self.cache_keys_key}:generation"
+
+    def message_key(self, message_id: str) -> str:
+        """
+        Cache key for a message.
+        """
+        # The default mailbox uses the Message-ID alone, as it did before there were mailboxes
+        return f"{self.cache_keys_key}:message:{message_id}" if self.mailbox else message_id
+
+    def summary_key(self, message_id: str) -> str:
+        """
+        Cache key for the summary of a message which is used to keep the index entries up to date.
+        """
+        return f"{self.cache_keys_key}:summary:{message_id}"
+
+    def recipient_key(self, address: str) -> str:
+        """
+        Cache key for the list of ids of the messages sent to an email address.
+        """
+        # Hashed because email addresses may contain characters which are not allowed in keys for some caches
+        return f"{self.cache_keys_key}:recipient:{sha1(address.encode()).hexdigest()}"
+
+    @property
+    def date_index_key(self) -> str:
+        """
+        Cache key for the list of (timestamp, Message-ID) of every message, sorted by when it was sent.
+        """
+        return f"{self.cache_keys_key}:dates"
+
+    def thread_key(self, thread_id: str) -> str:
+        """
+        Cache key for the list of (timestamp, Message-ID) of the messages in a thread, sorted by when they were sent.
+        """
+        return f"{self.cache_keys_key}:thread:{sha1(thread_id.encode()).hexdigest()}"
+
+    def sender_key(self, address: str) -> str:
+        """
+        Cache key for the list of ids of the messages sent from an email address.
+        """
+        return f"{self.cache_keys_key}:sender:{sha1(address.encode()).hexdigest()}"
+
+    def _address_keys(self, summary: Dict[str, Any]) -> List[str]:
+        """
+        The keys of the address index entries a message with the given summary is in.
+        """
+        return [self.recipient_key(address) for address in message_recipients(summary["addresses"])] + [
+            self.sender_key(address) for address in summary["addresses"]["from"]
+        ]
+
     def get_message(self, lookup_id):
         """
         Look up and return a specific message in the outbox
         """
-        return self.cache.get(lookup_id)
+        if _get_message_lru() is None:
+            return self.cache.get(self.message_key(lookup_id))
+        # A stale or mistyped id is not worth writing to the index for, so only lists of messages prune it
+        found = self._get_messages([lookup_id], prune=False)
+        return found[0] if found else None
 
     def get_outbox(self, *args, **kwargs):
         """
-        Get the outbox used by this backend.  This backend returns a copy of mail.outbox.
+        Get the outbox used by this backend.  This backend returns the messages still in the cache, in the order
+        they were stored.
         May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments.
         """
         # grabs all of the keys in the stored self.cache_keys_key
         # and passes those into get_many() to retrieve the keys
-        message_keys = self.cache.get(self.cache_keys_key)
-        if message_keys:
-            messages = list(self.cache.get_many(message_keys).values())
+        if kwargs:
+            message_keys, index_keys = self._query_message_keys(OutboxQuery(**kwargs))
         else:
-            messages = []
-        return messages
+            message_keys, index_keys = self.cache.get(self.cache_keys_key), []
+        return self._get_messages(message_keys or [], index_keys)
+
+    def _get_messages(self, message_ids: List[str], index_keys: Sequence[str] = (), prune: bool = True) -> list:
+        """
+        Get the messages with the given ids which are in the cache, in the same order.
+
+        Unless `prune` is False, the ids of messages which are no longer in the cache are removed from the index,
+        including from the `index_keys` entries which they were read from.
+        """
+        if not message_ids:
+            return []
+        lru = _get_message_lru()
+        if lru is None:
+            keys = [self.message_key(message_id) for message_id in message_ids]
+            found = self.cache.get_many(keys)
+            if prune and len(found) < len(keys):
+                self._prune_missing([i for i, key in zip(message_ids, keys) if key not in found], index_keys)
+            return [found[key] for key in keys if key in found]
+
+        # Messages never change once stored, so a copy in the LRU is good until the mailbox's generation changes
+        # when a message is deleted from it by any process.
+        generation = self.cache.get(self.generation_key, 0)
+        lru_keys = {
+            message_id: (self.cache_alias, self.cache_keys_key, generation, message_id) for message_id in message_ids
+        }
+        messages = {message_id: lru.get(lru_key) for message_id, lru_key in lru_keys.items()}
+        missing = [self.message_key(message_id) for message_id, message in messages.items() if message is None]
+        if missing:
+            found = self.cache.get_many(missing)
+            for message_id in message_ids:
+                message = found.get(self.message_key(message_id))
+                if message is not None:
+                    messages[message_id] = message
+                    lru.set(lru_keys[message_id], message, _message_size(message))
+            missing_ids = [message_id for message_id in message_ids if messages.get(message_id) is None]
+            if prune and missing_ids:
+                self._prune_missing(missing_ids, index_keys)
+        return [messages[message_id] for message_id in message_ids if messages.get(message_id) is not None]
+
+    def _prune_missing(self, message_ids: List[str], index_keys: Sequence[str] = ()):
+        """
+        Remove the ids of messages which are no longer in the cache, such as after being evicted or expiring, from
+        the list of messages, the date index, and the `index_keys` entries.
+
+        Skipped when another process holds the index lock rather than making the read wait. The ids are found again
+        by a later read or removed by compact_index().
+        """
+        missing = set(message_ids)
+        with self.cache_lock(self.cache_keys_lock_key, getpid()) as acquired:
+            if not acquired:
+                return
+            keys = list(dict.fromkeys([self.cache_keys_key, self.date_index_key, *index_keys]))
+            updates = {}
+            for key, entries in self.cache.get_many(keys).items():
+                # Lists of ids, or of (timestamp, id) for the date and thread indexes
+                kept = [e for e in entries if (e[1] if isinstance(e, tuple) else e) not in missing]
+                if len(kept) != len(entries):
+                    updates[key] = kept
+            self.cache.set_many(updates, self.timeout)
+        self.cache.delete_many([self.summary_key(message_id) for message_id in message_ids])
+
+    def compact_index(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Rebuild the index from the messages which are still in the cache, removing the ids of any which have been
+        evicted or have expired. Reads the messages `batch_size` at a time.
+
+        The address and thread entries of the removed messages are rewritten, or deleted when none of their messages
+        are left. A message whose summary was evicted without it has its summary rebuilt from its headers, which do
+        not have its Bcc addresses.
+
+        Returns a dict with the number of `messages` left in the index and the number `removed` from it.
+        """
+        result = {}
+
+        def compact():
+            message_ids = self.cache.get(self.cache_keys_key) or []
+            kept = []
+            summaries = {}
+            # Messages whose summaries are missing, and the index entries the removed messages were in
+            unsummarized = {}
+            stale_keys = set()
+            for i in range(0, len(message_ids), batch_size):
+                batch = message_ids[i : i + batch_size]
+                found = self.cache.get_many(
+                    [self.message_key(message_id) for message_id in batch]
+                    + [self.summary_key(message_id) for message_id in batch]
+                )
+                for message_id in batch:
+                    summary = found.get(self.summary_key(message_id))
+                    if self.message_key(message_id) in found:
+                        kept.append(message_id)
+                        summaries[message_id] = summary
+                        if summary is None:
+                            unsummarized[message_id] = found[self.message_key(message_id)]
+                    elif summary is not None:
+                        stale_keys.update(self._address_keys(summary))
+                        if summary.get("thread_id"):
+                            stale_keys.add(self.thread_key(summary["thread_id"]))
+
+            updates: Dict[str, Any] = {self.cache_keys_key: kept}
+            thread_ids = {
+                summary["thread_id"] for summary in summaries.values() if summary and summary.get("thread_id")
+            }
+            for message_id, m in unsummarized.items():
+                summary = message_summary(m, header_addresses(m))
+                summary["thread_id"], _ = resolve_thread_id(
+                    message_thread_ids(m),
+                    lambda candidate: (summaries.get(candidate) or {}).get("thread_id")
+                    or (candidate if candidate in thread_ids else None),
+                )
+                thread_ids.add(summary["thread_id"])
+                summaries[message_id] = updates[self.summary_key(message_id)] = summary
+
+            date_index: List[Tuple[float, str]] = []
+            for message_id in kept:
+                summary = summaries[message_id]
+                for key in self._address_keys(summary):
+                    updates.setdefault(key, []).append(message_id)
+                date_index_insert(date_index, summary)
+                if summary.get("thread_id"):
+                    date_index_insert(updates.setdefault(self.thread_key(summary["thread_id"]), []), summary)
+            updates[self.date_index_key] = date_index
+            self.cache.set_many(updates, self.timeout)
+            removed = set(message_ids).difference(kept)
+            self.cache.delete_many(
+                [self.summary_key(message_id) for message_id in removed] + sorted(stale_keys.difference(updates))
+            )
+            result.update(messages=len(kept), removed=len(removed))
+
+        if not self._update_index(compact):
+            raise RuntimeError("Could not lock the index to compact it.")
+        return result
+
+    def _query_message_keys(self, query: OutboxQuery) -> Tuple[List[str], List[str]]:
+        """
+        Return the keys of the messages matching an OutboxQuery, in order, and the keys of the index entries used.
+        """
+        # Intersect the address and date index entries, or start from every message, and then check the summaries
+        # of those messages for the rest of the filters so that full messages are only fetched when they match.
+        index_keys = []
+        if query.recipient:
+            index_keys.append(self.recipient_key(query.recipient))
+        if query.sender:
+            index_keys.append(self.sender_key(query.sender))
+        if query.uses_dates:
+            index_keys.append(self.date_index_key)
+        if index_keys:
+            found = self.cache.get_many(index_keys)
+            candidates = [found.get(key, []) for key in index_keys]
+            if query.uses_dates:
+                # Last so that the intersection keeps the messages in date order for the ordering
+                candidates[-1] = date_index_range(candidates[-1], query.since, query.until)
+            message_keys = candidates.pop()
+            for keys in candidates:
+                matching = set(keys)
+                message_keys = [k for k in message_keys if k in matching]
+        else:
+            message_keys = self.cache.get(self.cache_keys_key) or []
+
+        if query.uses_summaries:
+            summaries = self.cache.get_many([self.summary_key(k) for k in message_keys])
+            message_keys = [
+                k
+                for k in message_keys
+                if self.summary_key(k) in summaries and query.matches(summaries[self.summary_key(k)])
+            ]
+        return query.order_and_limit(message_keys), index_keys
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        summary = self.cache.get(self.summary_key(message_id)) or {}
+        # A Message-ID which is not stored may still be the id of the thread its replies are in
+        thread_id = summary.get("thread_id") or message_id
+        thread_key = self.thread_key(thread_id)
+        return self._get_messages([i for _, i in self.cache.get(thread_key, [])], [thread_key])
 
     def delete_message(self, message_id: str):
         """
         Remove the message with the given id from the mailbox
         """
-        message_keys = self.cache.get(self.cache_keys_key, [])
-        message_keys.remove(message_id)
-        self.cache.set(self.cache_keys_key, message_keys)
-        self.cache.delete(message_id)
+        summary = self.cache.get(self.summary_key(message_id)) or {}
+
+        def remove_from_index():
+            message_keys = self.cache.get(self.cache_keys_key, [])
+            if message_id in message_keys:
+                message_keys.remove(message_id)
+            updates = {self.cache_keys_key: message_keys}
+            address_keys = self._address_keys(summary) if summary else []
+            for key, ids in self.cache.get_many(address_keys).items():
+                updates[key] = [i for i in ids if i != message_id]
+            if summary:
+                date_index = self.cache.get(self.date_index_key, [])
+                date_index_remove(date_index, summary)
+                updates[self.date_index_key] = date_index
+            # Read again now that the lock is held since the thread may have been merged into another
+            thread_id = (self.cache.get(self.summary_key(message_id)) or {}).get("thread_id")
+            if thread_id:
+                thread = self.cache.get(self.thread_key(thread_id), [])
+                date_index_remove(thread, summary)
+                if thread:
+                    updates[self.thread_key(thread_id)] = thread
+                else:
+                    self.cache.delete(self.thread_key(thread_id))
+            self.cache.set_many(updates, self.timeout)
+
+        self._update_index(remove_from_index)
+        self.cache.delete_many([self.message_key(message_id), self.summary_key(message_id)])
+        # Invalidate the copies of this mailbox's messages in the LRU of every process
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.add(self.generation_key, 1, None)
 
     DEFAULT_LOCK_EXPIRE = 60 * 3  # Lock expires in 3 minutes
 
@@ -117,3 +476,253 @@ class EmailBackend(BaseEmailBackend):
                 # to lessen the chance of releasing an expired lock
                 # owned by someone else.
                 self.cache.delete(lock_id)
+
+
+class _MessageLRU:
+    """
+    Process local least recently used cache of messages, bounded by the number of messages and their total size.
+    """
+
+    def __init__(self, max_messages: int, max_bytes: int):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_messages or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+
+_message_lru: Optional[_MessageLRU] = None
+_message_lru_lock = Lock()
+
+
+def _get_message_lru() -> Optional[_MessageLRU]:
+    """
+    Get the LRU shared by every cache backend in this process, or None when MAILVIEWER_CACHE_LRU_MAX_MESSAGES is 0.
+    """
+    global _message_lru
+    max_messages = mailviewer_settings.MAILVIEWER_CACHE_LRU_MAX_MESSAGES
+    max_bytes = mailviewer_settings.MAILVIEWER_CACHE_LRU_MAX_BYTES
+    if not max_messages or not max_bytes:
+        return None
+    with _message_lru_lock:
+        if _message_lru is None or (_message_lru.max_messages, _message_lru.max_bytes) != (max_messages, max_bytes):
+            _message_lru = _MessageLRU(max_messages, max_bytes)
+        return _message_lru
+
+
+def _message_size(message) -> int:
+    """
+    Estimate the memory used by an email.message.Message from its headers and payloads without serializing it.
+    """
+    size = 0
+    for part in message.walk():
+        size += sum(len(name) + len(str(value)) for name, value in part.items())
+        payload = part.get_payload()
+        if isinstance(payload, (str, bytes)):
+            size += len(payload)
+    return size
+
+
+class _HashRing:
+    """
+    Consistent hashing of keys to cache aliases, so that adding or removing an alias only moves the keys of about
+    one alias's share of the ring instead of nearly all of them.
+    """
+
+    def __init__(self, aliases: Sequence[str], replicas: int = 100):
+        # Each alias gets `replicas` points on the ring to spread keys evenly between aliases
+        self.points = sorted((self._hash(f"{alias}:{i}"), alias) for alias in aliases for i in range(replicas))
+        self.hashes = [point for point, _ in self.points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(sha1(value.encode()).hexdigest()[:16], 16)
+
+    def get(self, key: str) -> str:
+        """
+        Return the alias a key belongs to, the first point on the ring at or after the key's hash.
+        """
+        i = bisect.bisect(self.hashes, self._hash(key)) % len(self.points)
+        return self.points[i][1]
+
+
+_fan_out_executor: Optional[ThreadPoolExecutor] = None
+_fan_out_executor_lock = Lock()
+
+
+def _get_fan_out_executor() -> ThreadPoolExecutor:
+    """
+    Get the thread pool shared by all ShardedEmailBackend instances for reading from every shard at once.
+    """
+    global _fan_out_executor
+    with _fan_out_executor_lock:
+        if _fan_out_executor is None:
+            _fan_out_executor = ThreadPoolExecutor(thread_name_prefix="mailviewer-cache-shard")
+        return _fan_out_executor
+
+
+def _message_timestamp(message) -> float:
+    """
+    When a message was sent, falling back to now as utils.message_summary() does for email without a valid Date.
+    """
+    date = parse_date_header(message.get("date"))
+    return date.timestamp() if date is not None else time()
+
+
+_stored_at_lock = Lock()
+_last_stored_at = 0.0
+
+
+def _stored_at() -> float:
+    """
+    The time now for ShardedEmailBackend to order the outbox by, always later than the last one in this process since
+    time() often returns the same value for email sent one after another.
+    """
+    global _last_stored_at
+    with _stored_at_lock:
+        _last_stored_at = max(time(), _last_stored_at + 1e-6)
+        return _last_stored_at
+
+
+class ShardedEmailBackend(BaseEmailBackend):
+    """
+    An email backend which spreads the email stored by the cache backend across the caches listed in
+    `settings.MAILVIEWER_CACHE_SHARDS`, so that storage can grow with the number of cache servers.
+
+    Each email is stored, along with its entries in the index, on the cache chosen by consistent hashing of the first
+    Message-ID in its References header, or else its In-Reply-To or Message-ID, so that a thread stays on one cache.
+    Each cache keeps the index of only the email stored on it, updated under its own lock. Reads are sent to every
+    cache at once and the results merged.
+    """
+
+    def __init__(self, *args, mailbox: Optional[str] = None, cache_aliases: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
+        self.cache_aliases = list(cache_aliases or mailviewer_settings.MAILVIEWER_CACHE_SHARDS)
+        if not self.cache_aliases:
+            raise ValueError("ShardedEmailBackend requires at least one cache alias.")
+        self.ring = _HashRing(self.cache_aliases)
+
+    def _shard(self, alias: str, mailbox: Optional[str] = None) -> EmailBackend:
+        return EmailBackend(
+            mailbox=self.mailbox if mailbox is None else mailbox, cache_alias=alias, fail_silently=self.fail_silently
+        )
+
+    def _fan_out(self, call: Callable[[EmailBackend], Any]) -> list:
+        """
+        Call `call` with the backend for each shard in parallel and return the results in the order of the shards.
+        """
+        if len(self.cache_aliases) == 1:
+            return [call(self._shard(self.cache_aliases[0]))]
+        # The shard backends are created in the worker threads since Django's cache connections are per thread
+        return list(_get_fan_out_executor().map(lambda alias: call(self._shard(alias)), self.cache_aliases))
+
+    def send_messages(self, messages):
+        msg_count = 0
+        for message in messages:
+            m = message.message()
+            mailbox = message_mailbox(m, self.mailbox)
+            thread_ids = message_thread_ids(m)
+            shard = self._shard(self.ring.get(thread_ids[0] if thread_ids else ""), mailbox)
+            summary = message_summary(m, message_addresses(message))
+            # Each shard only knows the order of its own email, so this orders the outbox across the shards
+            summary["stored_at"] = _stored_at()
+            if shard._store_message(m, summary):
+                msg_count += 1
+        return msg_count
+
+    def get_message(self, lookup_id):
+        """
+        Look up and return a specific message in the outbox
+        """
+        return next((m for m in self._fan_out(lambda shard: shard.get_message(lookup_id)) if m is not None), None)
+
+    def get_outbox(self, *args, **kwargs):
+        """
+        Get the outbox used by this backend, merged from every shard in the order the email was stored, or by the
+        time each message was sent when there is an ordering.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments, which each shard applies
+        to its own index.
+        """
+        query = OutboxQuery(**kwargs)
+        outboxes = self._fan_out(lambda shard: self._stored_outbox(shard, kwargs))
+        if query.ordering:
+            # By the same dates the shards' date indexes use, so that email without a valid Date header is ordered
+            # as it would be in a single cache
+            stored = sorted((entry for outbox in outboxes for entry in outbox), key=lambda entry: entry[:2])
+            return query.order_and_limit([m for _, _, m in stored])
+        # Each shard's outbox is in the order it stored its email, so merging them by when each was stored keeps
+        # the email in the order it was sent to this backend
+        return query.order_and_limit([m for _, _, m in heapq.merge(*outboxes, key=lambda entry: entry[1])])
+
+    @staticmethod
+    def _stored_outbox(shard: EmailBackend, kwargs: Dict[str, Any]) -> List[Tuple[float, float, Any]]:
+        """
+        Get a shard's outbox as a list of (time sent, time stored, message), reading the summaries the times are kept
+        in.
+        """
+        outbox = shard.get_outbox(**kwargs)
+        message_ids = [m.get("message-id") for m in outbox]
+        summaries = shard.cache.get_many([shard.summary_key(message_id) for message_id in message_ids])
+        stored = []
+        for message_id, m in zip(message_ids, outbox):
+            summary = summaries.get(shard.summary_key(message_id)) or {}
+            date = summary["date"] if "date" in summary else _message_timestamp(m)
+            # Email stored before the time was kept, or whose summary was evicted, falls back to when it was sent
+            stored.append((date, summary.get("stored_at", date), m))
+        return stored
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first.
+
+        A reply may be stored on a different shard than the email it replies to when they do not share the start
+        of the thread in their References, so this also looks up the threads of the Message-IDs the messages found
+        refer to until no more are found.
+        """
+        found: Dict[str, Any] = {}
+        seen = set()
+        pending = {message_id}
+        while pending:
+            seen |= pending
+            lookup_ids = sorted(pending)
+            for thread in self._fan_out(lambda shard: [m for i in lookup_ids for m in shard.get_thread(i)]):
+                for m in thread:
+                    found.setdefault(m.get("message-id"), m)
+            pending = {i for m in found.values() for i in message_thread_ids(m)} - seen
+        return sorted(found.values(), key=_message_timestamp)
+
+    def delete_message(self, message_id: str):
+        """
+        Remove the message with the given id from the mailbox
+        """
+        self._fan_out(lambda shard: shard.delete_message(message_id))
+
+    def compact_index(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Compact the index of every shard, see EmailBackend.compact_index().
+        """
+        results = self._fan_out(lambda shard: shard.compact_index(batch_size))
+        return {key: sum(result[key] for result in results) for key in ("messages", "removed")}
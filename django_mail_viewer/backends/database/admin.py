@@ -4,7 +4,7 @@ from .models import EmailMessage
 
 
 class EmailMessageAdmin(admin.ModelAdmin):
-    list_display = ("pk", "parent", "message_id", "created_at", "updated_at")
+    list_display = ("pk", "parent", "message_id", "sent_at", "created_at", "updated_at")
     search_fields = ("pk", "message_id", "message_headers")
     readonly_fields = ("created_at", "updated_at")
 
@@ -1,12 +1,37 @@
-import json
-from io import BytesIO
+import binascii
+import datetime
+import hashlib
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from django.apps import apps
-from django.core.files.base import ContentFile
+from django.conf import settings as django_settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.base import File
 from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connections, models, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.utils import timezone
 
 from ... import settings as mailviewer_settings
+from ...mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from ..utils import (
+    RECIPIENT_FIELDS,
+    OutboxQuery,
+    is_attachment,
+    message_addresses,
+    message_thread_ids,
+    parse_date_header,
+    resolve_thread_id,
+)
+
+if TYPE_CHECKING:
+    from .models import AbstractBaseEmailAddress, AbstractBaseEmailMessage
 
 
 class EmailBackend(BaseEmailBackend):
@@ -17,110 +42,232 @@ class EmailBackend(BaseEmailBackend):
     using Django Channels or when sending an email from a python shell or for longer term storage and lookup.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, mailbox: Optional[str] = None, **kwargs):
         self._backend_model = apps.get_model(mailviewer_settings.MAILVIEWER_DATABASE_BACKEND_MODEL)
+        # The model indexing the addresses of each message, found by the `addresses` relation from the message model.
+        # A custom message model without one does not get its addresses indexed.
+        try:
+            self._address_model = self._backend_model._meta.get_field("addresses").related_model
+        except FieldDoesNotExist:
+            self._address_model = None
+        # The database alias all reads and writes go through. See MAILVIEWER_DATABASE_ALIAS.
+        self.using = mailviewer_settings.MAILVIEWER_DATABASE_ALIAS
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
         super().__init__(*args, **kwargs)
 
-    def _parse_email_attachment(self, message, decode_file=True):
-        """
-        Parse an attachment out of an email.message.Message object.
-
-        params:
-        msg: email.message.Message object
-        decode_file: Boolean whether to decode the base64 encoded file to an actual file or not
-        """
-        # copied from views.SingleEmailMixin._parse_email_attachment()
-        # TODO: deduplicate this. I think it maybe could live on BaseEmailBackend safely
-        content_disposition = message.get("Content-Disposition", None)
-        if content_disposition:
-            dispositions = content_disposition.strip().split(";")
-            if bool(content_disposition and dispositions[0].lower() == "attachment"):
-                if decode_file:
-                    file_data = message.get_payload(decode=True)
-                    attachment = BytesIO(file_data)
-                    attachment.size = len(file_data)
-
-                    attachment.content_type = message.get_content_type()
-                    attachment.name = None
-                    attachment.create_date = None
-                    attachment.mod_date = None
-                    attachment.read_date = None
-                else:
-                    attachment = None
-                for param in dispositions[1:]:
-                    name, value = param.split("=")
-                    name = name.lower()
-
-                    # Since I am terrible and left terrible comments I am assuming the
-                    # datetime TODO comments below mean to store as a datetime.datetime object
-                    if name == "filename":
-                        attachment.name = value
-                    elif name == "create-date":
-                        attachment.create_date = value  # TODO: datetime
-                    elif name == "modification-date":
-                        attachment.mod_date = value  # TODO: datetime
-                    elif name == "read-date":
-                        attachment.read_date = value  # TODO: datetime
-                return {
-                    "filename": Path(message.get_filename()).name,
-                    "content_type": message.get_content_type(),
-                    "file": attachment,
-                }
-        return None
+    def _main_messages(self, mailbox: Optional[str] = None) -> "models.QuerySet[AbstractBaseEmailMessage]":
+        """
+        Return a QuerySet of the main messages, not their parts, in this backend's mailbox or `mailbox`.
+        """
+        return self._backend_model.objects.using(self.using).filter(
+            parent=None, mailbox=self.mailbox if mailbox is None else mailbox
+        )
 
     def send_messages(self, messages):
         msg_count = 0
+        pending = []
         for m in messages:
             # Create db model instances
             message = m.message()
-            if message.is_multipart():
-                # TODO: Should this really be done recursively? I believe forwarded emails may
-                # have multiple layers of parts/dispositions
-                message_id = message.get("message-id")
-                main_message = None
-                for i, part in enumerate(message.walk()):
-                    content_type = part.get_content_type()
-                    charset = part.get_param("charset")
-                    # handle attachments - probably need to look at SingleEmailMixin._parse_email_attachment()
-                    # and make that more reusable
-                    content_disposition = part.get("Content-Disposition", None)
-                    if content_disposition:
-                        # attachment_data = part.get_payload(decode=True)
-                        attachment_data = self._parse_email_attachment(part)
-                        file_attachment = ContentFile(
-                            attachment_data.get("file").read(), name=attachment_data.get("filename", "attachment")
-                        )
-                        content = ""
-                    elif content_type in ["text/plain", "text/html"]:
-                        content = part.get_payload(decode=True).decode(charset, errors="replace")
-                        file_attachment = ""
-                    else:
-                        # the main multipart/alternative message for multipart messages has no content/payload
-                        # TODO: handle file attachments
-                        content = ""
-                        file_attachment = ""
-                    message_id = part.get("message-id", "")  # do sub-parts have a message-id?
-                    p = self._backend_model(
-                        message_id=message_id,
-                        content=content,
-                        file_attachment=file_attachment,
-                        parent=main_message,
-                        message_headers=json.dumps(dict(part.items())),
-                    )
-                    p.save()
-                    if i == 0:
-                        main_message = p
-            else:
-                message_id = message.get("message-id")
-                main_message = self._backend_model(
+            built = self._build_message(message, message_addresses(m))
+            built.message.mailbox = message_mailbox(message, self.mailbox)
+            pending.append(built)
+            msg_count += 1
+
+        batch = self._get_on_commit_batch()
+        if batch is not None:
+            batch.add(pending)
+        else:
+            self._write_messages(pending)
+        return msg_count
+
+    def _get_on_commit_batch(self) -> "Optional[_OnCommitBatch]":
+        """
+        Return the batch which messages should be added to so that they are written when the current transaction on
+        MAILVIEWER_DATABASE_ON_COMMIT_ALIAS commits, or None if messages should be written immediately.
+        """
+        alias = mailviewer_settings.MAILVIEWER_DATABASE_ON_COMMIT_ALIAS
+        if not alias:
+            return None
+        if not transaction.get_connection(alias).in_atomic_block:
+            return None
+
+        # Only weakly referenced here, so that the batch is gone once Django discards its on_commit() callback
+        # because the savepoint it was started in was rolled back
+        batches = getattr(_on_commit_batches, "batches", None)
+        if batches is None:
+            batches = _on_commit_batches.batches = weakref.WeakValueDictionary()
+        batch = batches.get(alias)
+        if batch is None or batch.flushed:
+            batch = batches[alias] = _OnCommitBatch(self, alias)
+            transaction.on_commit(batch.flush, using=alias, robust=self.fail_silently)
+        return batch
+
+    def _decode_attachment_to_file(self, part) -> "Tuple[File, int, str]":
+        """
+        Decode an attachment's payload into a temporary file a chunk at a time rather than all at once in memory.
+
+        Returns a tuple of a File for the temporary file, the decoded size in bytes, and the sha256 hex digest of
+        the decoded data. The File should be closed once it has been saved.
+        """
+        # Not a context manager since the returned File keeps it open, so it is closed here only if decoding fails
+        temp_file = tempfile.TemporaryFile()  # noqa: SIM115
+        size = 0
+        sha256 = hashlib.sha256()
+        try:
+            for chunk in _iter_decoded_payload(part):
+                temp_file.write(chunk)
+                sha256.update(chunk)
+                size += len(chunk)
+            temp_file.seek(0)
+        except BaseException:
+            temp_file.close()
+            raise
+        filename = Path(part.get_filename() or "attachment").name
+        return File(temp_file, name=filename), size, sha256.hexdigest()
+
+    def _build_message(self, message, addresses: Dict[str, List[str]]) -> "_BuiltMessage":
+        """
+        Build unsaved instances of the backend model for an email.message.Message and its parts, and of the address
+        model for `addresses`, as returned by utils.message_addresses().
+        """
+        parts = []
+        if message.is_multipart():
+            # TODO: Should this really be done recursively? I believe forwarded emails may
+            # have multiple layers of parts/dispositions
+            message_id = message.get("message-id")
+            main_message = None
+            for i, part in enumerate(message.walk()):
+                content_type = part.get_content_type()
+                charset = part.get_param("charset")
+                file_size = None
+                file_sha256 = ""
+                if is_attachment(part):
+                    file_attachment, file_size, file_sha256 = self._decode_attachment_to_file(part)
+                    content = ""
+                elif content_type in ["text/plain", "text/html"]:
+                    content = part.get_payload(decode=True).decode(charset, errors="replace")
+                    file_attachment = ""
+                else:
+                    # the main multipart/alternative message for multipart messages has no content/payload
+                    # TODO: handle file attachments
+                    content = ""
+                    file_attachment = ""
+                message_id = part.get("message-id", "")  # do sub-parts have a message-id?
+                p = self._backend_model(
                     message_id=message_id,
-                    content=message.get_payload(),
-                    message_headers=json.dumps(dict(message.items())),
+                    content=content,
+                    file_attachment=file_attachment,
+                    file_size=file_size,
+                    file_sha256=file_sha256,
+                    message_headers=_message_headers(part),
                 )
-                main_message.save()
+                if i == 0:
+                    main_message = p
+                else:
+                    parts.append(p)
+        else:
+            message_id = message.get("message-id")
+            main_message = self._backend_model(
+                message_id=message_id,
+                content=message.get_payload(),
+                message_headers=_message_headers(message),
+            )
 
-            msg_count += 1
-        return msg_count
+        # Email without a valid Date header is treated as sent when it was captured
+        main_message.sent_at = parse_date_header(message.get("date")) or timezone.now()
+        if not django_settings.USE_TZ:
+            main_message.sent_at = timezone.make_naive(main_message.sent_at)
+
+        address_instances = []
+        if self._address_model is not None:
+            address_instances = [
+                self._address_model(field=field, address=address)
+                for field, field_addresses in addresses.items()
+                for address in field_addresses
+            ]
+        return _BuiltMessage(main_message, parts, address_instances)
+
+    def _write_messages(self, messages: "List[_BuiltMessage]"):
+        """
+        Save messages built by _build_message() using one bulk insert each for the main messages, their parts, and
+        their addresses.
+        """
+        if not messages:
+            return
+        manager = self._backend_model.objects.using(self.using)
+        # All in one transaction so that a partially saved multipart message is never left behind.
+        with transaction.atomic(using=self.using):
+            self._assign_thread_ids([built.message for built in messages])
+            if connections[self.using].features.can_return_rows_from_bulk_insert:
+                manager.bulk_create([built.message for built in messages])
+            else:
+                # The parts need the main message's primary key, which bulk_create() cannot get on this database.
+                for built in messages:
+                    built.message.save(using=self.using)
+            all_parts = []
+            all_addresses = []
+            for built in messages:
+                for part in built.parts:
+                    part.parent = built.message
+                    all_parts.append(part)
+                for address in built.addresses:
+                    address.message = built.message
+                    all_addresses.append(address)
+            # Saving replaces the FieldFile on the instances, so hold on to them to close the temporary files after
+            attachments = [part.file_attachment for part in all_parts if part.file_attachment]
+            try:
+                if all_parts:
+                    manager.bulk_create(all_parts)
+            finally:
+                for attachment in attachments:
+                    attachment.close()
+            if all_addresses:
+                self._address_model.objects.using(self.using).bulk_create(all_addresses)
+
+    def _assign_thread_ids(self, messages: "List[AbstractBaseEmailMessage]"):
+        """
+        Set the thread_id of unsaved main messages from the stored messages they are related to, moving any threads
+        which they join together into one thread.
+        """
+        by_mailbox: "Dict[str, List[AbstractBaseEmailMessage]]" = {}
+        for message in messages:
+            by_mailbox.setdefault(message.mailbox, []).append(message)
+        for mailbox, mailbox_messages in by_mailbox.items():
+            self._assign_mailbox_thread_ids(mailbox, mailbox_messages)
+
+    def _assign_mailbox_thread_ids(self, mailbox: str, messages: "List[AbstractBaseEmailMessage]"):
+        """
+        Set the thread_id of unsaved main messages in one mailbox, see _assign_thread_ids().
+        """
+        candidates = [message_thread_ids(message.message_headers) for message in messages]
+        all_candidates = {c for message_candidates in candidates for c in message_candidates}
+        if not all_candidates:
+            return
+        main_messages = self._main_messages(mailbox)
+        # Message-ID -> thread id of the stored messages and those in this batch, with one query for all of them
+        thread_of = dict(
+            main_messages.filter(Q(message_id__in=all_candidates) | Q(thread_id__in=all_candidates))
+            .exclude(thread_id="")
+            .values_list("message_id", "thread_id")
+        )
+        thread_ids = set(thread_of.values())
+        for message, message_candidates in zip(messages, candidates):
+            thread_id, merged = resolve_thread_id(
+                message_candidates,
+                lambda candidate: thread_of.get(candidate) or (candidate if candidate in thread_ids else None),
+            )
+            if merged:
+                main_messages.filter(thread_id__in=merged).update(thread_id=thread_id)
+                for other in messages:
+                    if other.thread_id in merged:
+                        other.thread_id = thread_id
+                thread_of = {k: thread_id if v in merged else v for k, v in thread_of.items()}
+                thread_ids.difference_update(merged)
+            message.thread_id = thread_id
+            if message.message_id:
+                thread_of[message.message_id] = thread_id
+            thread_ids.add(thread_id)
 
     def get_message(self, lookup_id):
         """
@@ -131,17 +278,255 @@ class EmailBackend(BaseEmailBackend):
         # or should there be a layer in between or some sort of adapter pattern to make the db based email message
         # look/act like an email.message.Message? I lean towards just moving logic to the EmailBackend but may need
         # some combo of the two for the views/templates to work nicely.
-        return self._backend_model.objects.filter(message_id=lookup_id, parent=None).first()
+        return self._main_messages().filter(message_id=lookup_id).first()
 
-    def get_outbox(self, *args, **kwargs):
+    def get_outbox(self, *args, with_content: bool = False, **kwargs):
         """
-        Get the outbox used by this backend.  This backend returns a copy of mail.outbox.
+        Get the outbox used by this backend.  This backend returns a QuerySet of the main message of each email.
         May add pagination args/kwargs.
+
+        The message body in the `content` field is deferred since listing email only needs the headers, and it may be
+        large. Pass `with_content=True` to load it along with the rest of the message when the bodies will be used,
+        rather than running a query per message to load them later.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments, which are all applied in
+        the database. For example `headers={"X-Campaign": "welcome"}` only includes messages whose headers have
+        exactly those values and `recipient` only messages sent To, Cc, or Bcc that email address.
+        """
+        query = OutboxQuery(**kwargs)
+        outbox = self._main_messages()
+        if query.subject:
+            outbox = outbox.filter(message_headers__subject__icontains=query.subject)
+        if query.headers:
+            if connections[self.using].features.supports_json_field_contains:
+                # Containment can use an index over the whole field, such as a GIN index on PostgreSQL
+                outbox = outbox.filter(message_headers__contains=query.headers)
+            else:
+                outbox = outbox.filter(**{f"message_headers__{name}": value for name, value in query.headers.items()})
+        if query.sender:
+            outbox = outbox.filter(pk__in=self._addressed_to(query.sender, ("from",)))
+        if query.recipient:
+            outbox = outbox.filter(pk__in=self._addressed_to(query.recipient, RECIPIENT_FIELDS))
+        if query.since is not None:
+            outbox = outbox.filter(sent_at__gte=query.since)
+        if query.until is not None:
+            outbox = outbox.filter(sent_at__lt=query.until)
+        if query.has_attachments is not None:
+            attachments = self._backend_model.objects.filter(parent=OuterRef("pk")).exclude(file_attachment="")
+            outbox = outbox.filter(Exists(attachments) if query.has_attachments else ~Exists(attachments))
+        if query.ordering:
+            direction = "-" if query.ordering.startswith("-") else ""
+            outbox = outbox.order_by(f"{direction}sent_at", f"{direction}pk")
+        if not with_content:
+            outbox = outbox.defer("content")
+        if query.limit is not None:
+            outbox = outbox[: query.limit]
+        return outbox
+
+    def get_thread(self, message_id: str, with_content: bool = False):
+        """
+        Get the main messages in the same thread as the message with the given id, oldest first, as found from
+        their Message-ID, In-Reply-To, and References headers.
         """
-        return self._backend_model.objects.filter(parent=None)
+        thread_id = self._main_messages().filter(message_id=message_id).exclude(thread_id="").values("thread_id")[:1]
+        thread = self._main_messages().filter(thread_id=Subquery(thread_id)).order_by("sent_at", "pk")
+        if not with_content:
+            thread = thread.defer("content")
+        return thread
 
     def delete_message(self, message_id: str):
         """
         Remove the message with the given id from the mailbox
         """
-        self._backend_model.objects.filter(message_id=message_id).delete()
+        ids = list(self._main_messages().filter(message_id=message_id).values_list("pk", flat=True))
+        for filename in self._delete_messages_by_pk(ids):
+            self._attachment_storage.delete(filename)
+
+    def prune_messages(
+        self,
+        older_than: Optional[datetime.timedelta] = None,
+        keep: Optional[int] = None,
+        batch_size: int = 1000,
+        file_delete_workers: int = 4,
+    ) -> Dict[str, Any]:
+        """
+        Delete messages in this backend's mailbox which were stored more than `older_than` ago or which are not among
+        the `keep` most recently stored messages, along with their attachment files.
+
+        Messages are deleted `batch_size` at a time, each batch in its own short transaction, so that pruning
+        a large table does not hold locks for long. Attachment files are deleted from storage by
+        `file_delete_workers` threads while the following batches are deleted.
+
+        Returns a dict with the number of `messages` and `files` deleted and the `seconds` it took.
+        """
+        if older_than is None and keep is None:
+            raise ValueError("At least one of older_than or keep is required.")
+
+        start = monotonic()
+        main_messages = self._main_messages()
+        criteria = Q()
+        if older_than is not None:
+            criteria |= Q(created_at__lt=timezone.now() - older_than)
+        if keep is not None:
+            # Everything at or below the first primary key past the newest `keep` messages gets pruned.
+            # Working out the cutoff once keeps later batches from eating into the kept messages as mail comes in.
+            cutoff = main_messages.order_by("-pk").values_list("pk", flat=True)[keep : keep + 1].first()
+            if cutoff is not None:
+                criteria |= Q(pk__lte=cutoff)
+            elif older_than is None:
+                criteria = Q(pk__in=[])
+        to_prune = main_messages.filter(criteria).order_by("pk").values_list("pk", flat=True)
+
+        message_count = 0
+        futures = []
+        with ThreadPoolExecutor(max_workers=file_delete_workers) as executor:
+            while True:
+                ids = list(to_prune[:batch_size])
+                if not ids:
+                    break
+                filenames = self._delete_messages_by_pk(ids)
+                futures.extend(executor.submit(self._attachment_storage.delete, name) for name in filenames)
+                message_count += len(ids)
+        # Raise any errors from deleting files
+        for future in futures:
+            future.result()
+        return {"messages": message_count, "files": len(futures), "seconds": monotonic() - start}
+
+    def _addressed_to(self, address: str, fields):
+        """
+        Return a QuerySet of the primary keys of the messages with `address` in any of the address `fields`.
+        """
+        address = address.strip().lower()
+        if self._address_model is None:
+            # Without the index fall back to the headers, which is slower and misses Bcc
+            filters = Q()
+            for field in fields:
+                filters |= Q(**{f"message_headers__{field}__icontains": address})
+            return self._main_messages().filter(filters).values("pk")
+        return (
+            self._address_model.objects.using(self.using).filter(address=address, field__in=fields).values("message_id")
+        )
+
+    @property
+    def _attachment_storage(self):
+        return self._backend_model._meta.get_field("file_attachment").storage
+
+    def _delete_messages_by_pk(self, ids: List[int]) -> List[str]:
+        """
+        Delete the main messages with the given primary keys and their parts in one transaction.
+
+        Returns the names of their attachment files, which are left in storage for the caller to delete once the
+        rows are gone.
+        """
+        if not ids:
+            return []
+        manager = self._backend_model.objects.using(self.using)
+        with transaction.atomic(using=self.using):
+            messages = manager.filter(Q(pk__in=ids) | Q(parent_id__in=ids))
+            filenames = list(messages.exclude(file_attachment="").values_list("file_attachment", flat=True))
+            messages.delete()
+        return filenames
+
+
+def _message_headers(message) -> Dict[str, str]:
+    """
+    Return the headers of an email.message.Message as a dict with lower cased header names to store in the backend
+    model's message_headers.
+    """
+    return {name.lower(): str(value) for name, value in message.items()}
+
+
+# The size of the encoded payload decoded at once when streaming attachments to storage
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_decoded_payload(part, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield the decoded payload of a non-multipart email.message.Message in chunks.
+
+    Does the same decoding as part.get_payload(decode=True) for base64 and quoted-printable payloads without building
+    the whole decoded payload in memory.
+    """
+    payload = part.get_payload()
+    cte = str(part.get("content-transfer-encoding", "")).lower()
+    if cte == "base64":
+        remainder = ""
+        for offset in range(0, len(payload), chunk_size):
+            # base64 decodes in groups of 4 characters, so carry over anything which does not fill a group
+            data = remainder + "".join(payload[offset : offset + chunk_size].split())
+            usable = len(data) - len(data) % 4
+            remainder = data[usable:]
+            if usable:
+                yield binascii.a2b_base64(data[:usable])
+        if remainder.rstrip("="):
+            # Lenient about missing padding, like email.message.Message.get_payload()
+            yield binascii.a2b_base64(remainder + "=" * (-len(remainder) % 4))
+    elif cte == "quoted-printable":
+        # quoted-printable soft line breaks never cross a line, so decode whole lines at a time
+        lines = []
+        size = 0
+        for line in payload.splitlines(keepends=True):
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield binascii.a2b_qp("".join(lines).encode("raw-unicode-escape"))
+                lines = []
+                size = 0
+        if lines:
+            yield binascii.a2b_qp("".join(lines).encode("raw-unicode-escape"))
+    else:
+        yield part.get_payload(decode=True) or b""
+
+
+class _BuiltMessage(NamedTuple):
+    """
+    Unsaved model instances for an email built by EmailBackend._build_message()
+    """
+
+    message: "AbstractBaseEmailMessage"
+    parts: "List[AbstractBaseEmailMessage]"
+    addresses: "List[AbstractBaseEmailAddress]"
+
+
+# Messages waiting on a transaction to commit, by database alias. Database connections are per thread, so the
+# batches are as well.
+_on_commit_batches = threading.local()
+
+
+class _OnCommitChunk:
+    """
+    The messages from one send_messages() call in a transaction. Registered as a do nothing on_commit() callback so
+    that, like any other callback, Django discards it along with the messages when the savepoint it was registered in
+    is rolled back.
+    """
+
+    def __init__(self, messages: "List[_BuiltMessage]"):
+        self.messages = messages
+
+    def __call__(self):
+        pass
+
+
+class _OnCommitBatch:
+    """
+    Messages captured during a transaction which are written in one batch by flush() once the transaction commits.
+    """
+
+    def __init__(self, backend: EmailBackend, using: str):
+        self.backend = backend
+        self.using = using
+        # Weak references to the chunks of messages, which are only alive while Django still has them to call
+        self.chunks: "List[weakref.ReferenceType[_OnCommitChunk]]" = []
+        self.flushed = False
+
+    def add(self, messages: "List[_BuiltMessage]"):
+        chunk = _OnCommitChunk(messages)
+        transaction.on_commit(chunk, using=self.using)
+        self.chunks.append(weakref.ref(chunk))
+
+    def flush(self):
+        # Runs before the chunks' callbacks since it was registered first, so the chunks which were not discarded
+        # are still alive
+        self.flushed = True
+        chunks, self.chunks = [chunk() for chunk in self.chunks], []
+        self.backend._write_messages([built for chunk in chunks if chunk is not None for built in chunk.messages])
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailmessage",
+            name="file_sha256",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="emailmessage",
+            name="file_size",
+            field=models.PositiveBigIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name="emailmessage",
+            name="file_attachment",
+            field=models.FileField(blank=True, default="", upload_to="mailviewer_attachments"),
+        ),
+    ]
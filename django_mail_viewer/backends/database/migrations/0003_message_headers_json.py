@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+def lower_case_header_names(apps, schema_editor):
+    EmailMessage = apps.get_model("mail_viewer_database_backend", "EmailMessage")
+    messages = EmailMessage.objects.using(schema_editor.connection.alias).only("pk", "message_headers")
+    batch = []
+    for message in messages.iterator(chunk_size=1000):
+        message.message_headers = {name.lower(): value for name, value in message.message_headers.items()}
+        batch.append(message)
+        if len(batch) >= 1000:
+            EmailMessage.objects.using(schema_editor.connection.alias).bulk_update(batch, ["message_headers"])
+            batch = []
+    if batch:
+        EmailMessage.objects.using(schema_editor.connection.alias).bulk_update(batch, ["message_headers"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0002_attachment_size_and_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="emailmessage",
+            name="message_headers",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(lower_case_header_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:38
+
+from email.utils import getaddresses
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_addresses(apps, schema_editor):
+    """
+    Index the addresses of already stored email from their headers. Bcc addresses are not in the headers.
+    """
+    EmailMessage = apps.get_model("mail_viewer_database_backend", "EmailMessage")
+    EmailAddress = apps.get_model("mail_viewer_database_backend", "EmailAddress")
+    using = schema_editor.connection.alias
+    messages = EmailMessage.objects.using(using).filter(parent=None).only("pk", "message_headers")
+    batch = []
+    for message in messages.iterator(chunk_size=1000):
+        for field in ("from", "to", "cc"):
+            value = message.message_headers.get(field)
+            if value:
+                batch.extend(
+                    EmailAddress(message_id=message.pk, field=field, address=address.lower())
+                    for _, address in getaddresses([value])
+                    if address
+                )
+        if len(batch) >= 1000:
+            EmailAddress.objects.using(using).bulk_create(batch)
+            batch = []
+    if batch:
+        EmailAddress.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0003_message_headers_json"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailAddress",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("address", models.CharField(max_length=254)),
+                (
+                    "field",
+                    models.CharField(
+                        choices=[("from", "From"), ("to", "To"), ("cc", "Cc"), ("bcc", "Bcc")], max_length=4
+                    ),
+                ),
+                (
+                    "message",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="addresses",
+                        to="mail_viewer_database_backend.emailmessage",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "mail_viewer_emailaddress",
+                "indexes": [models.Index(fields=["address", "field"], name="mail_viewer_address_f16eb4_idx")],
+            },
+        ),
+        migrations.RunPython(index_addresses, migrations.RunPython.noop),
+    ]
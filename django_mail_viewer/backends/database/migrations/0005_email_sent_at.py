@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:43
+
+import datetime
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_sent_at(apps, schema_editor):
+    """
+    Parse the Date header of already stored email into sent_at, falling back to when it was stored.
+    """
+    EmailMessage = apps.get_model("mail_viewer_database_backend", "EmailMessage")
+    using = schema_editor.connection.alias
+    messages = EmailMessage.objects.using(using).filter(parent=None).only("pk", "message_headers", "created_at")
+    batch = []
+    for message in messages.iterator(chunk_size=1000):
+        try:
+            sent_at = parsedate_to_datetime(message.message_headers.get("date", ""))
+        except (TypeError, ValueError, IndexError):
+            sent_at = None
+        if sent_at is None:
+            sent_at = message.created_at
+        elif sent_at.tzinfo is None:
+            sent_at = sent_at.replace(tzinfo=datetime.timezone.utc)
+        if not settings.USE_TZ and timezone.is_aware(sent_at):
+            sent_at = timezone.make_naive(sent_at)
+        message.sent_at = sent_at
+        batch.append(message)
+        if len(batch) >= 1000:
+            EmailMessage.objects.using(using).bulk_update(batch, ["sent_at"])
+            batch = []
+    if batch:
+        EmailMessage.objects.using(using).bulk_update(batch, ["sent_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0004_email_address"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailmessage",
+            name="sent_at",
+            field=models.DateTimeField(blank=True, db_index=True, default=None, null=True),
+        ),
+        migrations.RunPython(set_sent_at, migrations.RunPython.noop),
+    ]
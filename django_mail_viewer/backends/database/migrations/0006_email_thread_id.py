@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:46
+
+import re
+
+from django.db import migrations, models
+
+MESSAGE_ID_RE = re.compile(r"<[^<>\s]+>")
+
+
+def thread_ids(message):
+    ids = []
+    for header in ("references", "in-reply-to", "message-id"):
+        ids.extend(MESSAGE_ID_RE.findall(str(message.message_headers.get(header) or "")))
+    return ids
+
+
+def set_thread_id(apps, schema_editor):
+    """
+    Group already stored email into threads from their References, In-Reply-To, and Message-ID headers.
+    """
+    EmailMessage = apps.get_model("mail_viewer_database_backend", "EmailMessage")
+    using = schema_editor.connection.alias
+    messages = (
+        EmailMessage.objects.using(using)
+        .filter(parent=None)
+        .only("pk", "message_headers")
+        .order_by("sent_at", "pk")
+    )
+    # Union-find over Message-IDs, with the first Message-ID seen for each thread as its root
+    parents = {}
+
+    def find(message_id):
+        parents.setdefault(message_id, message_id)
+        while parents[message_id] != message_id:
+            parents[message_id] = parents[parents[message_id]]
+            message_id = parents[message_id]
+        return message_id
+
+    # Read through twice rather than holding every message, first to join the threads and then to save their ids
+    for message in messages.iterator(chunk_size=1000):
+        ids = thread_ids(message)
+        if ids:
+            root = find(ids[0])
+            for other in ids[1:]:
+                other_root = find(other)
+                if other_root != root:
+                    parents[other_root] = root
+
+    batch = []
+    for message in messages.iterator(chunk_size=1000):
+        ids = thread_ids(message)
+        message.thread_id = find(ids[0]) if ids else ""
+        batch.append(message)
+        if len(batch) >= 1000:
+            EmailMessage.objects.using(using).bulk_update(batch, ["thread_id"])
+            batch = []
+    if batch:
+        EmailMessage.objects.using(using).bulk_update(batch, ["thread_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0005_email_sent_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailmessage",
+            name="thread_id",
+            field=models.CharField(blank=True, db_index=True, default="", max_length=250),
+        ),
+        migrations.RunPython(set_thread_id, migrations.RunPython.noop),
+    ]
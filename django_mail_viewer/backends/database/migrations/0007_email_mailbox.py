@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_viewer_database_backend", "0006_email_thread_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailmessage",
+            name="mailbox",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name="emailmessage",
+            index=models.Index(fields=["mailbox", "sent_at"], name="mail_viewer_mailbox_79fb5e_idx"),
+        ),
+    ]
@@ -1,6 +1,6 @@
+import email.encoders
 import email.message
 import email.utils
-import json
 from typing import Any, Dict, List, Union
 
 from django.db import models
@@ -20,16 +20,28 @@ class AbstractBaseEmailMessage(models.Model):
     # and Django always creates the message_id on the main part of the message so we know
     # it will be there, but not for all sub-parts of a multi-part message
     message_id = models.CharField(max_length=250, blank=True, default="")
-    # Would love to make message_headers be a JSONField, but do not want to tie this to
-    # postgres only.
-    message_headers = models.TextField()
+    # The email headers with lower cased names, since header names are case insensitive, so that headers can be
+    # looked up directly, including in database queries such as filter(message_headers__subject="Hello").
+    message_headers = models.JSONField(default=dict)
     content = models.TextField(blank=True, default="")
     parent = models.ForeignKey(
         "self", blank=True, null=True, default=None, related_name="parts", on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # When the email was sent, parsed from its Date header when it is captured so that it can be queried and ordered by
+    # without parsing every header. Only set on the main message, not its parts.
+    sent_at = models.DateTimeField(blank=True, null=True, default=None, db_index=True)
+    # The Message-ID identifying the thread of the email, found from its In-Reply-To and References headers when it is
+    # captured. Only set on the main message, not its parts.
+    thread_id = models.CharField(max_length=250, blank=True, default="", db_index=True)
+    # The mailbox the email was stored in, see django_mail_viewer.mailboxes. Only set on the main message.
+    mailbox = models.CharField(max_length=100, blank=True, default="")
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Recorded as the attachment is decoded into file_attachment so that they do not require reading the file back
+    file_size = models.PositiveBigIntegerField(blank=True, null=True, default=None)
+    file_sha256 = models.CharField(max_length=64, blank=True, default="")
+
     file_attachment: models.FileField
 
     class Meta:
@@ -46,11 +58,7 @@ class AbstractBaseEmailMessage(models.Model):
         """
         # Or should I muck with __getitem__ and __setitem__, etc
         # like in https://github.com/python/cpython/blob/3.8/Lib/email/message.py#L382
-        vals = {k.lower(): v for k, v in self.headers().items()}
-        if vals:
-            lower_attr = attr.lower()
-            return vals.get(lower_attr, failobj)
-        return failobj
+        return self.headers().get(attr.lower(), failobj)
 
     def date(self) -> str:
         return self.get("date")
@@ -64,9 +72,9 @@ class AbstractBaseEmailMessage(models.Model):
 
     def headers(self) -> Dict[str, str]:
         """
-        Return the Messages email headers as a dict
+        Return the Messages email headers as a dict with lower cased header names
         """
-        return json.loads(self.message_headers)
+        return self.message_headers
 
     def values(self) -> Dict[str, str]:
         """
@@ -133,7 +141,7 @@ class AbstractBaseEmailMessage(models.Model):
         return params[0]
 
     def get_filename(self, failobj=None) -> str:
-        content_disposition = self.headers().get("Content-Disposition", "")
+        content_disposition = self.get("content-disposition", "")
         parts = content_disposition.split(";")
         for part in parts:
             if part.strip().startswith("filename"):
@@ -141,6 +149,50 @@ class AbstractBaseEmailMessage(models.Model):
                 return email.utils.unquote(filename)
         return ""
 
+    def to_message(self) -> email.message.Message:
+        """
+        Rebuild an email.message.Message from the stored headers, content, and attachment files.
+
+        The parts of nested multipart email are stored flattened, so they are all put directly in the main message.
+        Header names are those stored, which are lower cased, and bodies and attachments are re-encoded with
+        quoted-printable and base64, so the bytes differ from those sent but the email reads the same.
+        """
+        message = self._to_part()
+        if self.pk is not None and self.parent_id is None:
+            # In the order they were in the email, which is the order they were saved in. Sorted here rather than
+            # with order_by() so that prefetched parts are used.
+            parts = sorted(self.parts.all(), key=lambda part: part.pk)  # type: ignore
+            if parts:
+                children = [part._to_part() for part in parts]
+                message.set_payload([child for child in children if child.get_content_maintype() != "multipart"])
+        return message
+
+    def _to_part(self) -> email.message.Message:
+        part = email.message.Message()
+        for name, value in self.headers().items():
+            if name != "content-transfer-encoding":
+                part[name] = value
+        # Parsed by email.message.Message since not every stored part has a Content-Type header
+        if part.get_content_maintype() == "multipart":
+            return part
+        if self.file_attachment:
+            self.file_attachment.open("rb")
+            try:
+                part.set_payload(self.file_attachment.read())
+            finally:
+                self.file_attachment.close()
+            email.encoders.encode_base64(part)
+        else:
+            part.set_payload(self.content.encode(part.get_content_charset() or "utf-8", errors="replace"))
+            email.encoders.encode_quopri(part)
+        return part
+
+    def as_bytes(self) -> bytes:
+        """
+        Return the email as bytes, like email.message.Message.as_bytes(), rebuilt by to_message().
+        """
+        return self.to_message().as_bytes()
+
 
 class EmailMessage(AbstractBaseEmailMessage):
     """
@@ -159,4 +211,37 @@ class EmailMessage(AbstractBaseEmailMessage):
     class Meta:
         db_table = "mail_viewer_emailmessage"
         ordering = ("id",)
-        indexes = [models.Index(fields=["message_id"])]
+        indexes = [models.Index(fields=["message_id"]), models.Index(fields=["mailbox", "sent_at"])]
+
+
+class AbstractBaseEmailAddress(models.Model):
+    """
+    Abstract base class for an email address an email was sent from or to, indexed to quickly find the email
+    sent to an address.
+
+    When using a custom email message model, subclass this and add a `ForeignKey()` named `message` to it with
+    `related_name="addresses"` for the database backend to index addresses.
+    """
+
+    FIELD_CHOICES = (("from", "From"), ("to", "To"), ("cc", "Cc"), ("bcc", "Bcc"))
+
+    # Normalized to the lower cased address without any display name
+    address = models.CharField(max_length=254)
+    field = models.CharField(max_length=4, choices=FIELD_CHOICES)
+
+    message: models.ForeignKey
+
+    class Meta:
+        abstract = True
+
+
+class EmailAddress(AbstractBaseEmailAddress):
+    """
+    An email address on an EmailMessage.
+    """
+
+    message = models.ForeignKey(EmailMessage, related_name="addresses", on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "mail_viewer_emailaddress"
+        indexes = [models.Index(fields=["address", "field"])]
@@ -0,0 +1,43 @@
+from ... import settings as mailviewer_settings
+
+DATABASE_BACKEND_APP_LABEL = "mail_viewer_database_backend"
+
+
+class MailViewerRouter:
+    """
+    Database router which sends all reads, writes, and migrations for the database backend's models to the
+    database configured with `settings.MAILVIEWER_DATABASE_ALIAS`.
+
+    This keeps captured email out of the application's own database, transactions, and locks. Models from other
+    apps are left alone so that other routers, or Django's default behavior, decide where they go.
+    """
+
+    def _is_mailviewer_model(self, app_label: str, model_name: str = "") -> bool:
+        if app_label == DATABASE_BACKEND_APP_LABEL:
+            return True
+        # A custom model set with MAILVIEWER_DATABASE_BACKEND_MODEL may live in an app of its own
+        return f"{app_label}.{model_name}".lower() == mailviewer_settings.MAILVIEWER_DATABASE_BACKEND_MODEL.lower()
+
+    def db_for_read(self, model, **hints):
+        if self._is_mailviewer_model(model._meta.app_label, model._meta.model_name):
+            return mailviewer_settings.MAILVIEWER_DATABASE_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_mailviewer_model(model._meta.app_label, model._meta.model_name):
+            return mailviewer_settings.MAILVIEWER_DATABASE_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        is_mailviewer = [self._is_mailviewer_model(o._meta.app_label, o._meta.model_name) for o in (obj1, obj2)]
+        if all(is_mailviewer):
+            return True
+        if any(is_mailviewer):
+            # Relations across databases are not possible, so only allow them when both are on the same database.
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if self._is_mailviewer_model(app_label, model_name or ""):
+            return db == mailviewer_settings.MAILVIEWER_DATABASE_ALIAS
+        return None
@@ -0,0 +1,328 @@
+"""
+Backend storing email as .eml files in a directory which several processes or containers may share.
+"""
+
+import email
+import json
+import os
+import tempfile
+import threading
+from email.message import Message
+from hashlib import sha1
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .locmem import _OutboxIndex, _SnapshotMessage
+from .utils import OutboxQuery, message_addresses, message_summary
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where appends to the index are left unlocked
+    fcntl = None
+
+# The name of the index file in each mailbox's directory
+INDEX_FILE_NAME = "index.jsonl"
+
+
+class _IndexReader:
+    """
+    The entries of a mailbox's index file read so far by this process, which reads only what has been appended since
+    the last time it looked.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # How far into the index file has been read, and the inode of the file read so that a replaced file is noticed
+        self.offset = 0
+        self.inode: Optional[int] = None
+        # Lookups into the entries the same as for the locmem backend, with the summaries' headers standing in for
+        # the messages
+        self.index = _OutboxIndex([])
+        # How many entries in the index's outbox list are for messages which have since been deleted or stored again
+        self.stale = 0
+
+    def refresh(self) -> _OutboxIndex:
+        """
+        Read the entries appended to the index file since the last refresh and return the index of them all.
+        """
+        with self.lock:
+            try:
+                with open(self.path, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino != self.inode or stat.st_size < self.offset:
+                        self.reset()
+                        self.inode = stat.st_ino
+                    f.seek(self.offset)
+                    data = f.read()
+            except FileNotFoundError:
+                self.reset()
+                return self.index
+            # The last line may still be being written by another process, so stop at the last complete one
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                self._apply(json.loads(line))
+            if self.stale:
+                # Dropped all at once, rather than one at a time, so that replaying many deletes stays linear
+                messages = self.index.messages
+                self.index.outbox[:] = [e for e in self.index.outbox if messages.get(e.get("message-id")) is e]
+                self.stale = 0
+            self.offset += end
+            return self.index
+
+    def _apply(self, entry: Dict[str, Any]):
+        message_id = entry["message_id"]
+        if message_id in self.index.summaries:
+            # Its entry in the outbox list is left for refresh() to drop
+            self.index.remove(message_id)
+            self.stale += 1
+        if entry["op"] == "add":
+            summary = entry["summary"]
+            self.index.outbox.append(summary["headers"])
+            self.index.add(summary["headers"], summary)
+
+
+class _FileMessage(_SnapshotMessage):
+    """
+    A message in the outbox which only reads its .eml file once something other than its headers is needed, so that
+    listing email only reads the index.
+    """
+
+    def __init__(self, path: Path, headers: Dict[str, str]):
+        super().__init__(memoryview(b""), headers)
+        self._path = path
+
+    def _parsed(self):
+        if self._message is None:
+            try:
+                with open(self._path, "rb") as f:
+                    self._message = email.message_from_binary_file(f)
+            except FileNotFoundError:
+                # Deleted since the outbox was read, so only what the index has is left
+                self._message = Message()
+                for name, value in self._headers.items():
+                    self._message[name] = value
+        return self._message
+
+    def as_bytes(self, *args, **kwargs) -> bytes:
+        if self._message is None and not args and not kwargs:
+            try:
+                return self._path.read_bytes()
+            except FileNotFoundError:
+                pass
+        return self._parsed().as_bytes(*args, **kwargs)
+
+
+# Index file path -> reader of that index file
+_readers: Dict[Path, _IndexReader] = {}
+_readers_lock = threading.Lock()
+
+
+def _get_reader(path: Path) -> _IndexReader:
+    with _readers_lock:
+        if path not in _readers:
+            _readers[path] = _IndexReader(path)
+        return _readers[path]
+
+
+class EmailBackend(BaseEmailBackend):
+    """
+    An email backend to use during testing and local development with Django Mail Viewer.
+
+    Stores each email as an .eml file under `settings.MAILVIEWER_FILE_PATH`, or else `settings.EMAIL_FILE_PATH`, so
+    that every process and container with that directory mounted shares the same email without a cache server or
+    database. Each mailbox has its own directory with the .eml files spread across subdirectories by a hash of their
+    Message-ID and an append-only index file with a line of JSON for each email stored or deleted.
+
+    Messages are written to a temporary file and renamed into place, so processes never see a partly written message,
+    and each index entry is appended with a single write while holding an flock() of the index file where it is
+    available. The lock keeps entries from different hosts apart on network filesystems, where appending alone may
+    not, and lets compact_index() rewrite the index without losing entries appended meanwhile. Reads of the list of
+    email only read the index, and only the part of it appended since this process last read it, and reading one
+    email opens only its file.
+    """
+
+    def __init__(self, *args, mailbox: Optional[str] = None, file_path: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
+        file_path = file_path or mailviewer_settings.MAILVIEWER_FILE_PATH or getattr(settings, "EMAIL_FILE_PATH", None)
+        if not file_path:
+            raise ImproperlyConfigured(
+                "django_mail_viewer.backends.filesystem.EmailBackend requires MAILVIEWER_FILE_PATH or EMAIL_FILE_PATH."
+            )
+        self.file_path = Path(file_path)
+        # The default mailbox gets a directory of its own since every other name is a valid mailbox name
+        self.directory = self.file_path / "mailboxes" / self.mailbox if self.mailbox else self.file_path / "default"
+        self.index_path = self.directory / INDEX_FILE_NAME
+
+    def _for_mailbox(self, mailbox: str) -> "EmailBackend":
+        """
+        Return a backend for another mailbox in the same directory.
+        """
+        return type(self)(mailbox=mailbox, file_path=str(self.file_path), fail_silently=self.fail_silently)
+
+    def message_path(self, message_id: str) -> Path:
+        """
+        Path of the .eml file for a message.
+        """
+        # Hashed since Message-IDs may contain characters which are not allowed in file names, and sharded so that no
+        # directory ends up with too many files in it
+        digest = sha1(message_id.encode()).hexdigest()
+        return self.directory / "messages" / digest[:2] / digest[2:4] / f"{digest}.eml"
+
+    def send_messages(self, messages):
+        msg_count = 0
+        for message in messages:
+            m = message.message()
+            mailbox = message_mailbox(m, self.mailbox)
+            backend = self if mailbox == self.mailbox else self._for_mailbox(mailbox)
+            backend._store_message(m, message_summary(m, message_addresses(message)))
+            msg_count += 1
+        return msg_count
+
+    def _store_message(self, m, summary: Dict[str, Any]):
+        """
+        Write an email.message.Message to its file and then add it, with its summary from utils.message_summary(), to
+        the index.
+        """
+        path = self.message_path(summary["message_id"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(m.as_bytes())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._append_index({"op": "add", "message_id": summary["message_id"], "summary": summary})
+
+    @staticmethod
+    def _index_line(entry: Dict[str, Any]) -> bytes:
+        return json.dumps(entry, separators=(",", ":")).encode() + b"\n"
+
+    def _open_index(self) -> int:
+        """
+        Open the index file for appending, locked with flock() where it is available, and return its file descriptor.
+        Closing it releases the lock.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        while True:
+            fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # compact_index() may have replaced the file while this was waiting for the lock
+                if os.fstat(fd).st_ino == os.stat(self.index_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _append_index(self, entry: Dict[str, Any]):
+        """
+        Append an entry to the index file with a single write while holding its lock.
+        """
+        fd = self._open_index()
+        try:
+            os.write(fd, self._index_line(entry))
+        finally:
+            os.close(fd)
+
+    def compact_index(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Rewrite the index file with one entry for each message still stored, in the order they were stored, dropping
+        the entries of deleted and replaced messages and of any whose file is gone. The new index is written
+        `batch_size` entries at a time to a temporary file which is renamed over the index, while holding the index's
+        lock so that no entry appended meanwhile is lost.
+
+        Returns a dict with the number of `messages` left in the index and the number of entries `removed` from it.
+        """
+        fd = self._open_index()
+        try:
+            # Message-ID -> its latest add entry, with a message stored again moved to the end as readers do
+            entries: Dict[str, Dict[str, Any]] = {}
+            count = 0
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    # A last line without a line break was left by a write which failed part way and is dropped
+                    if not line.endswith(b"\n"):
+                        break
+                    count += 1
+                    entry = json.loads(line)
+                    entries.pop(entry["message_id"], None)
+                    if entry["op"] == "add":
+                        entries[entry["message_id"]] = entry
+            kept = [entry for message_id, entry in entries.items() if self.message_path(message_id).exists()]
+            temp_fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(temp_fd, "wb") as temp:
+                    for start in range(0, len(kept), batch_size):
+                        temp.write(b"".join(self._index_line(entry) for entry in kept[start : start + batch_size]))
+                os.replace(temp_path, self.index_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        finally:
+            os.close(fd)
+        return {"messages": len(kept), "removed": count - len(kept)}
+
+    def _read_message(self, message_id: str):
+        try:
+            with open(self.message_path(message_id), "rb") as f:
+                return email.message_from_binary_file(f)
+        except FileNotFoundError:
+            return None
+
+    def _get_messages(self, entries: list) -> list:
+        """
+        Return the messages for index entries, which are the headers saved in the index, without reading their files.
+        """
+        return [_FileMessage(self.message_path(entry.get("message-id")), entry) for entry in entries]
+
+    def get_message(self, lookup_id):
+        """
+        Look up and return a specific message in the outbox
+        """
+        return self._read_message(lookup_id)
+
+    def get_outbox(self, *args, **kwargs):
+        """
+        Get the outbox used by this backend.  This backend returns messages which only read their .eml file once
+        more than their headers is needed.
+        May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments.
+        """
+        index = _get_reader(self.index_path).refresh()
+        if kwargs:
+            return self._get_messages(index.query(OutboxQuery(**kwargs)))
+        return self._get_messages(index.outbox[:])
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        return self._get_messages(_get_reader(self.index_path).refresh().thread(message_id))
+
+    def delete_message(self, message_id: str):
+        """
+        Remove the message with the given id from the mailbox
+        """
+        self._append_index({"op": "delete", "message_id": message_id})
+        try:
+            os.unlink(self.message_path(message_id))
+        except FileNotFoundError:
+            pass
@@ -2,9 +2,271 @@
 Backend for test environment.
 """
 
+import atexit
+import email
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
 from django.core import mail
 from django.core.mail.backends.base import BaseEmailBackend
 
+from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .utils import (
+    OutboxQuery,
+    date_index_insert,
+    date_index_range,
+    date_index_remove,
+    header_addresses,
+    message_addresses,
+    message_recipients,
+    message_summary,
+    message_thread_ids,
+    resolve_thread_id,
+)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where SharedEmailBackend only shares the outbox between the threads of one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _OutboxIndex:
+    """
+    Lookups into the messages in a mail.outbox list, kept up to date by EmailBackend as it adds and removes messages.
+
+    Writers add and delete messages with append() and delete(), which hold the index's lock. Readers do not lock, so
+    the outbox list is never changed except by appending to it. Deleting a message copies the list without it and, for
+    the index of a mailbox, replaces the mailbox's outbox with the copy, so that readers going through the old list
+    neither skip a message nor see one twice.
+
+    Each mailbox has one index for the life of the process, so that every thread adds to the same one. When the
+    mailbox's outbox is replaced or changed by something else, such as the Django test runner emptying mail.outbox,
+    the index is rebuilt in place from the list. Writers publish the outbox as they left it in `state` so that
+    readers can check for that without the lock, and only take it to rebuild the index.
+    """
+
+    def __init__(self, outbox: list, mailbox: Optional[str] = None):
+        # The mailbox whose outbox this indexes, or None for an index which is not of a mailbox
+        self.mailbox = mailbox
+        self.lock = threading.Lock()
+        self.outbox = outbox
+        # Message-ID -> the message and the summary from utils.message_summary() precomputed for filtering
+        self.messages: Dict[str, Any] = {}
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+        # address -> Message-IDs of the messages sent to or from it, in the order they were sent
+        self.by_recipient: Dict[str, List[str]] = defaultdict(list)
+        self.by_sender: Dict[str, List[str]] = defaultdict(list)
+        # (timestamp, Message-ID) of every message sorted by when it was sent
+        self.by_date: List[Tuple[float, str]] = []
+        # Message-ID -> thread id, and thread id -> (timestamp, Message-ID) of the messages in it sorted by date
+        self.thread_of: Dict[str, str] = {}
+        self.threads: Dict[str, List[Tuple[float, str]]] = {}
+        for message in outbox:
+            # Messages put in the outbox by something else, so the Bcc addresses are not known
+            self.add(message, message_summary(message, header_addresses(message)))
+        self._mark_current()
+
+    def _mark_current(self):
+        # The outbox list, its length, and its last message as this index left them, to notice it being changed by
+        # anything else. Replaced as a whole so that readers always see the three from the same write.
+        self.state: Tuple[list, int, Any] = (self.outbox, len(self.outbox), self.outbox[-1] if self.outbox else None)
+
+    def is_current(self) -> bool:
+        """
+        Whether the mailbox's outbox is still the list this index was built from, changed only through this index.
+        Only for the index of a mailbox. Does not need the lock, but may return False while a writer holding it is
+        partway through a change.
+        """
+        outbox, length, last = self.state
+        current = _get_outbox(self.mailbox or "")
+        if current is not outbox or len(current) != length:
+            return False
+        try:
+            return not length or current[length - 1] is last
+        except IndexError:
+            # Emptied by something else since its length was checked
+            return False
+
+    def replace(self, other: "_OutboxIndex"):
+        """
+        Take the outbox and lookups of another index, keeping this index object for the threads which already have
+        it. Should be called holding the lock.
+        """
+        for name in ["messages", "summaries", "by_recipient", "by_sender", "by_date", "thread_of", "threads"]:
+            setattr(self, name, getattr(other, name))
+        self.outbox = other.outbox
+        self._mark_current()
+        if self.mailbox is not None:
+            _set_outbox(self.mailbox, self.outbox)
+
+    def append(self, message, summary: Dict[str, Any]):
+        """
+        Append a message to the outbox and add it to the index.
+        """
+        with self.lock:
+            self.outbox.append(message)
+            self.add(message, summary)
+            self._mark_current()
+
+    def delete(self, message_id: str) -> bool:
+        """
+        Remove a message from the outbox and the index, returning whether it was there.
+        """
+        with self.lock:
+            if message_id not in self.summaries:
+                return False
+            self.remove(message_id)
+            self.outbox = [m for m in self.outbox if m.get("message-id") != message_id]
+            self._mark_current()
+            if self.mailbox is not None:
+                _set_outbox(self.mailbox, self.outbox)
+            return True
+
+    def add(self, message, summary: Dict[str, Any]):
+        message_id = summary["message_id"]
+        self.messages[message_id] = message
+        self.summaries[message_id] = summary
+        for address in message_recipients(summary["addresses"]):
+            self.by_recipient[address].append(message_id)
+        for address in summary["addresses"]["from"]:
+            self.by_sender[address].append(message_id)
+        date_index_insert(self.by_date, summary)
+
+        thread_id, merged = resolve_thread_id(
+            message_thread_ids(message),
+            lambda candidate: self.thread_of.get(candidate) or (candidate if candidate in self.threads else None),
+        )
+        thread = self.threads.setdefault(thread_id, [])
+        for merged_id in merged:
+            for entry in self.threads.pop(merged_id):
+                self.thread_of[entry[1]] = thread_id
+                date_index_insert(thread, {"date": entry[0], "message_id": entry[1]})
+        self.thread_of[message_id] = thread_id
+        date_index_insert(thread, summary)
+
+    def remove(self, message_id: str):
+        self.messages.pop(message_id, None)
+        summary = self.summaries.pop(message_id, None)
+        if summary is None:
+            return
+        date_index_remove(self.by_date, summary)
+        thread_id = self.thread_of.pop(message_id, None)
+        if thread_id in self.threads:
+            date_index_remove(self.threads[thread_id], summary)
+            if not self.threads[thread_id]:
+                del self.threads[thread_id]
+        for lookup, addresses in [
+            (self.by_recipient, message_recipients(summary["addresses"])),
+            (self.by_sender, summary["addresses"]["from"]),
+        ]:
+            for address in addresses:
+                lookup[address] = [i for i in lookup[address] if i != message_id]
+                if not lookup[address]:
+                    del lookup[address]
+
+    def query(self, query: OutboxQuery) -> list:
+        """
+        Return the messages matching an OutboxQuery.
+        """
+        # Narrow down to the messages for the addresses and dates first, then check the precomputed summaries of those
+        candidates = []
+        for lookup, address in [(self.by_recipient, query.recipient), (self.by_sender, query.sender)]:
+            if address:
+                candidates.append(lookup.get(address, []))
+        if query.uses_dates:
+            # Last so that the intersection keeps the messages in date order for the ordering
+            candidates.append(date_index_range(self.by_date, query.since, query.until))
+        if candidates:
+            message_ids = candidates.pop()
+            for ids in candidates:
+                found = set(ids)
+                message_ids = [i for i in message_ids if i in found]
+        else:
+            # The outbox is already in the order the messages were stored, so without filters only the page is needed
+            outbox = self.outbox if query.uses_summaries or query.limit is None else self.outbox[: query.limit]
+            message_ids = [message.get("message-id") for message in outbox]
+        # Summaries are looked up once since a message may be deleted by another thread at any time
+        summaries = [(i, self.summaries.get(i)) for i in message_ids]
+        if query.uses_summaries or query.uses_dates:
+            # Dates are checked again in case a message was added to or removed from the date index while reading it
+            summaries = [(i, summary) for i, summary in summaries if summary is not None and query.matches(summary)]
+        messages = [self.messages.get(i) for i, summary in summaries if summary is not None]
+        return query.order_and_limit([m for m in messages if m is not None])
+
+    def thread(self, message_id: str) -> list:
+        """
+        Return the messages in the same thread as a message, oldest first.
+        """
+        thread = self.threads.get(self.thread_of.get(message_id, ""), [])
+        # Copied first since another thread may be inserting into it
+        messages = [self.messages.get(i) for _, i in thread[:]]
+        return [m for m in messages if m is not None]
+
+
+# Mailbox name -> index of that mailbox's outbox
+_indexes: Dict[str, _OutboxIndex] = {}
+# Held while starting the index of a mailbox so that two threads do not both start one and each add to their own
+_indexes_lock = threading.Lock()
+
+
+def _get_outbox(mailbox: str) -> list:
+    """
+    Get the outbox list for a mailbox. The default mailbox, named "", is mail.outbox and the rest are in
+    mail.mailviewer_outboxes.
+    """
+    if not mailbox:
+        if not hasattr(mail, "outbox"):
+            mail.outbox = []
+        return mail.outbox
+    if not hasattr(mail, "mailviewer_outboxes"):
+        mail.mailviewer_outboxes = {}
+    return mail.mailviewer_outboxes.setdefault(mailbox, [])
+
+
+def _get_index(mailbox: str = "") -> _OutboxIndex:
+    """
+    Get the index for a mailbox's current outbox, rebuilding it if the outbox has been replaced or changed other than
+    through the index, such as by the Django test runner emptying mail.outbox between tests.
+    """
+    index = _indexes.get(mailbox)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(mailbox)
+            if index is None:
+                index = _indexes[mailbox] = _OutboxIndex(_get_outbox(mailbox), mailbox)
+                return index
+    if index.is_current():
+        return index
+    # Checked again holding the lock, since it may only have looked changed because a writer was partway through
+    with index.lock:
+        if not index.is_current():
+            index.replace(_OutboxIndex(_get_outbox(mailbox)))
+    return index
+
+
+def _set_outbox(mailbox: str, outbox: list):
+    """
+    Replace the outbox list for a mailbox.
+    """
+    if not mailbox:
+        mail.outbox = outbox
+    else:
+        _get_outbox(mailbox)
+        mail.mailviewer_outboxes[mailbox] = outbox
+
 
 class EmailBackend(BaseEmailBackend):
     """
@@ -15,50 +277,477 @@ class EmailBackend(BaseEmailBackend):
     This is because many of the headers are generated at the time message.message() is called
     and are not stored by the default locmem backend, including ones useful for consistently
     looking up a specific message even if the list is reordered.
+
+    Email in the default mailbox is in mail.outbox and email in other mailboxes is in
+    mail.mailviewer_outboxes[mailbox]. Email added to or removed from those lists other than through this backend is
+    noticed by their length and last message changing, and their index rebuilt without the Bcc addresses.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, mailbox: Optional[str] = None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
         if not hasattr(mail, "outbox"):
             mail.outbox = []
+        _snapshots.start()
+
+    @property
+    def outbox(self) -> list:
+        return _get_outbox(self.mailbox)
 
     def send_messages(self, messages):
         msg_count = 0
         for message in messages:
             m = message.message()
-            mail.outbox.append(m)
+            mailbox = message_mailbox(m, self.mailbox)
+            _get_index(mailbox).append(m, message_summary(m, message_addresses(message)))
             msg_count += 1
+        _snapshots.changed()
         return msg_count
 
     def get_message(self, lookup_id):
         """
         Look up and return a specific message in the outbox
         """
-        for message in mail.outbox:
-            # if a user is manually passing in Message-ID in extra_headers and capitalizing it
-            # differently than the expected Message-ID,  which is suppored by
-            # EmailMessage.message(), then we can't just access the key directly.  Instead iterate
-            # over the keys and vls
-            if message.get("message-id") == lookup_id:
-                return message
-        return None
+        # The index is keyed by message.get("message-id"), which finds the Message-ID header however it is capitalized,
+        # such as when it is passed in extra_headers.
+        return _get_index(self.mailbox).messages.get(lookup_id)
 
     def get_outbox(self, *args, **kwargs):
         """
-        Get the outbox used by this backend.  This backend returns a copy of mail.outbox.
+        Get the outbox used by this backend.  This backend returns a copy of the mailbox's outbox list.
         May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments. With only a limit, only that
+        many messages are copied.
         """
-        return getattr(mail, "outbox", [])[:]
+        if kwargs:
+            return _get_index(self.mailbox).query(OutboxQuery(**kwargs))
+        return self.outbox[:]
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        return _get_index(self.mailbox).thread(message_id)
 
     def delete_message(self, message_id: str):
         """
         Remove the message with the given id from the mailbox
         """
-        outbox = getattr(mail, "outbox", [])
-        index_to_remove = None
-        for idx, message in enumerate(outbox):
-            if message.get("message-id") == message_id:
-                index_to_remove = idx
-                break
-        if index_to_remove is not None:
-            del outbox[index_to_remove]
+        if _get_index(self.mailbox).delete(message_id):
+            _snapshots.changed()
+
+
+class _SnapshotMessage:
+    """
+    A message restored from a snapshot which is only parsed once something other than its headers is needed, so that
+    restoring a snapshot does not parse every message in it.
+
+    get() answers from the headers saved with the message's summary, which is all the outbox indexes need.
+    """
+
+    def __init__(self, data: memoryview, headers: Dict[str, str]):
+        self._data = data
+        self._headers = headers
+        self._message = None
+
+    def _parsed(self):
+        if self._message is None:
+            self._message = email.message_from_bytes(bytes(self._data))
+        return self._message
+
+    def get(self, name: str, failobj: Any = None) -> Any:
+        if self._message is not None:
+            return self._message.get(name, failobj)
+        return self._headers.get(name.lower(), failobj)
+
+    def as_bytes(self, *args, **kwargs) -> bytes:
+        if self._message is None and not args and not kwargs:
+            return bytes(self._data)
+        return self._parsed().as_bytes(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._parsed(), name)
+
+    def __getitem__(self, name: str) -> Any:
+        return self._parsed()[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._parsed()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parsed())
+
+    def __len__(self) -> int:
+        return len(self._parsed())
+
+
+class _Snapshots:
+    """
+    Saves the outboxes of every mailbox to `settings.MAILVIEWER_LOCMEM_SNAPSHOT_PATH` on exit and every
+    `settings.MAILVIEWER_LOCMEM_SNAPSHOT_INTERVAL` seconds, and restores them the first time a backend is created.
+
+    A snapshot is a header, the summaries of the messages as JSON with where each message is in the file, and then
+    the raw messages one after another. It is written to a temporary file and renamed into place so that a snapshot
+    is never partly written.
+    """
+
+    HEADER = struct.Struct("<4sIQ")
+    MAGIC = b"MVSS"
+    VERSION = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = False
+        # Counts changes to the outboxes so that periodic snapshots are only written when something changed
+        self.changes = 0
+        self.saved_changes = 0
+        self.timer: Optional[threading.Timer] = None
+
+    def changed(self):
+        self.changes += 1
+
+    def start(self):
+        """
+        Restore the snapshot and start saving snapshots, if snapshots are turned on, the first time it is called.
+
+        A snapshot which cannot be restored is logged and moved aside to `<path>.corrupt`, and snapshots are still
+        saved, so that sending email is not broken by it.
+        """
+        path = mailviewer_settings.MAILVIEWER_LOCMEM_SNAPSHOT_PATH
+        if self.started or not path:
+            return
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            try:
+                restore_snapshot(path)
+            except ValueError as e:
+                corrupt_path = f"{path}.corrupt"
+                logger.warning("Not restoring the outbox snapshot, moving it to %s: %s", corrupt_path, e)
+                try:
+                    os.replace(path, corrupt_path)
+                except OSError:
+                    logger.exception("Failed to move the outbox snapshot %s aside", path)
+            self.saved_changes = self.changes
+            atexit.register(self.save_if_changed)
+            self.schedule()
+
+    def schedule(self):
+        interval = mailviewer_settings.MAILVIEWER_LOCMEM_SNAPSHOT_INTERVAL
+        if not interval:
+            return
+        self.timer = threading.Timer(interval, self._save_periodically)
+        # Does not keep the process from exiting, and the snapshot on exit covers anything since the last one
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _save_periodically(self):
+        self.save_if_changed()
+        self.schedule()
+
+    def save_if_changed(self):
+        changes = self.changes
+        if changes != self.saved_changes:
+            save_snapshot(mailviewer_settings.MAILVIEWER_LOCMEM_SNAPSHOT_PATH)
+            self.saved_changes = changes
+
+
+_snapshots = _Snapshots()
+
+
+def _mailboxes() -> List[str]:
+    return [""] + list(getattr(mail, "mailviewer_outboxes", {}))
+
+
+def save_snapshot(path: str):
+    """
+    Save the outbox of every mailbox to a snapshot file at `path`.
+    """
+    entries = []
+    chunks = []
+    offset = 0
+    for mailbox in _mailboxes():
+        index = _get_index(mailbox)
+        for message in list(index.outbox):
+            message_id = message.get("message-id")
+            summary = index.summaries.get(message_id)
+            if summary is None:
+                continue
+            data = message.as_bytes()
+            entries.append({"mailbox": mailbox, "summary": summary, "offset": offset, "length": len(data)})
+            chunks.append(data)
+            offset += len(data)
+    index_data = json.dumps(entries, separators=(",", ":")).encode()
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_Snapshots.HEADER.pack(_Snapshots.MAGIC, _Snapshots.VERSION, len(index_data)))
+            f.write(index_data)
+            f.writelines(chunks)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def restore_snapshot(path: str) -> int:
+    """
+    Add the messages in the snapshot file at `path` to the start of the outboxes of their mailboxes, skipping any
+    which are already in them, and return how many were added. The messages are read from the file as they are used.
+    """
+    try:
+        with open(path, "rb") as f:
+            # Maps the file rather than reading it, so that the messages are only read from disk when they are used
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (FileNotFoundError, ValueError):
+        # A snapshot which does not exist yet, or an empty file which cannot be mapped
+        return 0
+    try:
+        magic, version, index_length = _Snapshots.HEADER.unpack_from(data, 0)
+    except struct.error:
+        raise ValueError(f"{path} is too short to be a Django Mail Viewer outbox snapshot.") from None
+    if magic != _Snapshots.MAGIC or version != _Snapshots.VERSION:
+        raise ValueError(f"{path} is not a Django Mail Viewer outbox snapshot.")
+    start = _Snapshots.HEADER.size + index_length
+    try:
+        entries = json.loads(bytes(data[_Snapshots.HEADER.size : start]))
+    except ValueError:
+        raise ValueError(f"{path} is a truncated or corrupt Django Mail Viewer outbox snapshot.") from None
+    if entries and start + entries[-1]["offset"] + entries[-1]["length"] > len(data):
+        raise ValueError(f"{path} is a truncated Django Mail Viewer outbox snapshot.")
+    restored: Dict[str, List[Tuple[_SnapshotMessage, Dict[str, Any]]]] = {}
+    for entry in entries:
+        message_data = data[start + entry["offset"] : start + entry["offset"] + entry["length"]]
+        summary = entry["summary"]
+        restored.setdefault(entry["mailbox"], []).append((_SnapshotMessage(message_data, summary["headers"]), summary))
+
+    count = 0
+    for mailbox, messages in restored.items():
+        current = _get_index(mailbox)
+        with current.lock:
+            # The restored messages first, built from their saved summaries rather than parsing them
+            index = _OutboxIndex([])
+            for message, summary in messages:
+                if summary["message_id"] in current.summaries or summary["message_id"] in index.summaries:
+                    continue
+                index.add(message, summary)
+                index.outbox.append(message)
+                count += 1
+            for message in current.outbox:
+                summary = current.summaries.get(message.get("message-id"))
+                if summary is not None:
+                    index.add(message, summary)
+                    index.outbox.append(message)
+            current.replace(index)
+    return count
+
+
+class _RingBuffer:
+    """
+    A fixed size buffer of records in a memory mapped file which any process on the host can append to and read from.
+    When it is full the oldest records are overwritten.
+
+    Records are addressed by their offset from the start of everything ever written, which wraps around the buffer.
+    The file starts with a header with the size of the buffer, the offset the next record is written at, and the offset
+    of the oldest record still in the buffer. Each record is its length followed by its data.
+    """
+
+    HEADER = struct.Struct("<4sIQQQ")
+    MAGIC = b"MVRB"
+    VERSION = 1
+    LENGTH = struct.Struct("<I")
+
+    def __init__(self, path: Path, capacity: int):
+        self.path = path
+        self.lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._file_lock(fd):
+                created = os.fstat(fd).st_size < self.HEADER.size
+                if created:
+                    os.ftruncate(fd, self.HEADER.size + capacity)
+                self.mm = mmap.mmap(fd, 0)
+                if created:
+                    self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, capacity, 0, 0)
+                # The size of a buffer which already exists is kept, whatever size is asked for
+                magic, version, self.capacity, _, _ = self.HEADER.unpack_from(self.mm, 0)
+                if magic != self.MAGIC or version != self.VERSION or len(self.mm) != self.HEADER.size + self.capacity:
+                    self.mm.close()
+                    raise ValueError(f"{path} is not a Django Mail Viewer shared outbox.")
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd = fd
+
+    @contextmanager
+    def _file_lock(self, fd: int, exclusive: bool = True) -> Iterator[None]:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked(self, exclusive: bool = True) -> Iterator[None]:
+        with self.lock, self._file_lock(self.fd, exclusive):
+            yield
+
+    def _positions(self) -> Tuple[int, int]:
+        _, _, _, head, tail = self.HEADER.unpack_from(self.mm, 0)
+        return head, tail
+
+    def _read(self, offset: int, size: int) -> bytes:
+        start = self.HEADER.size + offset % self.capacity
+        first = min(size, self.HEADER.size + self.capacity - start)
+        return self.mm[start : start + first] + self.mm[self.HEADER.size : self.HEADER.size + size - first]
+
+    def _write(self, offset: int, data: bytes):
+        start = self.HEADER.size + offset % self.capacity
+        first = min(len(data), self.HEADER.size + self.capacity - start)
+        self.mm[start : start + first] = data[:first]
+        self.mm[self.HEADER.size : self.HEADER.size + len(data) - first] = data[first:]
+
+    def append(self, records: List[bytes]):
+        """
+        Append records, dropping the oldest records to make room for them.
+        """
+        with self.locked():
+            head, tail = self._positions()
+            for record in records:
+                data = self.LENGTH.pack(len(record)) + record
+                if len(data) > self.capacity:
+                    raise ValueError(f"A record of {len(data)} bytes does not fit in the {self.capacity} byte buffer.")
+                while head + len(data) - tail > self.capacity:
+                    tail += self.LENGTH.size + self.LENGTH.unpack(self._read(tail, self.LENGTH.size))[0]
+                self._write(head, data)
+                head += len(data)
+            self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, self.capacity, head, tail)
+
+    def read(self, cursor: int) -> Tuple[int, int, List[Tuple[int, bytes]]]:
+        """
+        Return the offset of the oldest record, the offset after the newest, and the (offset, data) of each record
+        from `cursor` on, or from the oldest record if those at `cursor` have already been overwritten.
+        """
+        with self.locked(exclusive=False):
+            head, tail = self._positions()
+            records = []
+            offset = max(cursor, tail)
+            while offset < head:
+                size = self.LENGTH.unpack(self._read(offset, self.LENGTH.size))[0]
+                records.append((offset, self._read(offset + self.LENGTH.size, size)))
+                offset += self.LENGTH.size + size
+            return tail, head, records
+
+
+class _SharedOutbox:
+    """
+    The outboxes of this process kept in sync with a _RingBuffer shared by the processes on the host.
+
+    Each record is a line of JSON describing a message which was added, with its summary, or deleted, followed by the
+    raw message for those which were added. Reading the new records adds the messages to, and removes them from, the
+    same outbox lists and indexes EmailBackend uses, and removes the messages whose records have been overwritten.
+    """
+
+    def __init__(self, ring: _RingBuffer):
+        self.ring = ring
+        self.lock = threading.Lock()
+        self.cursor = 0
+        # (offset, mailbox, Message-ID) of the messages added from the ring, oldest first
+        self.added: Deque[Tuple[int, str, str]] = deque()
+
+    @staticmethod
+    def encode(entry: Dict[str, Any], message: bytes = b"") -> bytes:
+        return json.dumps(entry, separators=(",", ":")).encode() + b"\n" + message
+
+    def sync(self):
+        """
+        Apply the records appended to the ring since the last sync.
+        """
+        with self.lock:
+            tail, head, records = self.ring.read(self.cursor)
+            while self.added and self.added[0][0] < tail:
+                _, mailbox, message_id = self.added.popleft()
+                _get_index(mailbox).delete(message_id)
+            for offset, record in records:
+                entry_data, _, message = record.partition(b"\n")
+                entry = json.loads(entry_data)
+                if entry["op"] == "add":
+                    m = email.message_from_bytes(message)
+                    _get_index(entry["mailbox"]).append(m, entry["summary"])
+                    self.added.append((offset, entry["mailbox"], entry["summary"]["message_id"]))
+                else:
+                    _get_index(entry["mailbox"]).delete(entry["message_id"])
+            self.cursor = head
+
+
+# Ring buffer path -> this process's view of it
+_shared_outboxes: Dict[Path, _SharedOutbox] = {}
+_shared_outboxes_lock = threading.Lock()
+
+
+def _get_shared_outbox() -> _SharedOutbox:
+    path = Path(
+        mailviewer_settings.MAILVIEWER_SHARED_OUTBOX_PATH
+        or Path(tempfile.gettempdir(), "django_mail_viewer_outbox.ring")
+    )
+    with _shared_outboxes_lock:
+        if path not in _shared_outboxes:
+            ring = _RingBuffer(path, mailviewer_settings.MAILVIEWER_SHARED_OUTBOX_SIZE)
+            _shared_outboxes[path] = _SharedOutbox(ring)
+        return _shared_outboxes[path]
+
+
+class SharedEmailBackend(EmailBackend):
+    """
+    A locmem backend whose outbox is shared by every process on the host, such as the workers of gunicorn or the
+    processes runserver restarts, with no other dependencies.
+
+    Email is written to a fixed size ring buffer in a memory mapped file at `settings.MAILVIEWER_SHARED_OUTBOX_PATH`,
+    which holds `settings.MAILVIEWER_SHARED_OUTBOX_SIZE` bytes of email before overwriting the oldest. Each process
+    reads what the others have written into its own mail.outbox and mail.mailviewer_outboxes before looking anything
+    up, so the outboxes and their indexes work just as they do for EmailBackend.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shared_outbox = _get_shared_outbox()
+
+    def send_messages(self, messages):
+        records = []
+        for message in messages:
+            m = message.message()
+            entry = {
+                "op": "add",
+                "mailbox": message_mailbox(m, self.mailbox),
+                "summary": message_summary(m, message_addresses(message)),
+            }
+            records.append(self.shared_outbox.encode(entry, m.as_bytes()))
+        self.shared_outbox.ring.append(records)
+        return len(records)
+
+    def get_message(self, lookup_id):
+        self.shared_outbox.sync()
+        return super().get_message(lookup_id)
+
+    def get_outbox(self, *args, **kwargs):
+        self.shared_outbox.sync()
+        return super().get_outbox(*args, **kwargs)
+
+    def get_thread(self, message_id: str):
+        self.shared_outbox.sync()
+        return super().get_thread(message_id)
+
+    def delete_message(self, message_id: str):
+        self.shared_outbox.ring.append(
+            [self.shared_outbox.encode({"op": "delete", "mailbox": self.mailbox, "message_id": message_id})]
+        )
+        self.shared_outbox.sync()
@@ -0,0 +1,510 @@
+"""
+Backend appending email to an mbox file and reading it back through mmap.
+"""
+
+import bisect
+import email
+import heapq
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections.abc import Sequence
+from email.parser import BytesHeaderParser
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .utils import (
+    OutboxQuery,
+    date_index_insert,
+    header_addresses,
+    is_attachment,
+    mbox_entry,
+    mbox_unquote,
+    message_addresses,
+    message_summary,
+    message_thread_ids,
+    parse_date_header,
+    resolve_thread_id,
+)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where appends are left unlocked
+    fcntl = None
+
+# The line separating one message from the next, which starts the From_ line of the next message
+MESSAGE_SEPARATOR = b"\n\nFrom "
+# Parts which are attachments, and parts with any disposition which may be, see utils.is_attachment()
+_ATTACHMENT_RE = re.compile(rb"^content-disposition:[ \t]*attachment", re.MULTILINE | re.IGNORECASE)
+_DISPOSITION_RE = re.compile(rb"^content-disposition:", re.MULTILINE | re.IGNORECASE)
+# The headers read while scanning for new messages, with any folded lines of their values
+_INDEXED_HEADER_RE = re.compile(rb"^(message-id|date):(.*(?:\n[ \t].*)*)", re.MULTILINE | re.IGNORECASE)
+
+
+def _message_id_hash(message_id: str) -> int:
+    """
+    A 64 bit hash of a Message-ID, as a signed integer for array("q").
+    """
+    return int.from_bytes(
+        blake2b(message_id.encode(errors="surrogateescape"), digest_size=8).digest(), "big", signed=True
+    )
+
+
+def _header_values(headers: bytes) -> Dict[str, str]:
+    """
+    Return the lower cased names and values of the first Message-ID and Date headers in the raw headers of an email,
+    the same as email.parser.BytesHeaderParser gets, without parsing the rest of them.
+    """
+    values: Dict[str, str] = {}
+    for match in _INDEXED_HEADER_RE.finditer(headers):
+        name = match.group(1).decode().lower()
+        if name not in values:
+            values[name] = match.group(2).decode("ascii", errors="surrogateescape").lstrip(" \t").rstrip("\r\n")
+    return values
+
+
+class _MboxIndex:
+    """
+    The offsets of the messages in an mbox file, along with the few values needed to look them up, read so far by
+    this process. Only the part of the file appended since the last refresh is scanned, reading just the Message-ID
+    and Date headers of each message.
+
+    Everything kept per message is in arrays rather than a Python object per message so that files with millions of
+    messages can be indexed. Messages are identified by their position, the order they were appended in. The threads
+    are only worked out once get_thread() is used.
+    """
+
+    # Hashes of Message-IDs appended since the sorted arrays of them were built are kept in a dict until there are
+    # more than this, or a 64th of the messages, and then sorted into the arrays
+    MAX_UNSORTED_HASHES = 1024
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.deleted_path = path.with_name(path.name + ".deleted")
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.inode: Optional[int] = None
+        self.mm: Optional[mmap.mmap] = None
+        # How much of the mbox file and of the file of deleted messages has been read
+        self.scanned = 0
+        self.deleted_scanned = 0
+        # Per position, where the message's From_ line starts, where its headers end, and where it ends
+        self.starts = array("q")
+        self.header_ends = array("q")
+        self.ends = array("q")
+        # Per position, the timestamp of when the message was sent and whether it has been deleted
+        self.dates = array("d")
+        self.deleted = bytearray()
+        self.deleted_count = 0
+        # Positions sorted by date and the dates in the same order. Email is almost always appended in date order,
+        # so keeping them sorted as messages are added is nearly always an append, and the rest are merged in at the
+        # end of each scan.
+        self.by_date: Tuple[array, array] = (array("q"), array("d"))
+        self.unsorted_dates: List[int] = []
+        # Hashes of the Message-IDs sorted, with the position of each in the same order, and the positions of the
+        # messages not sorted into them yet by hash
+        self.sorted_hashes: Tuple[array, array] = (array("q"), array("q"))
+        self.unsorted_hashes: Dict[int, List[int]] = {}
+        # Message-ID -> thread id, and thread id -> (timestamp, Message-ID) of the messages in it sorted by date, for
+        # the messages before position `threaded`
+        self.threaded = 0
+        self.thread_of: Dict[str, str] = {}
+        self.threads: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def refresh(self) -> "_MboxIndex":
+        """
+        Index the messages appended to the mbox file and the messages appended to its file of deleted messages since
+        the last refresh.
+        """
+        with self.lock:
+            try:
+                with open(self.path, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino != self.inode or stat.st_size < self.scanned:
+                        self.reset()
+                        self.inode = stat.st_ino
+                    if stat.st_size > self.scanned:
+                        if fcntl is not None:
+                            # Wait for any message still being appended
+                            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+                        try:
+                            # A new map is needed to see past the end of the file when it was last mapped
+                            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                            self._scan()
+                        finally:
+                            # Released explicitly since the map holds a duplicate of the file descriptor, which
+                            # would keep the lock until the map is closed
+                            if fcntl is not None:
+                                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            except FileNotFoundError:
+                self.reset()
+                return self
+            self._read_deleted()
+            return self
+
+    def _scan(self):
+        mm = self.mm
+        size = len(mm)
+        start = self.scanned
+        while start < size:
+            separator = mm.find(MESSAGE_SEPARATOR, start)
+            # Each message is written ending with a blank line, so the last one ends at the end of the file
+            end = separator + 1 if separator != -1 else size - 1
+            content_start = mm.find(b"\n", start, end) + 1
+            header_end = mm.find(b"\n\n", content_start - 1, end)
+            header_end = header_end + 1 if header_end != -1 else end
+            self._add(start, header_end, end, _header_values(mm[content_start:header_end]))
+            start = separator + 2 if separator != -1 else size
+        self.scanned = size
+        if self.unsorted_dates:
+            self._sort_dates()
+        if len(self.unsorted_hashes) > max(self.MAX_UNSORTED_HASHES, len(self) // 64):
+            self._sort_hashes()
+
+    def _add(self, start: int, header_end: int, end: int, headers: Dict[str, str]):
+        date = parse_date_header(headers.get("date"))
+        timestamp = date.timestamp() if date is not None else 0
+        position = len(self.starts)
+        self.starts.append(start)
+        self.header_ends.append(header_end)
+        self.ends.append(end)
+        self.dates.append(timestamp)
+        self.deleted.append(0)
+        self.unsorted_hashes.setdefault(_message_id_hash(headers.get("message-id", "")), []).append(position)
+        date_positions, sorted_dates = self.by_date
+        if not self.unsorted_dates and (not sorted_dates or timestamp >= sorted_dates[-1]):
+            # The positions first so that a reader going by the dates never finds a date without its position
+            date_positions.append(position)
+            sorted_dates.append(timestamp)
+        else:
+            self.unsorted_dates.append(position)
+
+    def _sort_dates(self):
+        date_positions, sorted_dates = self.by_date
+        unsorted = sorted(self.unsorted_dates, key=self.dates.__getitem__)
+        merged = heapq.merge(zip(sorted_dates, date_positions), ((self.dates[p], p) for p in unsorted))
+        positions = array("q")
+        dates = array("d")
+        for date, position in merged:
+            positions.append(position)
+            dates.append(date)
+        self.by_date = (positions, dates)
+        self.unsorted_dates = []
+
+    def _sort_hashes(self):
+        hashes, positions = (array("q", a) for a in self.sorted_hashes)
+        for message_hash, message_positions in self.unsorted_hashes.items():
+            for position in message_positions:
+                hashes.append(message_hash)
+                positions.append(position)
+        order = sorted(range(len(hashes)), key=lambda i: (hashes[i], positions[i]))
+        # Swapped in before the unsorted hashes are cleared, so that find() never misses a message in between
+        self.sorted_hashes = (array("q", (hashes[i] for i in order)), array("q", (positions[i] for i in order)))
+        self.unsorted_hashes = {}
+
+    def message_id(self, position: int) -> str:
+        start = self.starts[position]
+        content_start = self.mm.find(b"\n", start, self.header_ends[position]) + 1
+        return _header_values(self.mm[content_start : self.header_ends[position]]).get("message-id", "")
+
+    def find(self, message_id: str) -> List[int]:
+        """
+        Return the positions of the messages with a Message-ID which have not been deleted, oldest first.
+        """
+        message_hash = _message_id_hash(message_id)
+        # Read in the opposite order to how _sort_hashes() replaces them
+        unsorted = self.unsorted_hashes.get(message_hash, [])
+        hashes, positions = self.sorted_hashes
+        low = bisect.bisect_left(hashes, message_hash)
+        high = bisect.bisect_right(hashes, message_hash, low)
+        candidates = sorted(set(positions[low:high]).union(unsorted))
+        # Checked against the message itself since different Message-IDs can have the same hash
+        return [p for p in candidates if not self.deleted[p] and self.message_id(p) == message_id]
+
+    def position(self, message_id: str) -> Optional[int]:
+        """
+        Return the position of the most recently stored message with a Message-ID, or None.
+        """
+        found = self.find(message_id)
+        return found[-1] if found else None
+
+    def _read_deleted(self):
+        try:
+            with open(self.deleted_path, "rb") as f:
+                f.seek(self.deleted_scanned)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            offset, _, message_id = line.partition(b" ")
+            if offset.isdigit() and message_id:
+                positions = self._at_offset(int(offset), message_id.decode())
+            else:
+                # Written before deletes recorded where the message is, so every message with the id stored by then
+                positions = self.find(line.decode())
+            for position in positions:
+                self.deleted[position] = 1
+                self.deleted_count += 1
+        self.deleted_scanned += end
+
+    def _at_offset(self, offset: int, message_id: str) -> List[int]:
+        """
+        Return the position of the message which has not been deleted whose From_ line starts at `offset` if it has
+        the given Message-ID, so that a message stored again after it was deleted is not deleted too.
+        """
+        position = bisect.bisect_left(self.starts, offset)
+        if (
+            position < len(self)
+            and self.starts[position] == offset
+            and not self.deleted[position]
+            and self.message_id(position) == message_id
+        ):
+            return [position]
+        return []
+
+    def summary(self, position: int) -> Dict[str, Any]:
+        """
+        Return the summary of a message from its headers, the same as utils.message_summary() makes, without parsing
+        its body. Bcc addresses are not in the file so are not included.
+        """
+        start, header_end, end = self.starts[position], self.header_ends[position], self.ends[position]
+        headers = BytesHeaderParser().parsebytes(mbox_unquote(self.mm[start:header_end]).split(b"\n", 1)[1])
+        return {
+            "message_id": str(headers.get("message-id", "")),
+            "subject": str(headers.get("subject", "")),
+            "addresses": header_addresses(headers),
+            "date": self.dates[position],
+            "has_attachments": self.has_attachments(position),
+            "headers": {name.lower(): str(value) for name, value in headers.items()},
+        }
+
+    def has_attachments(self, position: int) -> bool:
+        """
+        Return whether a message has attachments, searching for them in place without copying the message out of the
+        file. Only a message with inline parts is parsed, to tell inline bodies from inline attachments.
+        """
+        header_end, end = self.header_ends[position], self.ends[position]
+        if _ATTACHMENT_RE.search(self.mm, header_end, end) is not None:
+            return True
+        if _DISPOSITION_RE.search(self.mm, header_end, end) is None:
+            return False
+        return any(is_attachment(part) for part in self.message(position).walk())
+
+    def message(self, position: int):
+        """
+        Parse the message at a position.
+        """
+        start, end = self.starts[position], self.ends[position]
+        data = self.mm[start:end]
+        return email.message_from_bytes(mbox_unquote(data[data.index(b"\n") + 1 :]))
+
+    def query(self, query: OutboxQuery) -> List[int]:
+        """
+        Return the positions of the messages matching an OutboxQuery, in order.
+        """
+        if query.uses_dates:
+            positions, dates = self.by_date
+            low = bisect.bisect_left(dates, query.since.timestamp()) if query.since is not None else 0
+            high = bisect.bisect_left(dates, query.until.timestamp()) if query.until is not None else len(dates)
+            candidates: Sequence = positions[low:high]
+        else:
+            candidates = range(len(self))
+        if query.ordering.startswith("-"):
+            candidates = candidates[::-1]
+        check_summaries = query.uses_summaries or query.sender or query.recipient
+        found = []
+        for position in candidates:
+            if self.deleted[position]:
+                continue
+            if check_summaries and not query.matches(self.summary(position)):
+                continue
+            found.append(position)
+            # Stop parsing headers as soon as there are enough matches
+            if query.limit is not None and len(found) >= query.limit:
+                break
+        return found
+
+    def _thread_messages(self):
+        """
+        Add the messages appended since the threads were last worked out to them.
+        """
+        for position in range(self.threaded, len(self)):
+            start = self.starts[position]
+            content_start = self.mm.find(b"\n", start, self.header_ends[position]) + 1
+            headers = BytesHeaderParser().parsebytes(mbox_unquote(self.mm[content_start : self.header_ends[position]]))
+            message_id = str(headers.get("message-id", ""))
+            thread_id, merged = resolve_thread_id(
+                message_thread_ids(headers),
+                lambda candidate: self.thread_of.get(candidate) or (candidate if candidate in self.threads else None),
+            )
+            thread = self.threads.setdefault(thread_id, [])
+            for merged_id in merged:
+                for entry in self.threads.pop(merged_id):
+                    self.thread_of[entry[1]] = thread_id
+                    date_index_insert(thread, {"date": entry[0], "message_id": entry[1]})
+            self.thread_of[message_id] = thread_id
+            date_index_insert(thread, {"date": self.dates[position], "message_id": message_id})
+        self.threaded = len(self)
+
+    def thread(self, message_id: str) -> List[int]:
+        """
+        Return the positions of the messages in the same thread as a message, oldest first.
+        """
+        with self.lock:
+            self._thread_messages()
+            thread_id = self.thread_of.get(message_id) or message_id
+            message_ids = [i for _, i in self.threads.get(thread_id, [])]
+        positions = [self.position(i) for i in dict.fromkeys(message_ids)]
+        return [p for p in positions if p is not None]
+
+
+class _MboxMessages(Sequence):
+    """
+    The messages at some positions of an mbox file, which are only parsed when they are accessed so that slicing out
+    a page of them does not parse the rest.
+    """
+
+    def __init__(self, index: _MboxIndex, positions: Sequence):
+        self.index = index
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.index.message(p) for p in self.positions[i]]
+        return self.index.message(self.positions[i])
+
+    def __iter__(self) -> Iterator:
+        for p in self.positions:
+            yield self.index.message(p)
+
+
+# mbox file path -> index of that file
+_indexes: Dict[Path, _MboxIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(path: Path) -> _MboxIndex:
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = _MboxIndex(path)
+    return _indexes[path].refresh()
+
+
+class EmailBackend(BaseEmailBackend):
+    """
+    An email backend to use during testing and local development with Django Mail Viewer.
+
+    Appends email to the mbox file at `settings.MAILVIEWER_MBOX_PATH`, which mail clients can open directly. Each
+    process keeps an index of where each message is in the file, built by scanning only the part of the file appended
+    since it last looked, and reads messages through mmap slices of the file so that showing a page of email or one
+    email only parses those messages. This is meant for capturing very large amounts of email, such as in soak tests.
+
+    Every mailbox other than the default has a file of its own next to it, named with the mailbox name before the
+    extension. The mbox format has no way to delete a message, so the offsets and Message-IDs of deleted messages are
+    listed in a second file, with ".deleted" added to the name, and left out by this backend but not by mail clients. Appends are locked with
+    flock() where it is available.
+    """
+
+    def __init__(self, *args, mailbox: Optional[str] = None, mbox_path: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
+        mbox_path = mbox_path or mailviewer_settings.MAILVIEWER_MBOX_PATH
+        if not mbox_path:
+            raise ImproperlyConfigured("django_mail_viewer.backends.mbox.EmailBackend requires MAILVIEWER_MBOX_PATH.")
+        self.mbox_path = Path(mbox_path)
+        if self.mailbox:
+            self.path = self.mbox_path.with_name(f"{self.mbox_path.stem}.{self.mailbox}{self.mbox_path.suffix}")
+        else:
+            self.path = self.mbox_path
+
+    def _for_mailbox(self, mailbox: str) -> "EmailBackend":
+        """
+        Return a backend for another mailbox next to the same file.
+        """
+        return type(self)(mailbox=mailbox, mbox_path=str(self.mbox_path), fail_silently=self.fail_silently)
+
+    def send_messages(self, messages):
+        stored: Dict[str, List[bytes]] = {}
+        for message in messages:
+            m = message.message()
+            mailbox = message_mailbox(m, self.mailbox)
+            summary = message_summary(m, message_addresses(message))
+            if message.bcc and "bcc" not in m:
+                # Kept in the file, as mail clients do for sent email, so that the Bcc recipients can be looked up
+                m["Bcc"] = ", ".join(message.bcc)
+            sender = summary["addresses"]["from"][0] if summary["addresses"]["from"] else ""
+            stored.setdefault(mailbox, []).append(mbox_entry(m.as_bytes(), sender, summary["date"]))
+        for mailbox, entries in stored.items():
+            backend = self if mailbox == self.mailbox else self._for_mailbox(mailbox)
+            backend._append(backend.path, b"".join(entries))
+        return sum(len(entries) for entries in stored.values())
+
+    @staticmethod
+    def _append(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, data)
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+    def get_message(self, lookup_id):
+        """
+        Look up and return a specific message in the outbox
+        """
+        index = _get_index(self.path)
+        position = index.position(lookup_id)
+        return index.message(position) if position is not None else None
+
+    def get_outbox(self, *args, **kwargs):
+        """
+        Get the outbox used by this backend.  This backend returns a sequence which parses each message as it is
+        accessed.
+        May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments.
+        """
+        index = _get_index(self.path)
+        if kwargs:
+            return _MboxMessages(index, index.query(OutboxQuery(**kwargs)))
+        if not index.deleted_count:
+            return _MboxMessages(index, range(len(index)))
+        return _MboxMessages(index, [p for p in range(len(index)) if not index.deleted[p]])
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        index = _get_index(self.path)
+        return _MboxMessages(index, index.thread(message_id))
+
+    def delete_message(self, message_id: str):
+        """
+        Remove the message with the given id from the mailbox
+        """
+        index = _get_index(self.path)
+        lines = [f"{index.starts[position]} {message_id}\n".encode() for position in index.find(message_id)]
+        if lines:
+            self._append(index.deleted_path, b"".join(lines))
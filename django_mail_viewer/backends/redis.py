@@ -0,0 +1,432 @@
+"""
+Backend storing email in Redis data structures.
+"""
+
+import json
+import pickle
+from email.message import Message
+from hashlib import sha1
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.core import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .locmem import _SnapshotMessage
+from .utils import (
+    OutboxQuery,
+    message_addresses,
+    message_recipients,
+    message_summary,
+    message_thread_ids,
+    resolve_thread_id,
+)
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# MAILVIEWER_REDIS_URL -> client, so that every backend for a URL shares the client's connection pool
+_clients: Dict[str, Any] = {}
+
+
+def _get_client(cache_alias: Optional[str] = None):
+    """
+    Return a client for `settings.MAILVIEWER_REDIS_URL`, or else for the Redis server of a Django RedisCache.
+    """
+    if redis is None:
+        raise ImproperlyConfigured("django_mail_viewer.backends.redis.EmailBackend requires the redis package.")
+    url = mailviewer_settings.MAILVIEWER_REDIS_URL
+    if url and not cache_alias:
+        if url not in _clients:
+            _clients[url] = redis.Redis.from_url(url)
+        return _clients[url]
+    mail_cache = cache.caches[cache_alias or mailviewer_settings.MAILVIEWER_CACHE]
+    # django.core.cache.backends.redis.RedisCache, which is in Django 4.0 and later
+    get_client = getattr(getattr(mail_cache, "_cache", None), "get_client", None)
+    if get_client is None:
+        raise ImproperlyConfigured(
+            "django_mail_viewer.backends.redis.EmailBackend requires MAILVIEWER_REDIS_URL or for MAILVIEWER_CACHE to "
+            "be a django.core.cache.backends.redis.RedisCache."
+        )
+    return get_client(write=True)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class _RedisMessage(_SnapshotMessage):
+    """
+    A message in the outbox which only reads its pickle from Redis once something other than its headers is needed,
+    so that listing email only reads the headers in the summaries.
+    """
+
+    def __init__(self, backend: "EmailBackend", message_id: str, headers: Dict[str, str]):
+        super().__init__(memoryview(b""), headers)
+        self._backend = backend
+        self._message_id = message_id
+
+    def _parsed(self):
+        if self._message is None:
+            found = self._backend.client.get(self._backend.message_key(self._message_id))
+            if found is not None:
+                self._message = pickle.loads(found)
+            else:
+                # Deleted since the outbox was read, so only the headers read with it are left
+                self._message = Message()
+                for name, value in self._headers.items():
+                    self._message[name] = value
+        return self._message
+
+    def as_bytes(self, *args, **kwargs) -> bytes:
+        return self._parsed().as_bytes(*args, **kwargs)
+
+
+class EmailBackend(BaseEmailBackend):
+    """
+    An email backend to use during testing and local development with Django Mail Viewer.
+
+    Stores email on a Redis server in Redis' own data structures rather than in lists pickled into the cache, so that
+    adding, deleting, and paging through email does not read and rewrite the whole index or need a lock. For each
+    mailbox there are sorted sets of Message-IDs in the order they were stored, by when they were sent, and for each
+    address and thread. The summary of each email used for filtering is a hash and the email itself is pickled.
+
+    Connects to `settings.MAILVIEWER_REDIS_URL`, or else to the server of the MAILVIEWER_CACHE cache, which must be a
+    django.core.cache.backends.redis.RedisCache. A redis.Redis client may also be passed as `client`, which must not
+    be created with decode_responses=True.
+    """
+
+    # How many Message-IDs get_outbox() reads from a sorted set at a time when it needs to check their summaries
+    page_size = 100
+
+    def __init__(
+        self,
+        *args,
+        mailbox: Optional[str] = None,
+        client: Any = None,
+        cache_alias: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
+        self.client = client if client is not None else _get_client(cache_alias)
+        self.key_prefix = f"mailviewer:{self.mailbox}"
+
+    def _for_mailbox(self, mailbox: str) -> "EmailBackend":
+        """
+        Return a backend for another mailbox on the same server.
+        """
+        return type(self)(mailbox=mailbox, client=self.client, fail_silently=self.fail_silently)
+
+    @property
+    def sequence_key(self) -> str:
+        """
+        Key for a counter numbering the messages in the order they were stored.
+        """
+        return f"{self.key_prefix}:sequence"
+
+    @property
+    def stored_key(self) -> str:
+        """
+        Key for the sorted set of the Message-IDs of every message, scored by the order they were stored in.
+        """
+        return f"{self.key_prefix}:stored"
+
+    @property
+    def date_index_key(self) -> str:
+        """
+        Key for the sorted set of the Message-IDs of every message, scored by the timestamp of when it was sent.
+        """
+        return f"{self.key_prefix}:dates"
+
+    def message_key(self, message_id: str) -> str:
+        """
+        Key for a pickled message.
+        """
+        return f"{self.key_prefix}:message:{message_id}"
+
+    def summary_key(self, message_id: str) -> str:
+        """
+        Key for the hash of the summary of a message.
+        """
+        return f"{self.key_prefix}:summary:{message_id}"
+
+    def recipient_key(self, address: str) -> str:
+        """
+        Key for the sorted set of the Message-IDs of the messages sent to an address, scored by the order they were
+        stored in.
+        """
+        return f"{self.key_prefix}:recipient:{sha1(address.encode()).hexdigest()}"
+
+    def sender_key(self, address: str) -> str:
+        """
+        Key for the sorted set of the Message-IDs of the messages sent from an address, scored by the order they were
+        stored in.
+        """
+        return f"{self.key_prefix}:sender:{sha1(address.encode()).hexdigest()}"
+
+    def thread_key(self, thread_id: str) -> str:
+        """
+        Key for the sorted set of the Message-IDs of the messages in a thread, scored by when they were sent.
+        """
+        return f"{self.key_prefix}:thread:{sha1(thread_id.encode()).hexdigest()}"
+
+    def _address_keys(self, summary: Dict[str, Any]) -> List[str]:
+        """
+        The keys of the address sorted sets a message with the given summary is in.
+        """
+        return [self.recipient_key(address) for address in message_recipients(summary["addresses"])] + [
+            self.sender_key(address) for address in summary["addresses"]["from"]
+        ]
+
+    @staticmethod
+    def _summary_to_hash(summary: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "message_id": summary["message_id"],
+            "subject": summary["subject"],
+            "addresses": json.dumps(summary["addresses"]),
+            "date": repr(summary["date"]),
+            "has_attachments": "1" if summary["has_attachments"] else "",
+            "headers": json.dumps(summary["headers"]),
+        }
+
+    @staticmethod
+    def _summary_from_hash(values: Dict[Any, Any]) -> Dict[str, Any]:
+        values = {_text(key): _text(value) for key, value in values.items()}
+        return {
+            "message_id": values["message_id"],
+            "subject": values["subject"],
+            "addresses": json.loads(values["addresses"]),
+            "date": float(values["date"]),
+            "has_attachments": bool(values["has_attachments"]),
+            "headers": json.loads(values["headers"]),
+            "thread_id": values.get("thread_id", ""),
+        }
+
+    def send_messages(self, messages):
+        stored: Dict[str, List[Tuple[Any, Dict[str, Any]]]] = {}
+        for message in messages:
+            m = message.message()
+            mailbox = message_mailbox(m, self.mailbox)
+            stored.setdefault(mailbox, []).append((m, message_summary(m, message_addresses(message))))
+        msg_count = 0
+        for mailbox, batch in stored.items():
+            backend = self if mailbox == self.mailbox else self._for_mailbox(mailbox)
+            backend._store_messages(batch)
+            msg_count += len(batch)
+        return msg_count
+
+    def _store_messages(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        """
+        Store email.message.Message objects and their summaries from utils.message_summary() in this backend's
+        mailbox with one round trip for the messages and index entries and then one transaction per message to add
+        it to its thread.
+        """
+        # Reserve a number for each message up front so they all go in a single pipeline
+        last = self.client.incrby(self.sequence_key, len(batch))
+        pipe = self.client.pipeline()
+        for sequence, (m, summary) in enumerate(batch, start=last - len(batch) + 1):
+            message_id = summary["message_id"]
+            pipe.set(self.message_key(message_id), pickle.dumps(m))
+            pipe.hset(self.summary_key(message_id), mapping=self._summary_to_hash(summary))
+            pipe.zadd(self.stored_key, {message_id: sequence})
+            pipe.zadd(self.date_index_key, {message_id: summary["date"]})
+            for key in self._address_keys(summary):
+                pipe.zadd(key, {message_id: sequence})
+        pipe.execute()
+        for m, summary in batch:
+            self._add_to_thread(summary, message_thread_ids(m))
+
+    def _add_to_thread(self, summary: Dict[str, Any], candidates: List[str]):
+        """
+        Add the message with the given summary to its thread, merging any threads it joins together.
+
+        Runs as a transaction which is retried if another process changes the same threads at the same time.
+        """
+        message_id = summary["message_id"]
+
+        def add_to_thread(pipe):
+            thread_ids = {c: pipe.hget(self.summary_key(c), "thread_id") for c in candidates}
+
+            def lookup_thread(candidate):
+                if thread_ids[candidate]:
+                    return _text(thread_ids[candidate])
+                return candidate if pipe.exists(self.thread_key(candidate)) else None
+
+            thread_id, merged = resolve_thread_id(candidates, lookup_thread)
+            thread_key = self.thread_key(thread_id)
+            merged_keys = [self.thread_key(i) for i in merged]
+            pipe.watch(thread_key, *merged_keys)
+            merged_ids = [_text(i) for key in merged_keys for i in pipe.zrange(key, 0, -1)]
+            pipe.multi()
+            if merged_keys:
+                pipe.zunionstore(thread_key, [thread_key] + merged_keys)
+                pipe.delete(*merged_keys)
+                for merged_id in merged_ids:
+                    pipe.hset(self.summary_key(merged_id), "thread_id", thread_id)
+            pipe.zadd(thread_key, {message_id: summary["date"]})
+            pipe.hset(self.summary_key(message_id), "thread_id", thread_id)
+
+        self.client.transaction(add_to_thread, *[self.summary_key(c) for c in candidates])
+
+    def get_message(self, lookup_id):
+        """
+        Look up and return a specific message in the outbox
+        """
+        found = self.client.get(self.message_key(lookup_id))
+        return pickle.loads(found) if found is not None else None
+
+    def _get_messages(self, message_ids: List[str]) -> list:
+        """
+        Get the messages with the given ids, in the same order, skipping any which are no longer stored.
+        """
+        if not message_ids:
+            return []
+        found = self.client.mget([self.message_key(message_id) for message_id in message_ids])
+        return [pickle.loads(m) for m in found if m is not None]
+
+    def _get_listed_messages(self, message_ids: List[str], headers: Dict[str, Dict[str, str]]) -> list:
+        """
+        Get messages with the given ids, in the same order, which only read their pickles once more than their
+        headers is needed, skipping any which are no longer stored.
+
+        `headers` has the headers of any of the messages whose summaries were already read.
+        """
+        missing = [message_id for message_id in message_ids if message_id not in headers]
+        if missing:
+            pipe = self.client.pipeline(transaction=False)
+            for message_id in missing:
+                pipe.hget(self.summary_key(message_id), "headers")
+            for message_id, value in zip(missing, pipe.execute()):
+                if value is not None:
+                    headers[message_id] = json.loads(value)
+        return [
+            _RedisMessage(self, message_id, headers[message_id]) for message_id in message_ids if message_id in headers
+        ]
+
+    def get_outbox(self, *args, **kwargs):
+        """
+        Get the outbox used by this backend.
+        May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments. The messages returned only
+        read the headers in their summaries until more of them is needed.
+        """
+        headers: Dict[str, Dict[str, str]] = {}
+        return self._get_listed_messages(self._query_message_ids(OutboxQuery(**kwargs), headers), headers)
+
+    def _query_message_ids(self, query: OutboxQuery, headers: Dict[str, Dict[str, str]]) -> List[str]:
+        """
+        Return the ids of the messages matching an OutboxQuery, in order, adding the headers of the messages whose
+        summaries were read to `headers`.
+        """
+        # Page through the one sorted set which both narrows down the messages the most and is already in the order
+        # asked for, and check the summaries of each page of messages for the rest of the filters. Stops reading as
+        # soon as there are `limit` matches, and without any summaries to check reads just `limit` members.
+        descending = query.ordering.startswith("-")
+        if query.uses_dates:
+            checks = [query.recipient, query.sender]
+        else:
+            if query.recipient:
+                key = self.recipient_key(query.recipient)
+            elif query.sender:
+                key = self.sender_key(query.sender)
+            else:
+                key = self.stored_key
+            checks = [query.recipient and query.sender]
+        check_summaries = query.uses_summaries or any(checks)
+        page_size = self.page_size if check_summaries else query.limit
+        if query.uses_dates:
+            pages = self._date_pages(query, descending, page_size)
+        else:
+            pages = self._pages(key, descending, page_size)
+
+        message_ids: List[str] = []
+        for page in pages:
+            if check_summaries:
+                pipe = self.client.pipeline(transaction=False)
+                for message_id in page:
+                    pipe.hgetall(self.summary_key(message_id))
+                matches = []
+                for message_id, values in zip(page, pipe.execute()):
+                    if values:
+                        summary = self._summary_from_hash(values)
+                        if query.matches(summary):
+                            matches.append(message_id)
+                            headers[message_id] = summary["headers"]
+                page = matches
+            message_ids.extend(page)
+            if query.limit is not None and len(message_ids) >= query.limit:
+                return message_ids[: query.limit]
+        return message_ids
+
+    def _pages(self, key: str, descending: bool, page_size: Optional[int]) -> Iterator[List[str]]:
+        """
+        Yield the members of a sorted set `page_size` at a time, or all of them at once when it is None.
+        """
+        start = 0
+        while True:
+            stop = start + page_size - 1 if page_size is not None else -1
+            page = self.client.zrevrange(key, start, stop) if descending else self.client.zrange(key, start, stop)
+            if not page:
+                return
+            yield [_text(i) for i in page]
+            if page_size is None:
+                return
+            start += page_size
+
+    def _date_pages(self, query: OutboxQuery, descending: bool, page_size: Optional[int]) -> Iterator[List[str]]:
+        """
+        Yield the ids of the messages sent at or after `query.since` and before `query.until` `page_size` at a time,
+        or all of them at once when it is None.
+        """
+        low = query.since.timestamp() if query.since is not None else "-inf"
+        high = f"({query.until.timestamp()!r}" if query.until is not None else "+inf"
+        start = 0
+        while True:
+            paging = {"start": start, "num": page_size} if page_size is not None else {}
+            if descending:
+                page = self.client.zrevrangebyscore(self.date_index_key, high, low, **paging)
+            else:
+                page = self.client.zrangebyscore(self.date_index_key, low, high, **paging)
+            if not page:
+                return
+            yield [_text(i) for i in page]
+            if page_size is None:
+                return
+            start += page_size
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        # A Message-ID which is not stored may still be the id of the thread its replies are in
+        thread_id = _text(self.client.hget(self.summary_key(message_id), "thread_id")) or message_id
+        return self._get_messages([_text(i) for i in self.client.zrange(self.thread_key(thread_id), 0, -1)])
+
+    def delete_message(self, message_id: str):
+        """
+        Remove the message with the given id from the mailbox
+        """
+        summary_key = self.summary_key(message_id)
+
+        def remove(pipe):
+            values = pipe.hgetall(summary_key)
+            pipe.multi()
+            pipe.delete(self.message_key(message_id), summary_key)
+            pipe.zrem(self.stored_key, message_id)
+            pipe.zrem(self.date_index_key, message_id)
+            if values:
+                summary = self._summary_from_hash(values)
+                for key in self._address_keys(summary):
+                    pipe.zrem(key, message_id)
+                if summary["thread_id"]:
+                    pipe.zrem(self.thread_key(summary["thread_id"]), message_id)
+
+        # Watching the summary retries the delete if a thread merge moves the message to another thread meanwhile
+        self.client.transaction(remove, summary_key)
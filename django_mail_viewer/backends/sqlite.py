@@ -0,0 +1,350 @@
+"""
+Backend storing email in an SQLite database of its own with the sqlite3 module rather than the Django ORM.
+"""
+
+import email
+import sqlite3
+import threading
+from email.message import Message
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .. import settings as mailviewer_settings
+from ..mailboxes import get_current_mailbox, message_mailbox, validate_mailbox
+from .locmem import _SnapshotMessage
+from .utils import (
+    ADDRESS_FIELDS,
+    RECIPIENT_FIELDS,
+    OutboxQuery,
+    message_addresses,
+    message_summary,
+    message_thread_ids,
+    resolve_thread_id,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    mailbox TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    has_attachments INTEGER NOT NULL,
+    thread_id TEXT NOT NULL,
+    message BLOB NOT NULL,
+    UNIQUE (mailbox, message_id)
+);
+CREATE INDEX IF NOT EXISTS messages_mailbox_sent_at ON messages (mailbox, sent_at);
+CREATE INDEX IF NOT EXISTS messages_mailbox_thread_id ON messages (mailbox, thread_id);
+CREATE TABLE IF NOT EXISTS addresses (
+    mailbox TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS addresses_mailbox_address ON addresses (mailbox, address, field);
+CREATE INDEX IF NOT EXISTS addresses_mailbox_message_id ON addresses (mailbox, message_id);
+CREATE TABLE IF NOT EXISTS headers (
+    mailbox TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS headers_mailbox_name_value ON headers (mailbox, name, value);
+CREATE INDEX IF NOT EXISTS headers_mailbox_message_id ON headers (mailbox, message_id);
+"""
+
+# Message-IDs looked up in each query for headers, well under SQLite's limit on the number of parameters
+HEADERS_BATCH_SIZE = 500
+
+_connections = threading.local()
+
+
+def _get_connection(path: str) -> sqlite3.Connection:
+    """
+    Return this thread's connection to the database at `path`, creating the schema the first time.
+
+    Connections are in autocommit mode so that transactions are started explicitly with BEGIN IMMEDIATE, which takes
+    the write lock up front rather than failing to upgrade a read lock when another process is writing.
+    """
+    connections = getattr(_connections, "connections", None)
+    if connections is None:
+        connections = _connections.connections = {}
+    if path not in connections:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        # WAL lets the viewer read while email is being captured, and with it NORMAL only syncs at checkpoints
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connections[path] = connection
+    return connections[path]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _RowMessage(_SnapshotMessage):
+    """
+    A message in the outbox which only reads its message column once something other than its headers is needed, so
+    that listing email only reads the headers table.
+    """
+
+    def __init__(self, path: str, mailbox: str, message_id: str, headers: Dict[str, str]):
+        super().__init__(memoryview(b""), headers)
+        self._path = path
+        self._mailbox = mailbox
+        self._message_id = message_id
+
+    def _read(self) -> Optional[bytes]:
+        row = (
+            _get_connection(self._path)
+            .execute(
+                "SELECT message FROM messages WHERE mailbox = ? AND message_id = ?", (self._mailbox, self._message_id)
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def _parsed(self):
+        if self._message is None:
+            data = self._read()
+            if data is not None:
+                self._message = email.message_from_bytes(data)
+            else:
+                # Deleted since the outbox was read, so only the headers read with it are left
+                self._message = Message()
+                for name, value in self._headers.items():
+                    self._message[name] = value
+        return self._message
+
+    def as_bytes(self, *args, **kwargs) -> bytes:
+        if self._message is None and not args and not kwargs:
+            data = self._read()
+            if data is not None:
+                return bytes(data)
+        return self._parsed().as_bytes(*args, **kwargs)
+
+
+class EmailBackend(BaseEmailBackend):
+    """
+    An email backend to use during testing and local development with Django Mail Viewer.
+
+    Stores email in the SQLite database file at `settings.MAILVIEWER_SQLITE_PATH` using the sqlite3 module directly,
+    with a schema of its own which it creates as needed, so there are no models or migrations and each call to
+    send_messages() is a single transaction of batched inserts. The database is in WAL mode so that several processes
+    can capture email and read it at the same time.
+    """
+
+    def __init__(self, *args, mailbox: Optional[str] = None, sqlite_path: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mailbox = validate_mailbox(mailbox) if mailbox is not None else get_current_mailbox()
+        self.sqlite_path = str(sqlite_path or mailviewer_settings.MAILVIEWER_SQLITE_PATH or "")
+        if not self.sqlite_path:
+            raise ImproperlyConfigured(
+                "django_mail_viewer.backends.sqlite.EmailBackend requires MAILVIEWER_SQLITE_PATH."
+            )
+
+    @property
+    def database(self) -> sqlite3.Connection:
+        """
+        This thread's connection to the database.
+        """
+        return _get_connection(self.sqlite_path)
+
+    def send_messages(self, messages):
+        stored: Dict[str, List[Tuple[Any, Dict[str, Any]]]] = {}
+        for message in messages:
+            m = message.message()
+            mailbox = message_mailbox(m, self.mailbox)
+            stored.setdefault(mailbox, []).append((m, message_summary(m, message_addresses(message))))
+        if not stored:
+            return 0
+        connection = self.database
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for mailbox, batch in stored.items():
+                self._write_messages(connection, mailbox, batch)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return sum(len(batch) for batch in stored.values())
+
+    def _write_messages(self, connection: sqlite3.Connection, mailbox: str, batch: List[Tuple[Any, Dict[str, Any]]]):
+        """
+        Insert the email.message.Message objects and their summaries from utils.message_summary() into a mailbox.
+
+        Must be called in a transaction.
+        """
+        # The thread of each message in the batch, so that later messages in the batch can join it before it is
+        # inserted
+        batch_threads: Dict[str, str] = {}
+
+        def lookup_thread(candidate):
+            if candidate in batch_threads:
+                return batch_threads[candidate]
+            row = connection.execute(
+                "SELECT thread_id FROM messages WHERE mailbox = ? AND message_id = ?", (mailbox, candidate)
+            ).fetchone()
+            if row:
+                return row[0]
+            if candidate in batch_threads.values():
+                return candidate
+            row = connection.execute(
+                "SELECT 1 FROM messages WHERE mailbox = ? AND thread_id = ? LIMIT 1", (mailbox, candidate)
+            ).fetchone()
+            return candidate if row else None
+
+        for m, summary in batch:
+            thread_id, merged = resolve_thread_id(message_thread_ids(m), lookup_thread)
+            if merged:
+                connection.executemany(
+                    "UPDATE messages SET thread_id = ? WHERE mailbox = ? AND thread_id = ?",
+                    [(thread_id, mailbox, merged_id) for merged_id in merged],
+                )
+                for message_id, batch_thread_id in batch_threads.items():
+                    if batch_thread_id in merged:
+                        batch_threads[message_id] = thread_id
+            batch_threads[summary["message_id"]] = thread_id
+
+        message_ids = [(mailbox, summary["message_id"]) for _, summary in batch]
+        # Replaces any message stored before with the same Message-ID, along with its addresses and headers
+        connection.executemany("DELETE FROM addresses WHERE mailbox = ? AND message_id = ?", message_ids)
+        connection.executemany("DELETE FROM headers WHERE mailbox = ? AND message_id = ?", message_ids)
+        connection.executemany(
+            "INSERT OR REPLACE INTO messages "
+            "(mailbox, message_id, subject, sent_at, has_attachments, thread_id, message) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    mailbox,
+                    summary["message_id"],
+                    summary["subject"],
+                    summary["date"],
+                    summary["has_attachments"],
+                    batch_threads[summary["message_id"]],
+                    m.as_bytes(),
+                )
+                for m, summary in batch
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO addresses (mailbox, message_id, field, address) VALUES (?, ?, ?, ?)",
+            [
+                (mailbox, summary["message_id"], field, address)
+                for _, summary in batch
+                for field in ADDRESS_FIELDS
+                for address in summary["addresses"][field]
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO headers (mailbox, message_id, name, value) VALUES (?, ?, ?, ?)",
+            [
+                (mailbox, summary["message_id"], name, value)
+                for _, summary in batch
+                for name, value in summary["headers"].items()
+            ],
+        )
+
+    def _messages(self, rows) -> list:
+        return [email.message_from_bytes(row[0]) for row in rows]
+
+    def _lazy_messages(self, message_ids: List[str]) -> list:
+        """
+        The messages with the given Message-IDs, in that order, reading only their headers until more is needed.
+        """
+        headers: Dict[str, Dict[str, str]] = {message_id: {} for message_id in message_ids}
+        for start in range(0, len(message_ids), HEADERS_BATCH_SIZE):
+            batch = message_ids[start : start + HEADERS_BATCH_SIZE]
+            rows = self.database.execute(
+                "SELECT message_id, name, value FROM headers WHERE mailbox = ? "
+                f"AND message_id IN ({', '.join('?' for _ in batch)}) ORDER BY rowid",
+                [self.mailbox, *batch],
+            )
+            for message_id, name, value in rows:
+                headers[message_id][name] = value
+        return [
+            _RowMessage(self.sqlite_path, self.mailbox, message_id, headers[message_id]) for message_id in message_ids
+        ]
+
+    def get_message(self, lookup_id):
+        """
+        Look up and return a specific message in the outbox
+        """
+        row = self.database.execute(
+            "SELECT message FROM messages WHERE mailbox = ? AND message_id = ?", (self.mailbox, lookup_id)
+        ).fetchone()
+        return self._messages([row])[0] if row else None
+
+    def get_outbox(self, *args, **kwargs):
+        """
+        Get the outbox used by this backend.
+        May add pagination args/kwargs.
+
+        Takes the filters, ordering, and limit of utils.OutboxQuery as keyword arguments. The messages returned only
+        read their headers from the database until more of them is needed.
+        """
+        query = OutboxQuery(**kwargs)
+        conditions = ["mailbox = ?"]
+        params: List[Any] = [self.mailbox]
+        if query.subject:
+            conditions.append("subject LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(query.subject)}%")
+        for address, fields in [(query.sender, ("from",)), (query.recipient, RECIPIENT_FIELDS)]:
+            if address:
+                conditions.append(
+                    "message_id IN (SELECT message_id FROM addresses WHERE mailbox = ? AND address = ? "
+                    f"AND field IN ({', '.join('?' for _ in fields)}))"
+                )
+                params.extend([self.mailbox, address, *fields])
+        if query.since is not None:
+            conditions.append("sent_at >= ?")
+            params.append(query.since.timestamp())
+        if query.until is not None:
+            conditions.append("sent_at < ?")
+            params.append(query.until.timestamp())
+        if query.has_attachments is not None:
+            conditions.append("has_attachments = ?")
+            params.append(query.has_attachments)
+        for name, value in query.headers.items():
+            conditions.append(
+                "message_id IN (SELECT message_id FROM headers WHERE mailbox = ? AND name = ? AND value = ?)"
+            )
+            params.extend([self.mailbox, name, value])
+        ordering = {"date": "sent_at, id", "-date": "sent_at DESC, id DESC"}.get(query.ordering, "id")
+        sql = f"SELECT message_id FROM messages WHERE {' AND '.join(conditions)} ORDER BY {ordering}"
+        if query.limit is not None:
+            sql += " LIMIT ?"
+            params.append(query.limit)
+        return self._lazy_messages([row[0] for row in self.database.execute(sql, params)])
+
+    def get_thread(self, message_id: str):
+        """
+        Get the messages in the same thread as the message with the given id, oldest first, as found from their
+        Message-ID, In-Reply-To, and References headers.
+        """
+        # A Message-ID which is not stored may still be the id of the thread its replies are in
+        rows = self.database.execute(
+            "SELECT message FROM messages WHERE mailbox = ? AND thread_id = COALESCE("
+            "(SELECT thread_id FROM messages WHERE mailbox = ? AND message_id = ?), ?) ORDER BY sent_at, message_id",
+            (self.mailbox, self.mailbox, message_id, message_id),
+        )
+        return self._messages(rows)
+
+    def delete_message(self, message_id: str):
+        """
+        Remove the message with the given id from the mailbox
+        """
+        connection = self.database
+        params = (self.mailbox, message_id)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM messages WHERE mailbox = ? AND message_id = ?", params)
+            connection.execute("DELETE FROM addresses WHERE mailbox = ? AND message_id = ?", params)
+            connection.execute("DELETE FROM headers WHERE mailbox = ? AND message_id = ?", params)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
@@ -0,0 +1,298 @@
+"""
+Helpers shared by the Django Mail Viewer email backends
+"""
+
+import bisect
+import dataclasses
+import datetime
+import re
+import time
+from email.utils import formatdate, getaddresses, make_msgid, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.mail.utils import DNS_NAME
+
+# The address fields of an email which backends index, in the order they are stored
+ADDRESS_FIELDS = ("from", "to", "cc", "bcc")
+# The address fields which make an address a recipient of an email
+RECIPIENT_FIELDS = ("to", "cc", "bcc")
+# Lines which look like a From_ line, or one already quoted, are quoted with ">" in mbox files, as in the mboxrd format
+_FROM_LINE_RE = re.compile(rb"^(>*From )", re.MULTILINE)
+_QUOTED_FROM_LINE_RE = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+
+def normalize_addresses(values: Iterable[str]) -> List[str]:
+    """
+    Return the bare, lower cased email addresses from header style values such as `"Name" <name@example.com>`.
+    """
+    return [address.lower() for _, address in getaddresses([str(v) for v in values]) if address]
+
+
+def message_addresses(message) -> Dict[str, List[str]]:
+    """
+    Return the normalized addresses of a django.core.mail.EmailMessage keyed by each of ADDRESS_FIELDS.
+
+    These come from the EmailMessage rather than the email.message.Message from its message() method because
+    Bcc addresses are not included in the headers.
+    """
+    fields = {
+        "from": [message.from_email],
+        "to": message.to,
+        "cc": message.cc,
+        "bcc": message.bcc,
+    }
+    return {field: normalize_addresses(fields[field]) for field in ADDRESS_FIELDS}
+
+
+def header_addresses(email_message) -> Dict[str, List[str]]:
+    """
+    Return the normalized addresses in the headers of an email.message.Message keyed by each of ADDRESS_FIELDS,
+    for when the django.core.mail.EmailMessage it came from is not available. Bcc is usually not in the headers.
+    """
+    return {field: normalize_addresses(email_message.get_all(field, [])) for field in ADDRESS_FIELDS}
+
+
+def message_recipients(addresses: Dict[str, List[str]]) -> List[str]:
+    """
+    Return the unique recipient addresses from the output of message_addresses().
+    """
+    recipients: List[str] = []
+    for field in RECIPIENT_FIELDS:
+        recipients.extend(address for address in addresses.get(field, []) if address not in recipients)
+    return recipients
+
+
+# A Message-ID, including its angle brackets, in a header such as References which may hold more than one
+MESSAGE_ID_RE = re.compile(r"<[^<>\s]+>")
+
+# get_outbox() orderings by the time an email was sent, oldest first and newest first
+OUTBOX_ORDERINGS = ("date", "-date")
+
+
+@dataclasses.dataclass
+class OutboxQuery:
+    """
+    The filters, ordering, and limit which backends take as keyword arguments to get_outbox().
+
+    Each backend translates these into its own lookups rather than filtering the whole outbox in Python.
+    """
+
+    # Case insensitive search of the subject
+    subject: str = ""
+    # Email address the email was sent From
+    sender: str = ""
+    # Email address the email was sent To, Cc, or Bcc
+    recipient: str = ""
+    # Only email sent at or after since and before until
+    since: Optional[datetime.datetime] = None
+    until: Optional[datetime.datetime] = None
+    # True for only email with attachments, False for only email without
+    has_attachments: Optional[bool] = None
+    # Header names and the exact values those headers must have. Header names are case insensitive.
+    headers: Dict[str, str] = dataclasses.field(default_factory=dict)
+    # One of OUTBOX_ORDERINGS, or empty for the order the email was stored in
+    ordering: str = ""
+    limit: Optional[int] = None
+
+    def __post_init__(self):
+        if self.ordering and self.ordering not in OUTBOX_ORDERINGS:
+            raise ValueError(f"ordering must be one of {', '.join(OUTBOX_ORDERINGS)}, not {self.ordering!r}.")
+        self.sender = self.sender.strip().lower()
+        self.recipient = self.recipient.strip().lower()
+        self.headers = {name.lower(): value for name, value in self.headers.items()}
+
+    def matches(self, summary: Dict[str, Any]) -> bool:
+        """
+        Return whether the email described by a summary from message_summary() matches the filters.
+        """
+        if self.subject and self.subject.lower() not in summary["subject"].lower():
+            return False
+        if self.sender and self.sender not in summary["addresses"]["from"]:
+            return False
+        if self.recipient and self.recipient not in message_recipients(summary["addresses"]):
+            return False
+        if self.since is not None and summary["date"] < self.since.timestamp():
+            return False
+        if self.until is not None and summary["date"] >= self.until.timestamp():
+            return False
+        if self.has_attachments is not None and self.has_attachments != summary["has_attachments"]:
+            return False
+        return all(summary["headers"].get(name) == value for name, value in self.headers.items())
+
+    @property
+    def uses_summaries(self) -> bool:
+        """
+        Whether filtering needs more than the address and date indexes, so backends need to look at the message
+        summaries.
+        """
+        return bool(self.subject or self.has_attachments is not None or self.headers)
+
+    @property
+    def uses_dates(self) -> bool:
+        """
+        Whether the query filters or orders by date, so backends need to use their date index.
+        """
+        return bool(self.since is not None or self.until is not None or self.ordering)
+
+    def order_and_limit(self, items: List[Any]) -> List[Any]:
+        """
+        Apply the ordering and limit to a list of messages, ids, or summaries. When there is an ordering they must
+        already be oldest first, such as from date_index_range().
+        """
+        if self.ordering.startswith("-"):
+            items = items[::-1]
+        if self.limit is not None:
+            items = items[: self.limit]
+        return items
+
+
+def date_index_insert(date_index: List[Tuple[float, str]], summary: Dict[str, Any]):
+    """
+    Add the email described by a summary from message_summary() to a list of (timestamp, Message-ID) sorted by date.
+    """
+    bisect.insort(date_index, (summary["date"], summary["message_id"]))
+
+
+def date_index_remove(date_index: List[Tuple[float, str]], summary: Dict[str, Any]):
+    """
+    Remove the email described by a summary from message_summary() from a list made by date_index_insert().
+    """
+    entry = (summary["date"], summary["message_id"])
+    i = bisect.bisect_left(date_index, entry)
+    if i < len(date_index) and date_index[i] == entry:
+        del date_index[i]
+
+
+def date_index_range(
+    date_index: List[Tuple[float, str]],
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """
+    Return the Message-IDs, oldest first, of the email in a list made by date_index_insert() which was sent at or
+    after `since` and before `until`, without looking at the email outside of that range.
+    """
+    start = bisect.bisect_left(date_index, (since.timestamp(),)) if since is not None else 0
+    end = bisect.bisect_left(date_index, (until.timestamp(),)) if until is not None else len(date_index)
+    return [message_id for _, message_id in date_index[start:end]]
+
+
+def message_thread_ids(email_message) -> List[str]:
+    """
+    Return the Message-IDs which may identify the thread an email belongs to, in the order resolve_thread_id()
+    prefers them: those in its References header, which lists the start of the thread first, then In-Reply-To, then
+    its own Message-ID.
+
+    `email_message` may be an email.message.Message or a dict of headers with lower cased names.
+    """
+    thread_ids: List[str] = []
+    for header in ("references", "in-reply-to", "message-id"):
+        for message_id in MESSAGE_ID_RE.findall(str(email_message.get(header) or "")):
+            if message_id not in thread_ids:
+                thread_ids.append(message_id)
+    return thread_ids
+
+
+def resolve_thread_id(candidates: List[str], lookup_thread: Callable[[str], Optional[str]]) -> Tuple[str, List[str]]:
+    """
+    Find the thread id for an email from the Message-IDs returned by message_thread_ids().
+
+    `lookup_thread` returns the thread id of the stored email with a Message-ID, or the Message-ID itself if it is
+    already the id of a thread because a reply to it was stored first, and None for any other Message-ID.
+
+    Returns the thread id and the ids of any other threads which the email joins together. Backends move the email
+    in those threads into the returned thread, the union step of a union-find over Message-IDs, so that each thread
+    can be looked up by a single id. An email related to no stored email starts a thread named after the first
+    candidate, which is the start of the thread when it has References, so that its replies and the email it replies
+    to end up in the same thread in whatever order they are stored.
+    """
+    found: List[str] = []
+    for candidate in candidates:
+        thread_id = lookup_thread(candidate)
+        if thread_id and thread_id not in found:
+            found.append(thread_id)
+    if not found:
+        return (candidates[0] if candidates else ""), []
+    return found[0], found[1:]
+
+
+def parse_date_header(value: Optional[str]) -> Optional[datetime.datetime]:
+    """
+    Parse the value of an email Date header to an aware datetime, or None if it is missing or not a valid date.
+    """
+    if not value:
+        return None
+    try:
+        date = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        # RFC 5322 dates without a time zone, "-0000", are UTC
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date
+
+
+def is_attachment(part) -> bool:
+    """
+    Return whether a part of an email is an attachment, which the database backend stores as a file and the
+    has_attachments filter of every backend looks for. Parts with a Content-Disposition are attachments, such as
+    inline images, except for inline text parts without a filename, which are bodies.
+    """
+    if part.get("Content-Disposition", None) is None:
+        return False
+    return bool(
+        part.get_content_disposition() != "inline"
+        or part.get_filename()
+        or part.get_content_type() not in ["text/plain", "text/html"]
+    )
+
+
+def message_summary(email_message, addresses: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Return a summary of an email with the values OutboxQuery filters on, which backends can store alongside it.
+
+    `email_message` is the email.message.Message and `addresses` its addresses from message_addresses() or
+    header_addresses().
+    """
+    date = parse_date_header(email_message.get("date"))
+    return {
+        "message_id": email_message.get("message-id"),
+        "subject": str(email_message.get("subject", "")),
+        "addresses": addresses,
+        # When the email was sent as a POSIX timestamp, or when it was stored if it does not say when it was sent
+        "date": date.timestamp() if date is not None else time.time(),
+        "has_attachments": any(is_attachment(part) for part in email_message.walk()),
+        "headers": {name.lower(): str(value) for name, value in email_message.items()},
+    }
+
+
+def add_missing_headers(email_message):
+    """
+    Add the Message-ID and Date headers which backends look email up and order it by to an email.message.Message
+    which was not sent through Django and does not have them.
+    """
+    if "message-id" not in email_message:
+        email_message["Message-ID"] = make_msgid(domain=DNS_NAME)
+    if "date" not in email_message:
+        email_message["Date"] = formatdate(localtime=True)
+    return email_message
+
+
+def mbox_entry(data: bytes, sender: str, timestamp: float) -> bytes:
+    """
+    Return an email's bytes as an entry in an mbox file: a From_ line, the email with its From_ like lines quoted, and
+    a blank line.
+    """
+    data = _FROM_LINE_RE.sub(rb">\1", data)
+    return (
+        f"From {sender or 'MAILER-DAEMON'} {time.asctime(time.gmtime(timestamp))}\n".encode()
+        + data
+        + (b"\n" if data.endswith(b"\n") else b"\n\n")
+    )
+
+
+def mbox_unquote(data: bytes) -> bytes:
+    """
+    Undo the quoting of From_ like lines in an email read from an mbox file.
+    """
+    return _QUOTED_FROM_LINE_RE.sub(rb"\1", data)
@@ -0,0 +1,102 @@
+"""
+Export of captured email as an mbox file or a zip file of .eml files, generated a piece at a time so that it can be
+streamed to a file or an HTTP response without holding the whole export in memory.
+"""
+
+import zipfile
+from hashlib import sha1
+from typing import Any, Iterable, Iterator, List, Optional
+
+from django.db import models
+from django.utils.text import slugify
+
+from .backends.utils import mbox_entry, normalize_addresses, parse_date_header
+
+# Database backend messages loaded, with their parts, per query while exporting
+CHUNK_SIZE = 500
+
+
+def iter_messages(connection: Any, message_ids: Optional[List[str]] = None, **filters) -> Iterator[Any]:
+    """
+    Yield the email to export from an email backend: those with the given Message-IDs, in that order, or else those
+    matching the get_outbox() keyword arguments in `filters`.
+    """
+    if message_ids:
+        for message_id in message_ids:
+            message = connection.get_message(message_id)
+            if message is not None:
+                yield message
+        return
+    outbox = connection.get_outbox(**filters)
+    if isinstance(outbox, models.QuerySet):
+        # The database backend defers the bodies and would query each message's parts separately
+        outbox = outbox.defer(None).prefetch_related("parts").iterator(chunk_size=CHUNK_SIZE)
+    yield from outbox
+
+
+def message_bytes(message: Any) -> bytes:
+    """
+    Return an exported email as bytes with "\\n" line endings.
+    """
+    return message.as_bytes().replace(b"\r\n", b"\n")
+
+
+def iter_mbox(messages: Iterable[Any]) -> Iterator[bytes]:
+    """
+    Yield an mbox file of the messages, one message at a time.
+    """
+    for message in messages:
+        senders = normalize_addresses([message.get("from", "")])
+        date = parse_date_header(message.get("date"))
+        yield mbox_entry(message_bytes(message), senders[0] if senders else "", date.timestamp() if date else 0)
+
+
+class _ZipStream:
+    """
+    A write-only file which zipfile.ZipFile writes to, collecting what is written until it is taken with read().
+    Having no tell() or seek() makes ZipFile write each entry in one go without going back to update its header.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _eml_name(index: int, message: Any) -> str:
+    """
+    File name of an email in a zip export, numbered so that names are unique and sort in the order exported.
+    """
+    subject = slugify(str(message.get("subject", "")))[:60]
+    return f"{index:06d}-{subject or sha1(str(message.get('message-id', '')).encode()).hexdigest()[:12]}.eml"
+
+
+def iter_zip(messages: Iterable[Any]) -> Iterator[bytes]:
+    """
+    Yield a zip file of the messages as .eml files, one message at a time.
+
+    Only the small directory entry of each file is kept until the end, where the zip file's directory is written.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, message in enumerate(messages, start=1):
+            archive.writestr(_eml_name(index, message), message_bytes(message))
+            yield stream.read()
+    yield stream.read()
+
+
+# Export format -> (generator of the export, content type, file extension)
+EXPORT_FORMATS = {
+    "mbox": (iter_mbox, "application/mbox", "mbox"),
+    "zip": (iter_zip, "application/zip", "zip"),
+}
@@ -0,0 +1,50 @@
+from typing import Any, Dict
+
+from django import forms
+
+from .backends.utils import OUTBOX_ORDERINGS
+
+
+class OutboxFilterForm(forms.Form):
+    """
+    Filters for the email list from its query string, turned into keyword arguments for a backend's get_outbox().
+    """
+
+    subject = forms.CharField(required=False)
+    # "from" is a keyword so the field name differs from the query string parameter, see add_prefix()
+    sender = forms.CharField(required=False)
+    recipient = forms.CharField(required=False)
+    since = forms.DateTimeField(required=False)
+    until = forms.DateTimeField(required=False)
+    has_attachments = forms.NullBooleanField(required=False)
+    # `Name: value`, repeat the parameter for more than one header
+    header = forms.CharField(required=False)
+    ordering = forms.ChoiceField(choices=[("", "")] + [(o, o) for o in OUTBOX_ORDERINGS], required=False)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+    def add_prefix(self, field_name):
+        if field_name == "sender":
+            return "from"
+        return super().add_prefix(field_name)
+
+    def clean_header(self):
+        headers = {}
+        for value in self.data.getlist("header") if hasattr(self.data, "getlist") else [self.data.get("header", "")]:
+            if not value.strip():
+                continue
+            name, sep, header_value = value.partition(":")
+            if not sep or not name.strip():
+                raise forms.ValidationError("Headers must be given as Name: value.")
+            headers[name.strip()] = header_value.strip()
+        return headers
+
+    def get_outbox_kwargs(self) -> Dict[str, Any]:
+        """
+        Return the get_outbox() keyword arguments for the filters which were given.
+        """
+        kwargs = {}
+        for name, value in self.cleaned_data.items():
+            if value in (None, "", {}):
+                continue
+            kwargs["headers" if name == "header" else name] = value
+        return kwargs
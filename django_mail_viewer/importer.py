@@ -0,0 +1,200 @@
+"""
+Bulk import of email from .eml files, mbox files, and tarballs of either into a Django Mail Viewer email backend.
+
+Reading the files happens in the calling process while the email is parsed in a pool of worker processes, and the
+parsed email is passed to the backend's send_messages() in batches so that each backend stores it with its bulk
+writes. Nothing here uses Django's settings so that the workers can be started without them.
+"""
+
+import email
+import os
+import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import monotonic
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .backends.utils import add_missing_headers, header_addresses, mbox_unquote
+
+# File name suffixes of single emails
+EML_SUFFIXES = (".eml", ".msg")
+# File name suffixes of tarballs, which tarfile opens with whatever compression they use
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# An email's bytes and whether it came from an mbox file, so still has its From_ like lines quoted
+RawMessage = Tuple[bytes, bool]
+
+
+class ImportedMessage:
+    """
+    A parsed email, with the parts of django.core.mail.EmailMessage which the backends use so that it can be passed
+    to their send_messages(). The addresses come from its headers, including Bcc when it has that header.
+    """
+
+    def __init__(self, email_message: email.message.Message):
+        self.email_message = email_message
+        addresses = header_addresses(email_message)
+        self.from_email = addresses["from"][0] if addresses["from"] else ""
+        self.to = addresses["to"]
+        self.cc = addresses["cc"]
+        self.bcc = addresses["bcc"]
+
+    def recipients(self) -> List[str]:
+        return self.to + self.cc + self.bcc
+
+    def message(self) -> email.message.Message:
+        return self.email_message
+
+
+def parse_messages(raw_messages: List[RawMessage]) -> List[ImportedMessage]:
+    """
+    Parse a chunk of raw email. This is what runs in the worker processes.
+    """
+    parsed = []
+    for data, from_mbox in raw_messages:
+        if from_mbox:
+            data = mbox_unquote(data)
+        # Stored with the same line endings as email sent through Django
+        data = data.replace(b"\r\n", b"\n")
+        parsed.append(ImportedMessage(add_missing_headers(email.message_from_bytes(data))))
+    return parsed
+
+
+def _is_mbox(name: str, head: bytes) -> bool:
+    return name.endswith(".mbox") or os.path.basename(name) == "mbox" or head.startswith(b"From ")
+
+
+def iter_mbox(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Yield the emails in an mbox file one at a time without their From_ lines or the blank line after each.
+    """
+    lines: List[bytes] = []
+    previous_blank = True
+    for line in f:
+        if previous_blank and line.startswith(b"From "):
+            if lines:
+                # Drop the blank line which ends every email in an mbox file
+                yield b"".join(lines[:-1] if lines[-1].strip() == b"" else lines)
+            lines = []
+        else:
+            lines.append(line)
+        previous_blank = line.strip() == b""
+    if lines:
+        yield b"".join(lines[:-1] if lines[-1].strip() == b"" else lines)
+
+
+def _iter_file(name: str, f: BinaryIO) -> Iterator[RawMessage]:
+    head = f.peek(5)[:5] if hasattr(f, "peek") else b""
+    if name.lower().endswith(EML_SUFFIXES):
+        yield f.read(), False
+    elif _is_mbox(name, head):
+        for data in iter_mbox(f):
+            yield data, True
+    else:
+        yield f.read(), False
+
+
+def _iter_tar(path: Path) -> Iterator[RawMessage]:
+    # Streamed so that compressed tarballs are read through once without seeking back
+    with tarfile.open(path, "r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            name = member.name.lower()
+            if not name.endswith(EML_SUFFIXES) and not _is_mbox(name, b""):
+                continue
+            f = tar.extractfile(member)
+            if f is not None:
+                yield from _iter_file(name, f)
+
+
+def iter_raw_messages(paths: Iterable[str]) -> Iterator[RawMessage]:
+    """
+    Yield the raw emails in .eml files, mbox files, and tarballs of them, and in those files in directories, in
+    order of their paths.
+
+    In directories, only files named *.eml, *.msg, *.mbox, or mbox and tarballs are read.
+    """
+    for path in map(Path, paths):
+        if path.is_dir():
+            files = sorted(
+                p
+                for p in path.rglob("*")
+                if p.is_file()
+                and (p.name.lower().endswith(EML_SUFFIXES + TAR_SUFFIXES) or _is_mbox(p.name.lower(), b""))
+            )
+        else:
+            files = [path]
+        for file in files:
+            if file.name.lower().endswith(TAR_SUFFIXES) or (file.suffix == "" and tarfile.is_tarfile(file)):
+                yield from _iter_tar(file)
+            else:
+                with open(file, "rb") as f:
+                    yield from _iter_file(file.name.lower(), f)
+
+
+def _chunks(raw_messages: Iterator[RawMessage], chunk_size: int) -> Iterator[List[RawMessage]]:
+    chunk: List[RawMessage] = []
+    for raw in raw_messages:
+        chunk.append(raw)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_chunks(chunks: Iterator[List[RawMessage]], workers: int) -> Iterator[List[ImportedMessage]]:
+    """
+    Parse chunks of raw email in a pool of `workers` processes, or in this one if `workers` is 0, in order.
+
+    Only a couple of chunks per worker are read ahead so that importing a large corpus does not read it all into
+    memory while the backend catches up.
+    """
+    if not workers:
+        yield from map(parse_messages, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_messages, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_messages(
+    connection: Any,
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    batch_size: int = 500,
+    chunk_size: int = 100,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> dict:
+    """
+    Import the email in .eml files, mbox files, tarballs, and directories of them into the email backend
+    `connection`, returning the number of emails imported and how long it took.
+
+    `workers` processes parse the email, `chunk_size` emails at a time, defaulting to one per CPU. It may be 0 to parse
+    in this process. `progress` is called with the number of emails imported so far and the seconds taken after each
+    batch of up to `batch_size` emails is stored.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = monotonic()
+    count = 0
+    batch: List[ImportedMessage] = []
+    for parsed in _parse_chunks(_chunks(iter_raw_messages(paths), chunk_size), workers):
+        batch.extend(parsed)
+        while len(batch) >= batch_size:
+            count += connection.send_messages(batch[:batch_size])
+            del batch[:batch_size]
+            if progress is not None:
+                progress(count, monotonic() - start)
+    if batch:
+        count += connection.send_messages(batch)
+        if progress is not None:
+            progress(count, monotonic() - start)
+    return {"messages": count, "seconds": monotonic() - start}
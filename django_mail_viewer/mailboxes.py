@@ -0,0 +1,63 @@
+"""
+Mailboxes partition the email stored by each backend so that separate users of the same storage, such as parallel
+test processes or staging sites sharing a cache or database, only read and write their own email.
+"""
+
+import contextvars
+import re
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from . import settings as mailviewer_settings
+
+# Header on an email naming the mailbox to store it in, overriding the mailbox of the backend sending it
+MAILBOX_HEADER = "X-Mailviewer-Mailbox"
+# Mailbox names become part of cache keys, so are limited to characters which every cache allows in keys
+MAILBOX_NAME_RE = re.compile(r"^[\w.@-]{0,100}$", re.ASCII)
+
+_current_mailbox: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("mailviewer_mailbox", default=None)
+
+
+def validate_mailbox(name: str) -> str:
+    """
+    Return a mailbox name with surrounding whitespace removed, raising ValueError if it is not a valid name.
+    """
+    name = str(name).strip()
+    if not MAILBOX_NAME_RE.match(name):
+        raise ValueError(
+            f"Mailbox names may only contain up to 100 letters, numbers, and the characters _.@- not {name!r}."
+        )
+    return name
+
+
+def get_current_mailbox() -> str:
+    """
+    Return the mailbox set by the innermost use_mailbox(), or settings.MAILVIEWER_MAILBOX outside of one.
+    """
+    mailbox = _current_mailbox.get()
+    return mailbox if mailbox is not None else mailviewer_settings.MAILVIEWER_MAILBOX
+
+
+@contextmanager
+def use_mailbox(name: str) -> Iterator[str]:
+    """
+    Use a mailbox for the email backends created inside of the block, such as by mail.send_mail().
+
+    The mailbox is tracked per thread and asyncio task.
+    """
+    name = validate_mailbox(name)
+    token = _current_mailbox.set(name)
+    try:
+        yield name
+    finally:
+        _current_mailbox.reset(token)
+
+
+def message_mailbox(email_message, default: str) -> str:
+    """
+    Return the mailbox an email.message.Message should be stored in, from its MAILBOX_HEADER or else `default`.
+    """
+    mailbox = email_message.get(MAILBOX_HEADER)
+    if mailbox is None:
+        return default
+    return validate_mailbox(mailbox)
@@ -0,0 +1,39 @@
+from time import monotonic
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove email which is no longer stored, such as email evicted from the cache, from the index of a Django Mail "
+        "Viewer backend which has one, such as the cache and filesystem backends"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Number of emails read or written at a time. Default 1000"
+        )
+        parser.add_argument(
+            "--backend",
+            help="Dotted path of the email backend to compact. Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument("--mailbox", help="Name of the mailbox to compact. Defaults to settings.MAILVIEWER_MAILBOX")
+
+    def handle(self, *args, **options):
+        connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+        start = monotonic()
+        with mail.get_connection(options["backend"], **connection_kwargs) as connection:
+            if not hasattr(connection, "compact_index"):
+                raise CommandError(
+                    f"{connection.__class__.__module__}.{connection.__class__.__name__} has no index to compact."
+                )
+            try:
+                result = connection.compact_index(batch_size=options["batch_size"])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Removed {result['removed']} index entries of email no longer stored, leaving {result['messages']} emails, "
+            f"in {monotonic() - start:.2f} seconds"
+        )
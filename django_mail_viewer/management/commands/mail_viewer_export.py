@@ -0,0 +1,78 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from ...export import EXPORT_FORMATS, iter_messages
+from ...forms import OutboxFilterForm
+
+
+class Command(BaseCommand):
+    help = "Export email from a Django Mail Viewer email backend as an mbox file or a zip file of .eml files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write the export to")
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="mbox", help="Default mbox")
+        parser.add_argument(
+            "--message-id",
+            action="append",
+            default=[],
+            dest="message_ids",
+            help="Message-ID of an email to export, may be repeated. Defaults to all email matching the filters",
+        )
+        parser.add_argument("--subject", help="Only email with a subject containing this")
+        parser.add_argument("--from", dest="sender", help="Only email sent from this address")
+        parser.add_argument("--recipient", help="Only email sent To, Cc, or Bcc this address")
+        parser.add_argument("--since", help="Only email sent at or after this date and time")
+        parser.add_argument("--until", help="Only email sent before this date and time")
+        parser.add_argument(
+            "--header", action="append", default=[], help="Only email with this header, as Name: value. May be repeated"
+        )
+        parser.add_argument("--ordering", help="date or -date. Defaults to the order the email was stored in")
+        parser.add_argument("--limit", help="Export at most this many emails")
+        parser.add_argument(
+            "--backend",
+            help="Dotted path of the email backend to export from. Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument("--mailbox", help="Name of the mailbox to export. Defaults to settings.MAILVIEWER_MAILBOX")
+
+    def handle(self, *args, **options):
+        # Validated by the same form as the viewer's filters
+        data = QueryDict(mutable=True)
+        for name in ["subject", "recipient", "since", "until", "ordering", "limit"]:
+            if options[name] is not None:
+                data[name] = options[name]
+        if options["sender"] is not None:
+            data["from"] = options["sender"]
+        data.setlist("header", options["header"])
+        filter_form = OutboxFilterForm(data)
+        if not filter_form.is_valid():
+            raise CommandError("; ".join(f"{name}: {' '.join(errors)}" for name, errors in filter_form.errors.items()))
+
+        generate = EXPORT_FORMATS[options["format"]][0]
+        output = Path(options["output"])
+        connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+        # Written to a temporary file which replaces the output once complete, so a failed export leaves nothing behind
+        fd, temp_path = tempfile.mkstemp(dir=output.parent, prefix=f".{output.name}.", suffix=".tmp")
+        count = 0
+        try:
+            with os.fdopen(fd, "wb") as f, mail.get_connection(options["backend"], **connection_kwargs) as connection:
+                messages = iter_messages(connection, options["message_ids"], **filter_form.get_outbox_kwargs())
+
+                def counted():
+                    nonlocal count
+                    for message in messages:
+                        count += 1
+                        yield message
+
+                for chunk in generate(counted()):
+                    f.write(chunk)
+            os.replace(temp_path, output)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        self.stdout.write(f"Exported {count} emails to {output}")
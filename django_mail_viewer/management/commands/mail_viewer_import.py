@@ -0,0 +1,65 @@
+import os
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import import_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "Import email from .eml files, mbox files, tarballs of them, and directories of any of those into a Django "
+        "Mail Viewer email backend"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files and directories to import email from")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes parsing email. 0 parses email in this process. Defaults to the number of CPUs",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Number of emails stored by the backend at a time. Default 500"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=100, help="Number of emails parsed by a worker at a time. Default 100"
+        )
+        parser.add_argument(
+            "--backend",
+            help="Dotted path of the email backend to import email into. Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument(
+            "--mailbox",
+            help="Name of the mailbox to import email into when it has no X-Mailviewer-Mailbox header. "
+            "Defaults to settings.MAILVIEWER_MAILBOX",
+        )
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            if not os.path.exists(path):
+                raise CommandError(f"{path} does not exist.")
+        verbosity = options["verbosity"]
+        last_report = [0.0]
+
+        def progress(count: int, seconds: float):
+            # At most once a second
+            if verbosity > 1 or seconds - last_report[0] >= 1:
+                last_report[0] = seconds
+                self.stdout.write(f"Imported {count} emails ({count / seconds if seconds else 0:.1f} emails/second)")
+
+        connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+        with mail.get_connection(options["backend"], **connection_kwargs) as connection:
+            result = import_messages(
+                connection,
+                options["paths"],
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                chunk_size=options["chunk_size"],
+                progress=progress if verbosity else None,
+            )
+
+        seconds = result["seconds"]
+        rate = result["messages"] / seconds if seconds else 0
+        self.stdout.write(f"Imported {result['messages']} emails in {seconds:.2f} seconds ({rate:.1f} emails/second)")
@@ -0,0 +1,49 @@
+import datetime
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Delete old email, and any attachment files, from a Django Mail Viewer email backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, help="Delete email stored more than this many days ago")
+        parser.add_argument("--keep", type=int, help="Delete all but this many of the most recently stored emails")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Number of emails deleted per transaction. Default 1000"
+        )
+        parser.add_argument(
+            "--file-workers",
+            type=int,
+            default=4,
+            help="Number of threads deleting attachment files from storage. Default 4",
+        )
+        parser.add_argument(
+            "--backend",
+            help="Dotted path of the email backend to prune. Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument("--mailbox", help="Name of the mailbox to prune. Defaults to settings.MAILVIEWER_MAILBOX")
+
+    def handle(self, *args, **options):
+        if options["days"] is None and options["keep"] is None:
+            raise CommandError("At least one of --days or --keep is required.")
+        older_than = datetime.timedelta(days=options["days"]) if options["days"] is not None else None
+
+        connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+        with mail.get_connection(options["backend"], **connection_kwargs) as connection:
+            if not hasattr(connection, "prune_messages"):
+                raise CommandError(f"{connection.__class__.__module__}.{connection.__class__.__name__} cannot prune.")
+            result = connection.prune_messages(
+                older_than=older_than,
+                keep=options["keep"],
+                batch_size=options["batch_size"],
+                file_delete_workers=options["file_workers"],
+            )
+
+        seconds = result["seconds"]
+        rate = result["messages"] / seconds if seconds else 0
+        self.stdout.write(
+            f"Deleted {result['messages']} emails and {result['files']} attachment files in {seconds:.2f} seconds "
+            f"({rate:.1f} emails/second)"
+        )
@@ -0,0 +1,65 @@
+import asyncio
+import functools
+
+from django.core import mail
+from django.core.management.base import BaseCommand
+
+from ...smtp import DEFAULT_BATCH_SIZE, DEFAULT_MAX_MESSAGE_SIZE, SMTPServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run an SMTP server which stores the email it receives with a Django Mail Viewer email backend, so that "
+        "programs which do not use Django can send email to the viewer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host", default="127.0.0.1", help="Address to listen on. Default 127.0.0.1. There is no authentication"
+        )
+        parser.add_argument("--port", type=int, default=1025, help="Port to listen on. Default 1025")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Most emails stored by the backend at a time. Default {DEFAULT_BATCH_SIZE}",
+        )
+        parser.add_argument(
+            "--max-message-size",
+            type=int,
+            default=DEFAULT_MAX_MESSAGE_SIZE,
+            help=f"Largest email accepted, in bytes. Default {DEFAULT_MAX_MESSAGE_SIZE}",
+        )
+        parser.add_argument(
+            "--backend",
+            help="Dotted path of the email backend to store email with. Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument(
+            "--mailbox",
+            help="Name of the mailbox to store email in when it has no X-Mailviewer-Mailbox header. "
+            "Defaults to settings.MAILVIEWER_MAILBOX",
+        )
+
+    def handle(self, *args, **options):
+        connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+        server = SMTPServer(
+            functools.partial(mail.get_connection, options["backend"], **connection_kwargs),
+            host=options["host"],
+            port=options["port"],
+            batch_size=options["batch_size"],
+            max_message_size=options["max_message_size"],
+        )
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(server.start())
+            self.stdout.write(f"Listening for SMTP on {server.host}:{server.port}. Quit with CONTROL-C.")
+            self.stdout.flush()
+            loop.run_until_complete(server.server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if server.server is not None:
+                loop.run_until_complete(server.stop())
+                self.stdout.write(f"Stored {server.batcher.stored} emails in {server.batcher.batches} batches")
+            loop.close()
@@ -1,4 +1,6 @@
 from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import DEFAULT_DB_ALIAS
 
 # The cache config from django.core.cache.caches to use for backends.cache.CacheBackend
 # default to django.core.cache.caches['default']
@@ -6,3 +8,46 @@ MAILVIEWER_CACHE = getattr(settings, "MAILVIEWER_CACHE", "default")
 MAILVIEWER_DATABASE_BACKEND_MODEL = getattr(
     settings, "MAILVIEWER_DATABASE_BACKEND_MODEL", "mail_viewer_database_backend.EmailMessage"
 )
+# The database alias from settings.DATABASES which backends.database.EmailBackend reads from and writes to.
+# Add django_mail_viewer.backends.database.routers.MailViewerRouter to settings.DATABASE_ROUTERS so that the admin,
+# migrations, and any other queries against the mail viewer models also use this database.
+MAILVIEWER_DATABASE_ALIAS = getattr(settings, "MAILVIEWER_DATABASE_ALIAS", DEFAULT_DB_ALIAS)
+# When set to a database alias, backends.database.EmailBackend holds on to email sent during a transaction on that
+# database and writes it all at once after the transaction commits. Email sent during a transaction which is rolled
+# back is never stored. This is usually the database your application's transactions use, such as "default".
+MAILVIEWER_DATABASE_ON_COMMIT_ALIAS = getattr(settings, "MAILVIEWER_DATABASE_ON_COMMIT_ALIAS", None)
+# The mailbox which backends store email in and read it from when no other mailbox is chosen with
+# django_mail_viewer.mailboxes.use_mailbox(), the mailbox argument to mail.get_connection(), or the
+# X-Mailviewer-Mailbox header. Each mailbox has its own storage and indexes.
+MAILVIEWER_MAILBOX = getattr(settings, "MAILVIEWER_MAILBOX", "")
+# The cache configs from django.core.cache.caches which backends.cache.ShardedEmailBackend spreads email across.
+# Defaults to just MAILVIEWER_CACHE.
+MAILVIEWER_CACHE_SHARDS = getattr(settings, "MAILVIEWER_CACHE_SHARDS", [MAILVIEWER_CACHE])
+# How many messages, and how many bytes of them, the cache backends keep in a least recently used cache in each
+# process so that showing the same email again does not fetch it from the cache. Set to 0 to turn this off, the default.
+MAILVIEWER_CACHE_LRU_MAX_MESSAGES = getattr(settings, "MAILVIEWER_CACHE_LRU_MAX_MESSAGES", 0)
+MAILVIEWER_CACHE_LRU_MAX_BYTES = getattr(settings, "MAILVIEWER_CACHE_LRU_MAX_BYTES", 64 * 1024 * 1024)
+# How many seconds the cache backends keep each message, and the index entries for it, in the cache. Defaults to the
+# TIMEOUT of the cache in settings.CACHES. None keeps them until they are deleted or evicted.
+MAILVIEWER_CACHE_TIMEOUT = getattr(settings, "MAILVIEWER_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+# The URL of the Redis server backends.redis.EmailBackend stores email on, such as "redis://localhost:6379/1". When
+# not set it uses the server of the MAILVIEWER_CACHE cache, which must then be a Django RedisCache.
+MAILVIEWER_REDIS_URL = getattr(settings, "MAILVIEWER_REDIS_URL", None)
+# The directory backends.filesystem.EmailBackend stores email in, which may be shared by several processes or
+# containers. Defaults to settings.EMAIL_FILE_PATH.
+MAILVIEWER_FILE_PATH = getattr(settings, "MAILVIEWER_FILE_PATH", None)
+# The mbox file backends.mbox.EmailBackend appends email to. Mailboxes other than the default are kept in files next to
+# it with the mailbox name added before the extension.
+MAILVIEWER_MBOX_PATH = getattr(settings, "MAILVIEWER_MBOX_PATH", None)
+# The SQLite database file backends.sqlite.EmailBackend stores email in, separate from the databases in
+# settings.DATABASES. Its tables are created as needed.
+MAILVIEWER_SQLITE_PATH = getattr(settings, "MAILVIEWER_SQLITE_PATH", None)
+# The file backends.locmem.SharedEmailBackend shares its outbox through, and how many bytes of email it holds before
+# the oldest is overwritten. Defaults to a file in the temporary directory.
+MAILVIEWER_SHARED_OUTBOX_PATH = getattr(settings, "MAILVIEWER_SHARED_OUTBOX_PATH", None)
+MAILVIEWER_SHARED_OUTBOX_SIZE = getattr(settings, "MAILVIEWER_SHARED_OUTBOX_SIZE", 64 * 1024 * 1024)
+# When set, backends.locmem.EmailBackend saves every mailbox's outbox to this file when the process exits, and every
+# MAILVIEWER_LOCMEM_SNAPSHOT_INTERVAL seconds if that is set, and restores it the first time the backend is used so that
+# captured email survives restarts such as runserver reloading.
+MAILVIEWER_LOCMEM_SNAPSHOT_PATH = getattr(settings, "MAILVIEWER_LOCMEM_SNAPSHOT_PATH", None)
+MAILVIEWER_LOCMEM_SNAPSHOT_INTERVAL = getattr(settings, "MAILVIEWER_LOCMEM_SNAPSHOT_INTERVAL", None)
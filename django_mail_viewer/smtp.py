@@ -0,0 +1,321 @@
+"""
+A small SMTP server which stores the email it receives with a Django Mail Viewer email backend, so that programs
+which do not send email through Django, such as services written in other languages and cron jobs, can still have
+their email shown by the viewer.
+
+It speaks just enough SMTP for clients delivering to a local test server: HELO, EHLO, MAIL, RCPT, DATA, RSET, NOOP,
+VRFY, and QUIT, without authentication or TLS, so it should only listen on a local or otherwise trusted interface.
+"""
+
+import asyncio
+import email
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.core.mail.utils import DNS_NAME
+
+from .backends.utils import add_missing_headers, normalize_addresses
+
+logger = logging.getLogger(__name__)
+
+# Largest message accepted, in bytes, which is advertised with the EHLO SIZE extension
+DEFAULT_MAX_MESSAGE_SIZE = 32 * 1024 * 1024
+# Most messages stored with one call to the backend's send_messages()
+DEFAULT_BATCH_SIZE = 500
+
+_PATH_RE = re.compile(rb"^(?:FROM|TO):\s*<?([^>\s]*)>?", re.IGNORECASE)
+_SIZE_RE = re.compile(rb"\sSIZE=(\d+)", re.IGNORECASE)
+
+
+class ReceivedMessage:
+    """
+    An email received over SMTP, with the parts of django.core.mail.EmailMessage which the backends use so that it can
+    be passed to their send_messages().
+
+    The recipients are those in the To and Cc headers, and the envelope recipients which are in neither are Bcc.
+    """
+
+    def __init__(self, mail_from: str, rcpt_tos: List[str], data: bytes):
+        self.envelope_from = mail_from
+        self.envelope_recipients = rcpt_tos
+        self.data = data
+        self._message: Optional[email.message.Message] = None
+        headers = BytesHeaderParser().parsebytes(data)
+        senders = [address for _, address in getaddresses(headers.get_all("from", [])) if address]
+        self.from_email = senders[0] if senders else mail_from
+        self.to = [address for _, address in getaddresses(headers.get_all("to", [])) if address]
+        self.cc = [address for _, address in getaddresses(headers.get_all("cc", [])) if address]
+        in_headers = set(normalize_addresses(self.to + self.cc))
+        self.bcc = [address for address in rcpt_tos if address.lower() not in in_headers]
+
+    def recipients(self) -> List[str]:
+        return self.envelope_recipients
+
+    def message(self) -> email.message.Message:
+        """
+        Parse the message, adding the Message-ID and Date headers the backends need when the client left them out.
+        """
+        if self._message is None:
+            self._message = add_missing_headers(email.message_from_bytes(self.data))
+        return self._message
+
+
+class _Batcher:
+    """
+    Stores received email with an email backend in a single worker thread.
+
+    Whatever has been received while the previous batch was being stored goes in the next batch, so under load each
+    call to send_messages() stores many messages, and when idle each message is stored as soon as it arrives.
+    """
+
+    def __init__(self, get_connection: Callable[[], Any], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.queue: "asyncio.Queue[Tuple[ReceivedMessage, asyncio.Future]]" = asyncio.Queue()
+        # One thread so that backends which keep a connection per thread, such as the sqlite backend, use just one
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mailviewer-smtp")
+        self.connection = None
+        self.stored = 0
+        self.batches = 0
+
+    async def store(self, message: ReceivedMessage):
+        """
+        Wait until a message has been stored, raising whatever storing it raised.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, future))
+        await future
+
+    def _open(self):
+        self.connection = self.get_connection()
+        self.connection.open()
+
+    async def open(self):
+        """
+        Open the backend's connection in the worker thread, raising any error in its configuration.
+        """
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._open)
+
+    def _send(self, messages: List[ReceivedMessage]) -> int:
+        return self.connection.send_messages(messages)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await loop.run_in_executor(self.executor, self._send, [message for message, _ in batch])
+            except Exception as e:
+                logger.exception("Failed to store %d received emails", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                self.stored += len(batch)
+                self.batches += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def close(self):
+        if self.connection is not None:
+            self.executor.submit(self.connection.close).result()
+        self.executor.shutdown()
+
+
+class _Session:
+    """
+    One SMTP client connection.
+    """
+
+    def __init__(self, server: "SMTPServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.reset()
+
+    def reset(self):
+        self.mail_from: Optional[str] = None
+        self.rcpt_tos: List[str] = []
+
+    def reply(self, line: str):
+        self.writer.write(line.encode() + b"\r\n")
+
+    async def handle(self):
+        self.reply(f"220 {self.server.hostname} Django Mail Viewer ESMTP")
+        while True:
+            await self.writer.drain()
+            try:
+                line = await self.reader.readuntil(b"\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except asyncio.LimitOverrunError:
+                self.reply("500 Line too long")
+                return
+            verb, _, argument = line.strip().partition(b" ")
+            verb = verb.upper()
+            if verb == b"QUIT":
+                self.reply("221 Bye")
+                await self.writer.drain()
+                return
+            handler = getattr(self, f"smtp_{verb.decode('ascii', 'replace')}", None)
+            if handler is None or not verb.isalpha():
+                self.reply("500 Command not recognized")
+                continue
+            await handler(argument.strip())
+
+    async def smtp_HELO(self, argument: bytes):
+        self.reset()
+        self.reply(f"250 {self.server.hostname}")
+
+    async def smtp_EHLO(self, argument: bytes):
+        self.reset()
+        self.writer.write(
+            f"250-{self.server.hostname}\r\n250-SIZE {self.server.max_message_size}\r\n250-8BITMIME\r\n"
+            "250-PIPELINING\r\n250 HELP\r\n".encode()
+        )
+
+    async def smtp_NOOP(self, argument: bytes):
+        self.reply("250 OK")
+
+    async def smtp_RSET(self, argument: bytes):
+        self.reset()
+        self.reply("250 OK")
+
+    async def smtp_VRFY(self, argument: bytes):
+        self.reply("252 Cannot VRFY user, but will accept message and attempt delivery")
+
+    async def smtp_HELP(self, argument: bytes):
+        self.reply("214 HELO EHLO MAIL RCPT DATA RSET NOOP VRFY QUIT")
+
+    async def smtp_MAIL(self, argument: bytes):
+        match = _PATH_RE.match(argument)
+        if match is None or not argument.upper().startswith(b"FROM:"):
+            self.reply("501 Syntax: MAIL FROM:<address>")
+        elif self.mail_from is not None:
+            self.reply("503 Nested MAIL command")
+        elif _SIZE_RE.search(argument) and int(_SIZE_RE.search(argument).group(1)) > self.server.max_message_size:
+            self.reply("552 Message exceeds the maximum size")
+        else:
+            self.mail_from = match.group(1).decode("utf-8", "replace")
+            self.reply("250 OK")
+
+    async def smtp_RCPT(self, argument: bytes):
+        match = _PATH_RE.match(argument)
+        if self.mail_from is None:
+            self.reply("503 Need MAIL before RCPT")
+        elif match is None or not match.group(1) or not argument.upper().startswith(b"TO:"):
+            self.reply("501 Syntax: RCPT TO:<address>")
+        else:
+            self.rcpt_tos.append(match.group(1).decode("utf-8", "replace"))
+            self.reply("250 OK")
+
+    async def smtp_DATA(self, argument: bytes):
+        if not self.rcpt_tos:
+            self.reply("503 Need RCPT before DATA")
+            return
+        self.reply("354 End data with <CR><LF>.<CR><LF>")
+        await self.writer.drain()
+        lines = []
+        size = 0
+        line_start = True
+        while True:
+            try:
+                line = await self.reader.readuntil(b"\n")
+                continued, line_start = not line_start, True
+            except asyncio.LimitOverrunError as e:
+                # Read a line longer than the stream's buffer in pieces
+                line = await self.reader.readexactly(e.consumed)
+                continued, line_start = not line_start, False
+            if not continued:
+                if line in (b".\r\n", b".\n"):
+                    break
+                # Undo the dot stuffing of lines starting with a dot
+                if line.startswith(b".."):
+                    line = line[1:]
+            # Stored with the same line endings as email sent through Django
+            if line.endswith(b"\r\n"):
+                line = line[:-2] + b"\n"
+            size += len(line)
+            # Still read the rest of a message which is too large so that the connection can be used for the next one
+            if size <= self.server.max_message_size:
+                lines.append(line)
+        mail_from, rcpt_tos = self.mail_from, self.rcpt_tos
+        self.reset()
+        if size > self.server.max_message_size:
+            self.reply("552 Message exceeds the maximum size")
+            return
+        try:
+            await self.server.batcher.store(ReceivedMessage(mail_from, rcpt_tos, b"".join(lines)))
+        except Exception:
+            logger.exception("Failed to store the email from %s to %s", mail_from, ", ".join(rcpt_tos))
+            self.reply("451 Failed to store the message")
+        else:
+            self.reply("250 OK")
+
+
+class SMTPServer:
+    """
+    Accepts email over SMTP and stores it with the email backend returned by `get_connection`, which is called once in
+    the thread the email is stored in.
+    """
+
+    def __init__(
+        self,
+        get_connection: Callable[[], Any],
+        host: str = "127.0.0.1",
+        port: int = 1025,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+    ):
+        self.get_connection = get_connection
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.max_message_size = max_message_size
+        self.hostname = str(DNS_NAME)
+        self.batcher: Optional[_Batcher] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._writers: "set[asyncio.StreamWriter]" = set()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            await _Session(self, reader, writer).handle()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self):
+        """
+        Start listening, after which `self.port` is the port listened on if it was 0.
+        """
+        self.batcher = _Batcher(self.get_connection, self.batch_size)
+        try:
+            await self.batcher.open()
+        except BaseException:
+            self.batcher.close()
+            raise
+        self._batcher_task = asyncio.ensure_future(self.batcher.run())
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=64 * 1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self.server.wait_closed()
+        self._batcher_task.cancel()
+        try:
+            await self._batcher_task
+        except asyncio.CancelledError:
+            pass
+        self.batcher.close()
@@ -9,6 +9,8 @@ urlpatterns = [
         name="mail_viewer_attachment",
     ),
     re_path(r"message/(?P<message_id>.+)/delete/$", views.EmailDeleteView.as_view(), name="mail_viewer_delete"),
+    re_path(r"message/(?P<message_id>.+)/thread/$", views.EmailThreadView.as_view(), name="mail_viewer_thread"),
     re_path(r"message/(?P<message_id>.+)/$", views.EmailDetailView.as_view(), name="mail_viewer_detail"),
+    re_path(r"export/$", views.EmailExportView.as_view(), name="mail_viewer_export"),
     re_path(r"", views.EmailListView.as_view(), name="mail_viewer_list"),
 ]
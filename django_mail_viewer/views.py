@@ -1,20 +1,59 @@
 from io import BytesIO
+from typing import Optional
 
 from django.core import mail
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.urls import reverse
 from django.utils.encoding import smart_str
 from django.views.generic.base import TemplateView, View
 
+from .export import EXPORT_FORMATS, iter_messages
+from .forms import OutboxFilterForm
+from .mailboxes import validate_mailbox
 
-class SingleEmailMixin:
+# Cookie remembering the mailbox chosen in the viewer
+MAILBOX_COOKIE = "mailviewer_mailbox"
+
+
+class MailboxMixin:
+    """
+    Mixin for views which read email from the mailbox chosen in the viewer with the `mailbox` query string parameter,
+    which the list view remembers in a cookie.
+    """
+
+    def get_mailbox(self) -> Optional[str]:
+        """
+        Return the chosen mailbox, or None to use the backend's default mailbox.
+        """
+        mailbox = self.request.GET.get("mailbox", self.request.COOKIES.get(MAILBOX_COOKIE))
+        if mailbox is None:
+            return None
+        try:
+            return validate_mailbox(mailbox)
+        except ValueError:
+            return None
+
+    def get_connection(self):
+        mailbox = self.get_mailbox()
+        if mailbox is None:
+            return mail.get_connection()
+        return mail.get_connection(mailbox=mailbox)
+
+
+class SingleEmailMixin(MailboxMixin):
     """
     Mixin for details for a single email
     """
 
     def get_message(self):
         message = None
-        with mail.get_connection() as connection:
+        with self.get_connection() as connection:
             message_id = self.kwargs.get("message_id")
             # TODO: put this fiddling with brackets on the backend itself...
             message = connection.get_message(f"<{message_id}>")
@@ -96,7 +135,7 @@ class SingleEmailMixin:
         return (subject, body, html, msg_from, to, attachments)
 
 
-class EmailListView(TemplateView):
+class EmailListView(MailboxMixin, TemplateView):
     """
     Display a list of sent emails.
     """
@@ -107,10 +146,75 @@ class EmailListView(TemplateView):
         # TODO: need to make a custom backend which sets a predictable message-id header.
         # built in locmem uses a random number each time the message is accessed
         # preventing lookup in the detail view
-        with mail.get_connection() as connection:
+        filter_form = OutboxFilterForm(self.request.GET)
+        # Invalid filters are shown with their errors on the form and left out rather than failing the whole list
+        filters = filter_form.get_outbox_kwargs() if filter_form.is_valid() else {}
+        with self.get_connection() as connection:
             # add a backend.get_outbox() for supporting multiple backends?
-            outbox = connection.get_outbox()
-        return super().get_context_data(outbox=outbox, **kwargs)
+            outbox = connection.get_outbox(**filters)
+        return super().get_context_data(
+            outbox=outbox,
+            filter_form=filter_form,
+            recipient=filters.get("recipient", ""),
+            mailbox=getattr(connection, "mailbox", ""),
+            export_query=self.request.GET.urlencode(),
+            **kwargs,
+        )
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if "mailbox" in request.GET:
+            mailbox = self.get_mailbox()
+            if mailbox:
+                response.set_cookie(MAILBOX_COOKIE, mailbox, samesite="Lax")
+            else:
+                response.delete_cookie(MAILBOX_COOKIE, samesite="Lax")
+        return response
+
+
+class EmailThreadView(MailboxMixin, TemplateView):
+    """
+    Display the list of emails in the same thread as an email.
+    """
+
+    template_name = "mail_viewer/email_list.html"
+
+    def get_context_data(self, **kwargs):
+        message_id = self.kwargs.get("message_id")
+        with self.get_connection() as connection:
+            outbox = connection.get_thread(f"<{message_id}>")
+        if not outbox:
+            raise Http404
+        return super().get_context_data(outbox=outbox, thread_message_id=message_id, **kwargs)
+
+
+class EmailExportView(MailboxMixin, View):
+    """
+    Stream the email in the list, filtered by the same query string parameters, or the email given by repeated
+    `message_id` parameters, as an mbox file or, with `format=zip`, a zip file of .eml files.
+    """
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "mbox")
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown export format {export_format!r}.")
+        filter_form = OutboxFilterForm(request.GET)
+        if not filter_form.is_valid():
+            # Rather than leaving out the invalid filters like the list does and exporting more email than was asked for
+            return HttpResponseBadRequest("Invalid filters.")
+        filters = filter_form.get_outbox_kwargs()
+        # Given like the ids in the viewer's urls, without the angle brackets of the Message-ID
+        message_ids = [f"<{message_id.strip('<>')}>" for message_id in request.GET.getlist("message_id")]
+        generate, content_type, extension = EXPORT_FORMATS[export_format]
+        connection = self.get_connection()
+
+        def stream():
+            with connection:
+                yield from generate(iter_messages(connection, message_ids, **filters))
+
+        response = StreamingHttpResponse(stream(), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="mail-viewer-export.{extension}"'
+        return response
 
 
 class EmailDetailView(SingleEmailMixin, TemplateView):
@@ -140,7 +244,7 @@ class EmailDetailView(SingleEmailMixin, TemplateView):
         lookup_id = kwargs.get("message_id")
         message = self.message
 
-        with mail.get_connection() as connection:
+        with self.get_connection() as connection:
             outbox = connection.get_outbox()
 
         subject, text_body, html_body, sender, to, attachments = self._parse_email_parts(message, decode_files=False)
@@ -199,7 +303,7 @@ class EmailDeleteView(SingleEmailMixin, TemplateView):
         lookup_id = kwargs.get("message_id")
         message = self.message
 
-        with mail.get_connection() as connection:
+        with self.get_connection() as connection:
             outbox = connection.get_outbox()
 
         subject, text_body, html_body, sender, to, attachments = self._parse_email_parts(message, decode_files=False)
@@ -231,7 +335,7 @@ class EmailDeleteView(SingleEmailMixin, TemplateView):
         """
         # TODO: Should this be on its own view and support GET requests as well just to function with minimal javascript in the browser?
         message_id = self.kwargs.get("message_id")
-        with mail.get_connection() as connection:
+        with self.get_connection() as connection:
             pass
             # TODO: put this fiddling with brackets on the backend itself...
             # cache and database backends would function without brackets, although they would need to remove them
@@ -11,9 +11,16 @@ try:
         DEBUG=True,
         USE_TZ=True,
         # TODO: test on multiple database backends?
-        DATABASES={"default": {
-            "ENGINE": "django.db.backends.sqlite3",
-        }},
+        DATABASES={
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+            },
+            "mailviewer": {
+                "ENGINE": "django.db.backends.sqlite3",
+            },
+        },
+        DATABASE_ROUTERS=["django_mail_viewer.backends.database.routers.MailViewerRouter"],
+        MAILVIEWER_DATABASE_ALIAS="mailviewer",
         ROOT_URLCONF="django_mail_viewer.urls",
         INSTALLED_APPS=[
             "django.contrib.auth",
@@ -39,9 +46,18 @@ try:
             },
             'test_mailviewer': {
                 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-            }
+            },
+            'test_mailviewer_shard_1': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'test_mailviewer_shard_1',
+            },
+            'test_mailviewer_shard_2': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'test_mailviewer_shard_2',
+            },
         },
         MAILVIEWER_CACHE='test_mailviewer',
+        MAILVIEWER_CACHE_SHARDS=['test_mailviewer_shard_1', 'test_mailviewer_shard_2'],
         MEDIA_ROOT=str(root_dir / '.test_media_root/')
     )
 
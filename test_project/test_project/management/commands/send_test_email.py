@@ -1,34 +1,237 @@
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import django
+from django import db
+from django.apps import apps
+from django.conf import settings
 from django.core import mail
-from django.core.mail import send_mail
 from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
 
 import magic
 
+# Headers tagging the email sent by a run so that the email each process sent can be counted in the backend afterwards
+RUN_HEADER = "X-Load-Test-Run"
+PROCESS_HEADER = "X-Load-Test-Process"
+
+DEFAULT_TEXT = "The message in text/plain"
+DEFAULT_HTML = (
+    "<html><head>"
+    "<style>"
+    "@font-face {font-family: SourceCodePro; src: url(/static/fonts/SourceCodePro-Light.otf);}"
+    "</style>"
+    '</head><body><p style="font-family: SourceCodePro; background-color: #AABBFF; color: white">The message as text/html</p></body></html>'
+)
+FILLER = "The quick brown fox jumps over the lazy dog. "
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Nearest rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def build_message(options: Dict[str, Any], run_id: str, process: int, number: int) -> mail.EmailMultiAlternatives:
+    if options["body_size"]:
+        text = (FILLER * (options["body_size"] // len(FILLER) + 1))[: options["body_size"]]
+        html = f"<html><body><p>{text}</p></body></html>"
+    else:
+        text, html = DEFAULT_TEXT, DEFAULT_HTML
+    recipients = (
+        ["to@example.com"]
+        if options["recipients"] == 1
+        else [f"to{i}@example.com" for i in range(options["recipients"])]
+    )
+    subject = "Subject here" if options["count"] == 1 else f"Load test {number}"
+    m = mail.EmailMultiAlternatives(
+        subject,
+        text,
+        "test@example.com",
+        recipients,
+        headers={RUN_HEADER: run_id, PROCESS_HEADER: str(process)},
+    )
+    m.attach_alternative(html, "text/html")
+    for i, content in enumerate(options["attachment_contents"]):
+        m.attach(f"attachment-{i}.bin", content, "application/octet-stream")
+    if options["attach_file"]:
+        m.attach_file(options["attach_file"], options["attach_file_type"])
+    return m
+
+
+def run_process(options: Dict[str, Any], backend: Optional[str], run_id: str, process: int, count: int) -> dict:
+    """
+    Send `count` emails from `options["threads"]` threads in this process, then count how many of them the backend
+    stored. Runs in a worker process when sending from more than one.
+    """
+    if not apps.ready:
+        # Worker processes which were spawned rather than forked start without Django set up
+        django.setup()
+    connection_kwargs = {"mailbox": options["mailbox"]} if options["mailbox"] is not None else {}
+    latencies: List[float] = []
+    results: Dict[str, Any] = {"sent": 0, "errors": 0, "error": None}
+    lock = threading.Lock()
+    threads = options["threads"]
+
+    def send(thread: int):
+        # Spread as evenly as possible, with the first threads sending one more when it does not divide evenly
+        thread_count = count // threads + (1 if thread < count % threads else 0)
+        thread_latencies = []
+        sent = errors = 0
+        error = None
+        try:
+            with mail.get_connection(backend, **connection_kwargs) as connection:
+                for start in range(0, thread_count, options["batch_size"]):
+                    batch = [
+                        build_message(options, run_id, process, number)
+                        for number in range(start, min(start + options["batch_size"], thread_count))
+                    ]
+                    started = time.perf_counter()
+                    try:
+                        sent += connection.send_messages(batch) or 0
+                    except Exception as e:
+                        errors += len(batch)
+                        error = error or f"{type(e).__name__}: {e}"
+                    thread_latencies.append(time.perf_counter() - started)
+        finally:
+            db.connections.close_all()
+            with lock:
+                latencies.extend(thread_latencies)
+                results["sent"] += sent
+                results["errors"] += errors
+                results["error"] = results["error"] or error
+
+    started = time.time()
+    workers = [threading.Thread(target=send, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    finished = time.time()
+
+    # None when the backend, such as Django's SMTP backend, cannot say what it stored
+    stored = None
+    connection = mail.get_connection(backend, **connection_kwargs)
+    if callable(getattr(connection, "get_outbox", None)):
+        with connection:
+            stored = len(connection.get_outbox(headers={RUN_HEADER: run_id, PROCESS_HEADER: str(process)}))
+    db.connections.close_all()
+    return {**results, "stored": stored, "latencies": latencies, "started": started, "finished": finished}
+
 
 class Command(BaseCommand):
-    help = "Sends an email"
+    help = (
+        "Sends an email, or with --count and the other options, generates load on the email backend and reports how "
+        "fast it captured the email and whether any was lost"
+    )
 
     def add_arguments(self, parser):
-        #     parser.add_argument('to', nargs='+', type=str)
-        #     parser.add_argument('cc', nargs='+', type=str)
-        #     parser.add_argument('bcc', nargs='+', type=str)
-        #     parser.add_argument('text-only', type=bool)
         parser.add_argument("-a", "--attach-file", nargs="?", type=str, required=False)
+        parser.add_argument("-n", "--count", type=int, default=1, help="Number of emails to send. Default 1")
+        parser.add_argument("--threads", type=int, default=1, help="Threads sending email in each process. Default 1")
+        parser.add_argument("--processes", type=int, default=1, help="Processes sending email. Default 1")
+        parser.add_argument(
+            "--batch-size", type=int, default=1, help="Emails passed to each send_messages() call. Default 1"
+        )
+        parser.add_argument(
+            "--body-size",
+            type=int,
+            default=0,
+            help="Size in characters of the text body, and of the HTML body's text. Defaults to short fixed bodies",
+        )
+        parser.add_argument("--attachments", type=int, default=0, help="Attachments on each email. Default 0")
+        parser.add_argument(
+            "--attachment-size", type=int, default=1024, help="Size in bytes of each attachment. Default 1024"
+        )
+        parser.add_argument("--recipients", type=int, default=1, help="To addresses on each email. Default 1")
+        parser.add_argument(
+            "--backend",
+            action="append",
+            dest="backends",
+            help="Dotted path of an email backend to send with, may be repeated to compare backends. "
+            "Defaults to settings.EMAIL_BACKEND",
+        )
+        parser.add_argument("--mailbox", help="Mailbox to send email to")
 
     def handle(self, *args, **options):
-        m = mail.EmailMultiAlternatives(
-            "Subject here", "The message in text/plain", "test@example.com", ["to@example.com"]
+        for name in ["count", "threads", "processes", "batch_size", "recipients"]:
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        for backend in options["backends"] or [None]:
+            try:
+                backend_class = import_string(backend or settings.EMAIL_BACKEND)
+            except ImportError as e:
+                raise CommandError(f"Cannot import email backend {backend or settings.EMAIL_BACKEND}: {e}")
+            # Other backends would quietly send to their usual place rather than to the mailbox
+            if options["mailbox"] is not None and not callable(getattr(backend_class, "get_outbox", None)):
+                raise CommandError(
+                    f"--mailbox needs a Django Mail Viewer backend, {backend or settings.EMAIL_BACKEND} has no "
+                    "get_outbox()."
+                )
+        options["attach_file_type"] = None
+        if options["attach_file"]:
+            options["attach_file_type"] = magic.from_file(options["attach_file"], mime=True)
+        # The same random content on every email so that generating email costs as little as possible
+        options["attachment_contents"] = [os.urandom(options["attachment_size"]) for _ in range(options["attachments"])]
+
+        for backend in options["backends"] or [None]:
+            self.run(options, backend)
+
+    def run(self, options: Dict[str, Any], backend: Optional[str]):
+        run_id = uuid.uuid4().hex
+        processes = options["processes"]
+        counts = [
+            options["count"] // processes + (1 if i < options["count"] % processes else 0) for i in range(processes)
+        ]
+        if processes == 1:
+            results = [run_process(options, backend, run_id, 0, counts[0])]
+        else:
+            # Forked processes must not share this process's database connections
+            db.connections.close_all()
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [
+                    executor.submit(run_process, options, backend, run_id, process, counts[process])
+                    for process in range(processes)
+                ]
+                results = [future.result() for future in futures]
+
+        if options["count"] == 1 and not options["backends"]:
+            # Sending a single email to try out the viewer
+            if results[0]["errors"]:
+                raise CommandError(f"Sending the email failed: {results[0]['error']}")
+            return
+
+        connection_class = type(mail.get_connection(backend))
+        backend_name = f"{connection_class.__module__}.{connection_class.__name__}"
+        sent = sum(r["sent"] for r in results)
+        errors = sum(r["errors"] for r in results)
+        stored = None if any(r["stored"] is None for r in results) else sum(r["stored"] for r in results)
+        seconds = max(r["finished"] for r in results) - min(r["started"] for r in results)
+        latencies = sorted(latency for r in results for latency in r["latencies"])
+        percentiles = ", ".join(f"p{p} {percentile(latencies, p) * 1000:.2f}ms" for p in [50, 90, 99])
+        self.stdout.write(f"{backend_name}:")
+        rate = (sent if stored is None else stored) / seconds if seconds else 0
+        self.stdout.write(
+            f"  Sent {sent} of {options['count']} emails with {processes} processes of {options['threads']} threads "
+            f"in {seconds:.2f} seconds ({rate:.1f} emails/second {'sent' if stored is None else 'stored'})"
+        )
+        self.stdout.write(
+            f"  send_messages() of {options['batch_size']} emails: {percentiles}, "
+            f"max {(latencies[-1] if latencies else 0) * 1000:.2f}ms"
         )
-        m.attach_alternative(
-            "<html><head>"
-            "<style>"
-            "@font-face {font-family: SourceCodePro; src: url(/static/fonts/SourceCodePro-Light.otf);}"
-            "</style>"
-            '</head><body><p style="font-family: SourceCodePro; background-color: #AABBFF; color: white">The message as text/html</p></body></html>',
-            "text/html",
+        self.stdout.write(
+            f"  Stored {'unknown' if stored is None else stored}, "
+            f"dropped {'unknown' if stored is None else options['count'] - stored}, {errors} emails in send_messages() "
+            "calls which raised an error"
         )
-        attach_file = options.get("attach_file", "")
-        if attach_file:
-            mime_type = magic.from_file(attach_file, mime=True)
-            m.attach_file(attach_file, mime_type)
-        m.send()
+        error = next((r["error"] for r in results if r["error"]), None)
+        if error:
+            self.stderr.write(f"  First error: {error}")
@@ -2,19 +2,59 @@
 Test django_mail_viewer.backends
 """
 
-import json
+import datetime
+import email.utils
+import hashlib
+import mailbox
+import multiprocessing
+import os
 import shutil
+import tempfile
 import threading
 import time
+from email import encoders
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.text import MIMEText
 from pathlib import Path
+from unittest import mock, skipUnless
 
 from django.conf import settings
 from django.core import cache, mail
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
 from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+from django_mail_viewer import settings as mailviewer_settings
+from django_mail_viewer.backends import locmem
+from django_mail_viewer.backends.cache import _HashRing, _MessageLRU
+from django_mail_viewer.backends.database.backend import _iter_decoded_payload
 from django_mail_viewer.backends.database.models import EmailMessage
+from django_mail_viewer.backends.filesystem import _IndexReader
+from django_mail_viewer.backends.locmem import _RingBuffer, _Snapshots, restore_snapshot, save_snapshot
+from django_mail_viewer.backends.mbox import _get_index as _mbox_index
+from django_mail_viewer.mailboxes import MAILBOX_HEADER, use_mailbox
 from typing import Any
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# A Redis database which RedisBackendTest empties before each test
+REDIS_TEST_URL = os.environ.get("MAILVIEWER_TEST_REDIS_URL", "redis://localhost:6379/15")
+
+
+def redis_available() -> bool:
+    if redis is None:
+        return False
+    try:
+        return redis.Redis.from_url(REDIS_TEST_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
+
 
 def send_plaintext_messages(count: int, connection: Any):
     for x in range(count):
@@ -27,6 +67,202 @@ def send_plaintext_messages(count: int, connection: Any):
         ).send()
 
 
+def send_addressed_messages(connection: Any):
+    """
+    Send messages to a mix of To, Cc, and Bcc addresses for testing recipient lookups.
+    """
+    mail.EmailMessage(
+        "To", "Email text", "sender@example.com", ["Someone <Someone@example.com>"], connection=connection
+    ).send()
+    mail.EmailMessage(
+        "Cc",
+        "Email text",
+        "sender@example.com",
+        ["other@example.com"],
+        cc=["someone@example.com"],
+        connection=connection,
+    ).send()
+    mail.EmailMessage(
+        "Bcc",
+        "Email text",
+        "sender@example.com",
+        ["other@example.com"],
+        bcc=["someone@example.com"],
+        connection=connection,
+    ).send()
+    mail.EmailMessage("Other", "Email text", "someone@example.com", ["other@example.com"], connection=connection).send()
+
+
+def send_filterable_messages(connection: Any):
+    """
+    Send messages with a mix of subjects, addresses, headers, attachments, and dates for testing outbox queries.
+    """
+    mail.EmailMessage(
+        "Welcome",
+        "Email text",
+        "a@example.com",
+        ["x@example.com"],
+        headers={"X-Campaign": "welcome", "Date": "Mon, 01 Jan 2024 10:00:00 -0000"},
+        connection=connection,
+    ).send()
+    invoice = mail.EmailMessage(
+        "Invoice",
+        "Email text",
+        "b@example.com",
+        ["x@example.com"],
+        headers={"Date": "Tue, 02 Jan 2024 10:00:00 -0000"},
+        connection=connection,
+    )
+    invoice.attach("invoice.txt", "Amount due", "text/plain")
+    invoice.send()
+    mail.EmailMessage(
+        "Welcome back",
+        "Email text",
+        "a@example.com",
+        ["y@example.com"],
+        headers={"X-Campaign": "return", "Date": "Wed, 03 Jan 2024 10:00:00 -0000"},
+        connection=connection,
+    ).send()
+
+
+def assert_outbox_queries(test: Any, connection: Any):
+    """
+    Assert that get_outbox() applies each of the OutboxQuery filters, ordering, and limit to the messages from
+    send_filterable_messages().
+    """
+
+    def subjects(**kwargs):
+        return [m.get("subject") for m in connection.get_outbox(**kwargs)]
+
+    test.assertEqual(["Welcome", "Welcome back"], subjects(subject="welcome"))
+    test.assertEqual(["Welcome", "Welcome back"], subjects(sender="A@example.com"))
+    test.assertEqual(["Welcome"], subjects(sender="a@example.com", recipient="x@example.com"))
+    test.assertEqual(["Invoice"], subjects(has_attachments=True))
+    test.assertEqual(["Welcome", "Welcome back"], subjects(has_attachments=False))
+    test.assertEqual(["Welcome back"], subjects(headers={"x-campaign": "return"}))
+    test.assertEqual(["Welcome back", "Invoice", "Welcome"], subjects(ordering="-date"))
+    test.assertEqual(["Welcome back", "Invoice"], subjects(ordering="-date", limit=2))
+    test.assertEqual([], subjects(subject="welcome", has_attachments=True))
+    test.assertEqual(
+        ["Invoice"],
+        subjects(
+            since=datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc),
+            until=datetime.datetime(2024, 1, 3, tzinfo=datetime.timezone.utc),
+        ),
+    )
+    test.assertEqual(
+        ["Welcome back", "Invoice"],
+        subjects(since=datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc), ordering="-date"),
+    )
+    test.assertEqual(
+        ["Welcome"],
+        subjects(sender="a@example.com", until=datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc)),
+    )
+    with test.assertRaises(ValueError):
+        connection.get_outbox(ordering="subject")
+
+
+def send_inline_messages(connection: Any):
+    """
+    Send a message with an inline text body part and one with an inline image, which only the second counts as an
+    attachment.
+    """
+    m = mail.EmailMessage("Inline text", "Email text", "a@example.com", ["b@example.com"], connection=connection)
+    inline_text = MIMEText("Inline text", "plain")
+    inline_text.add_header("Content-Disposition", "inline")
+    m.attach(inline_text)
+    m.send()
+    m = mail.EmailMessage("Inline image", "Email text", "a@example.com", ["b@example.com"], connection=connection)
+    inline_image = MIMEImage((Path(__file__).resolve().parent / "test_files" / "icon.gif").read_bytes(), "gif")
+    inline_image.add_header("Content-Disposition", "inline", filename="icon.gif")
+    m.attach(inline_image)
+    m.send()
+
+
+def assert_inline_attachments(test: Any, connection: Any):
+    """
+    Assert that the has_attachments filter agrees with the database backend on the messages from
+    send_inline_messages().
+    """
+    test.assertEqual(["Inline image"], [m.get("subject") for m in connection.get_outbox(has_attachments=True)])
+    test.assertEqual(["Inline text"], [m.get("subject") for m in connection.get_outbox(has_attachments=False)])
+
+
+def send_threaded_messages(connection: Any):
+    """
+    Send two threads of messages, with a reply stored before the message it replies to, for testing threading.
+    """
+
+    def send(subject, message_id, in_reply_to="", references=""):
+        headers = {"Message-ID": message_id}
+        if in_reply_to:
+            headers["In-Reply-To"] = in_reply_to
+        if references:
+            headers["References"] = references
+        mail.EmailMessage(
+            subject, "Email text", "a@example.com", ["b@example.com"], headers=headers, connection=connection
+        ).send()
+
+    send("Start", "<start@example.com>")
+    send("Reply", "<reply@example.com>", "<start@example.com>", "<start@example.com>")
+    send("Other", "<other@example.com>")
+    # Only In-Reply-To for a message which has not been stored yet, so this starts a thread of its own
+    send("Late reply", "<late@example.com>", "<middle@example.com>")
+    # Joins the thread started by the late reply into the first thread
+    send("Middle", "<middle@example.com>", "<reply@example.com>", "<start@example.com> <reply@example.com>")
+
+
+def assert_threads(test: Any, connection: Any):
+    """
+    Assert that get_thread() finds the threads of the messages from send_threaded_messages().
+    """
+
+    def subjects(message_id):
+        return sorted(m.get("subject") for m in connection.get_thread(message_id))
+
+    test.assertEqual(["Late reply", "Middle", "Reply", "Start"], subjects("<start@example.com>"))
+    test.assertEqual(["Late reply", "Middle", "Reply", "Start"], subjects("<late@example.com>"))
+    test.assertEqual(["Other"], subjects("<other@example.com>"))
+    test.assertEqual([], subjects("<missing@example.com>"))
+    connection.delete_message("<reply@example.com>")
+    test.assertEqual(["Late reply", "Middle", "Start"], subjects("<middle@example.com>"))
+
+
+def assert_mailboxes(test: Any, backend: str):
+    """
+    Assert that email sent with each way of choosing a mailbox is only found through a connection to that mailbox.
+    """
+
+    def send(subject, connection, **kwargs):
+        mail.EmailMessage(
+            subject, "Email text", "a@example.com", ["b@example.com"], connection=connection, **kwargs
+        ).send()
+
+    with use_mailbox("tenant-a"):
+        send("A", mail.get_connection(backend))
+    with mail.get_connection(backend, mailbox="tenant-b") as connection:
+        send("B", connection)
+        send("Header", connection, headers={MAILBOX_HEADER: "tenant-a"})
+    send("Default", mail.get_connection(backend))
+
+    def subjects(**kwargs):
+        return sorted(m.get("subject") for m in mail.get_connection(backend, **kwargs).get_outbox())
+
+    test.assertEqual(["A", "Header"], subjects(mailbox="tenant-a"))
+    test.assertEqual(["B"], subjects(mailbox="tenant-b"))
+    test.assertEqual(["Default"], subjects())
+    a_connection = mail.get_connection(backend, mailbox="tenant-a")
+    test.assertEqual(["A", "Header"], sorted(m.get("subject") for m in a_connection.get_outbox(sender="a@example.com")))
+
+    b_connection = mail.get_connection(backend, mailbox="tenant-b")
+    a_message_id = a_connection.get_outbox()[0].get("message-id")
+    test.assertIsNone(b_connection.get_message(a_message_id))
+    b_connection.delete_message(a_message_id)
+    test.assertEqual(["A", "Header"], subjects(mailbox="tenant-a"))
+    with test.assertRaises(ValueError):
+        mail.get_connection(backend, mailbox="not a valid name")
+
+
 class LocMemBackendTest(SimpleTestCase):
     """
     Test django_mail_viewer.backends.locmem.EmailBackend
@@ -36,6 +272,7 @@ class LocMemBackendTest(SimpleTestCase):
 
     def setUp(self):
         mail.outbox = []
+        mail.mailviewer_outboxes = {}
 
     def test_send_messages_adds_message_to_mail_outbox(self):
         """
@@ -67,6 +304,25 @@ class LocMemBackendTest(SimpleTestCase):
             self.assertEqual(2, len(connection.get_outbox()))
             self.assertEqual(mail.outbox, connection.get_outbox())
 
+    def test_get_outbox_recipient(self):
+        """
+        Test that get_outbox(recipient=...) finds the messages sent To, Cc, or Bcc an address
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertEqual(
+                ["Cc", "Bcc", "Other"], [m.get("subject") for m in connection.get_outbox(recipient="Other@example.com")]
+            )
+            self.assertEqual([], list(connection.get_outbox(recipient="nobody@example.com")))
+
+            connection.delete_message(connection.get_outbox(recipient="someone@example.com")[0].get("message-id"))
+            self.assertEqual(
+                ["Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
     def test_delete_message(self):
         """
         Test the delete() method of the backend deletes the message from the outbox
@@ -82,6 +338,374 @@ class LocMemBackendTest(SimpleTestCase):
                     target_id, message.get("message-id"), f"Message with id {target_id} found in outbox after delete."
                 )
 
+    def test_get_outbox_query(self):
+        """
+        Test that get_outbox() filters, orders, and limits the messages by the OutboxQuery keyword arguments
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        """
+        Test that get_thread() finds the messages related by their Message-ID, In-Reply-To, and References headers
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        """
+        Test that each mailbox only has the email sent to it
+        """
+        assert_mailboxes(self, self.connection_backend)
+
+    def test_get_outbox_recipient_after_outbox_replaced(self):
+        """
+        Test that recipient lookups use the messages in mail.outbox after it has been replaced by something else
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            mail.outbox = mail.outbox[1:]
+            self.assertEqual(["Cc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")])
+
+    def test_get_outbox_is_unchanged_by_later_sends_and_deletes(self):
+        """
+        Test that get_outbox() returns a list of the outbox as it was when called, and that pages of it can be taken
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            outbox = connection.get_outbox()
+            self.assertIsInstance(outbox, list)
+            self.assertEqual(mail.outbox, outbox)
+            message_ids = [m.get("message-id") for m in outbox]
+            connection.delete_message(message_ids[0])
+            send_plaintext_messages(1, connection)
+            self.assertEqual(message_ids, [m.get("message-id") for m in outbox])
+            self.assertEqual(message_ids[1:], [m.get("message-id") for m in outbox[1:]])
+            self.assertEqual(message_ids[-1], outbox[-1].get("message-id"))
+            self.assertEqual(3, len(connection.get_outbox()))
+            self.assertEqual(message_ids[1:], [m.get("message-id") for m in connection.get_outbox(limit=2)])
+            outbox.append(outbox[0])
+            self.assertEqual(3, len(mail.outbox))
+
+    def test_readers_do_not_wait_for_writers(self):
+        """
+        Test that reading the outbox does not wait for the lock writers hold
+        """
+        results = []
+
+        def read():
+            with mail.get_connection(self.connection_backend) as connection:
+                results.append(connection.get_message(message_id))
+                results.append(len(connection.get_outbox(subject="Email subject")))
+
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            message_id = connection.get_outbox()[0].get("message-id")
+            reader = threading.Thread(target=read)
+            with locmem._get_index().lock:
+                reader.start()
+                reader.join(timeout=5)
+                self.assertFalse(reader.is_alive())
+            self.assertEqual(message_id, results[0].get("message-id"))
+            self.assertEqual(2, results[1])
+
+    def test_concurrent_sends_deletes_and_reads(self):
+        """
+        Test that messages are neither lost nor duplicated while threads send, delete, and read email at the same time
+        """
+        errors = []
+
+        def send(n):
+            with mail.get_connection(self.connection_backend) as connection:
+                for i in range(50):
+                    connection.send_messages(
+                        [mail.EmailMessage(f"Thread {n}", "Email text", "test@example.com", ["to1@example.com"])]
+                    )
+                    if i % 2:
+                        connection.delete_message(connection.get_outbox(subject=f"Thread {n}")[0].get("message-id"))
+
+        def read():
+            with mail.get_connection(self.connection_backend) as connection:
+                for _ in range(100):
+                    message_ids = [m.get("message-id") for m in connection.get_outbox()]
+                    if len(message_ids) != len(set(message_ids)):
+                        errors.append(message_ids)
+                    connection.get_outbox(recipient="to1@example.com", ordering="-date", limit=10)
+
+        threads = [threading.Thread(target=send, args=(n,)) for n in range(4)]
+        threads += [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual(100, len(connection.get_outbox()))
+            self.assertEqual(100, len(connection.get_outbox(recipient="to1@example.com")))
+            self.assertEqual(25, len(connection.get_outbox(subject="Thread 3")))
+
+    def test_send_while_deleting(self):
+        """
+        Test that email sent by another thread while a delete is replacing the outbox is kept, with its Bcc address
+        """
+
+        def send():
+            with mail.get_connection(self.connection_backend) as connection:
+                connection.send_messages(
+                    [
+                        mail.EmailMessage(
+                            "During delete",
+                            "Email text",
+                            "test@example.com",
+                            ["to1@example.com"],
+                            bcc=["bcc@example.com"],
+                        )
+                    ]
+                )
+
+        sender = threading.Thread(target=send)
+        set_outbox = locmem._set_outbox
+
+        def set_outbox_while_sending(mailbox, outbox):
+            # Between the delete making its copy of the outbox and putting it in place
+            sender.start()
+            sender.join(timeout=0.5)
+            set_outbox(mailbox, outbox)
+
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            message_id = connection.get_outbox()[0].get("message-id")
+            with mock.patch.object(locmem, "_set_outbox", set_outbox_while_sending):
+                connection.delete_message(message_id)
+            sender.join()
+            self.assertEqual(["Email subject 1", "During delete"], [m.get("subject") for m in connection.get_outbox()])
+            self.assertEqual(["During delete"], [m.get("subject") for m in mail.outbox[1:]])
+            self.assertEqual(
+                ["During delete"], [m.get("subject") for m in connection.get_outbox(recipient="bcc@example.com")]
+            )
+
+    def test_outbox_changed_outside_the_backend(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            message_id = connection.get_outbox()[0].get("message-id")
+            mail.outbox.clear()
+            self.assertIsNone(connection.get_message(message_id))
+            self.assertEqual([], connection.get_outbox(subject="Email subject"))
+            m = mail.EmailMessage("Appended", "Email text", "test@example.com", ["to1@example.com"]).message()
+            mail.outbox.append(m)
+            self.assertEqual([m], connection.get_outbox(subject="appended"))
+            self.assertIs(m, connection.get_message(m.get("message-id")))
+
+
+class LocMemSnapshotTest(SimpleTestCase):
+    """
+    Test saving and restoring snapshots of the locmem backend's outboxes
+    """
+
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.snapshot_path = str(Path(directory, "outbox.snapshot"))
+
+    def test_restore_snapshot(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            send_threaded_messages(connection)
+        with mail.get_connection(self.connection_backend, mailbox="tenant-a") as connection:
+            send_plaintext_messages(1, connection)
+        save_snapshot(self.snapshot_path)
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+
+        self.assertEqual(10, restore_snapshot(self.snapshot_path))
+        # Restored messages are not parsed until more than their headers is needed
+        self.assertTrue(all(m._message is None for m in mail.outbox))
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertEqual(
+                ["Late reply", "Middle", "Reply", "Start"],
+                sorted(m.get("subject") for m in connection.get_thread("<start@example.com>")),
+            )
+            self.assertTrue(all(m._message is None for m in mail.outbox))
+            self.assertEqual("Email text", connection.get_outbox()[0].get_payload())
+        with mail.get_connection(self.connection_backend, mailbox="tenant-a") as connection:
+            self.assertEqual(["Email subject 0"], [m.get("subject") for m in connection.get_outbox()])
+
+    def test_restore_snapshot_keeps_messages_sent_before_restoring(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            save_snapshot(self.snapshot_path)
+            outbox = mail.outbox
+            connection.delete_message(outbox[0].get("message-id"))
+            send_plaintext_messages(1, connection)
+            self.assertEqual(1, restore_snapshot(self.snapshot_path))
+            # Deleting and restoring replace mail.outbox rather than changing the list readers may be going through
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            self.assertEqual(
+                ["Email subject 0", "Email subject 1", "Email subject 0"],
+                [m.get("subject") for m in connection.get_outbox()],
+            )
+            self.assertEqual(0, restore_snapshot(self.snapshot_path + ".missing"))
+
+    def test_restore_corrupt_snapshot(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+        save_snapshot(self.snapshot_path)
+        data = Path(self.snapshot_path).read_bytes()
+        for length in [3, 40, len(data) - 3]:
+            with self.subTest(length=length):
+                Path(self.snapshot_path).write_bytes(data[:length])
+                with self.assertRaisesMessage(ValueError, self.snapshot_path):
+                    restore_snapshot(self.snapshot_path)
+
+    def test_send_with_corrupt_snapshot(self):
+        """
+        Test that a snapshot which cannot be restored is moved aside and snapshots are still saved
+        """
+        Path(self.snapshot_path).write_bytes(b"MVSS truncated")
+        snapshots = _Snapshots()
+        with mock.patch.object(mailviewer_settings, "MAILVIEWER_LOCMEM_SNAPSHOT_PATH", self.snapshot_path):
+            with mock.patch.object(locmem, "_snapshots", snapshots), mock.patch("atexit.register") as register:
+                with self.assertLogs("django_mail_viewer.backends.locmem", "WARNING"):
+                    with mail.get_connection(self.connection_backend) as connection:
+                        send_plaintext_messages(1, connection)
+            register.assert_called_once_with(snapshots.save_if_changed)
+            self.assertEqual(["Email subject 0"], [m.get("subject") for m in mail.outbox])
+            self.assertEqual(b"MVSS truncated", Path(self.snapshot_path + ".corrupt").read_bytes())
+            snapshots.save_if_changed()
+            mail.outbox = []
+            self.assertEqual(1, restore_snapshot(self.snapshot_path))
+
+    def test_snapshots_start(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(1, connection)
+        save_snapshot(self.snapshot_path)
+        mail.outbox = []
+        snapshots = _Snapshots()
+        with mock.patch.object(mailviewer_settings, "MAILVIEWER_LOCMEM_SNAPSHOT_PATH", self.snapshot_path):
+            with mock.patch("atexit.register") as register:
+                snapshots.start()
+                snapshots.start()
+            register.assert_called_once_with(snapshots.save_if_changed)
+            self.assertEqual(["Email subject 0"], [m.get("subject") for m in mail.outbox])
+            with mock.patch("django_mail_viewer.backends.locmem.save_snapshot") as save:
+                snapshots.save_if_changed()
+                save.assert_not_called()
+                snapshots.changed()
+                snapshots.save_if_changed()
+                save.assert_called_once_with(self.snapshot_path)
+
+
+def send_from_another_process(backend: str, subject: str):
+    with mail.get_connection(backend) as connection:
+        mail.EmailMessage(subject, "Email text", "a@example.com", ["b@example.com"], connection=connection).send()
+
+
+class SharedLocMemBackendTest(SimpleTestCase):
+    """
+    Test django_mail_viewer.backends.locmem.SharedEmailBackend
+    """
+
+    connection_backend = "django_mail_viewer.backends.locmem.SharedEmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.ring_path = Path(directory, "outbox.ring")
+        patcher = mock.patch.object(mailviewer_settings, "MAILVIEWER_SHARED_OUTBOX_PATH", str(self.ring_path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            outbox = connection.get_outbox()
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            self.assertEqual(outbox, mail.outbox)
+            message_id = outbox[1].get("message-id")
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+
+    def test_delete_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            target_id = connection.get_outbox()[1].get("message-id")
+            connection.delete_message(target_id)
+            self.assertEqual(
+                ["Email subject 0", "Email subject 2"], [m.get("subject") for m in connection.get_outbox()]
+            )
+
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "Needs to fork a process sharing the settings")
+    def test_outbox_shared_between_processes(self):
+        process = multiprocessing.get_context("fork").Process(
+            target=send_from_another_process, args=(self.connection_backend, "From another process")
+        )
+        process.start()
+        process.join()
+        self.assertEqual(0, process.exitcode)
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual(["From another process"], [m.get("subject") for m in connection.get_outbox()])
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_SHARED_OUTBOX_SIZE", 4096)
+    def test_overwritten_messages_leave_outbox(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(20, connection)
+            outbox = connection.get_outbox()
+            self.assertLess(0, len(outbox))
+            self.assertLess(len(outbox), 20)
+            self.assertEqual("Email subject 19", outbox[-1].get("subject"))
+            send_plaintext_messages(20, connection)
+            message_ids = {m.get("message-id") for m in connection.get_outbox()}
+            self.assertFalse(message_ids.intersection(m.get("message-id") for m in outbox))
+
+    def test_ring_buffer_wraps_around(self):
+        writer = _RingBuffer(self.ring_path, 64)
+        reader = _RingBuffer(self.ring_path, 1024)
+        self.assertEqual(64, reader.capacity)
+        writer.append([b"a" * 20, b"b" * 20])
+        tail, head, records = reader.read(0)
+        self.assertEqual([b"a" * 20, b"b" * 20], [data for _, data in records])
+        # Overwrites the first record and wraps around the end of the buffer
+        writer.append([b"c" * 20])
+        tail, head, records = reader.read(head)
+        self.assertEqual([b"c" * 20], [data for _, data in records])
+        self.assertEqual(24, tail)
+        self.assertEqual([b"b" * 20, b"c" * 20], [data for _, data in reader.read(0)[2]])
+        with self.assertRaises(ValueError):
+            writer.append([b"d" * 64])
+
 
 class CacheBackendTest(SimpleTestCase):
     """
@@ -150,6 +774,180 @@ class CacheBackendTest(SimpleTestCase):
                     target_id, message.get("message-id"), f"Message with id {target_id} found in outbox after delete."
                 )
 
+    def test_get_outbox_recipient(self):
+        """
+        Test that get_outbox(recipient=...) finds the messages sent To, Cc, or Bcc an address
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertEqual(
+                ["Cc", "Bcc", "Other"], [m.get("subject") for m in connection.get_outbox(recipient="Other@example.com")]
+            )
+            self.assertEqual([], list(connection.get_outbox(recipient="nobody@example.com")))
+
+            connection.delete_message(connection.get_outbox(recipient="someone@example.com")[0].get("message-id"))
+            self.assertEqual(
+                ["Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_query(self):
+        """
+        Test that get_outbox() filters, orders, and limits the messages by the OutboxQuery keyword arguments
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        """
+        Test that get_thread() finds the messages related by their Message-ID, In-Reply-To, and References headers
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        """
+        Test that each mailbox only has the email sent to it
+        """
+        assert_mailboxes(self, self.connection_backend)
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_CACHE_LRU_MAX_MESSAGES", 10)
+    def test_get_message_uses_lru(self):
+        """
+        Test that messages read once are served from the process local LRU until a message is deleted
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            message_ids = [m.get("message-id") for m in connection.get_outbox()]
+            with mock.patch.object(connection.cache, "get_many", wraps=connection.cache.get_many) as get_many:
+                message = connection.get_message(message_ids[0])
+                self.assertIs(message, connection.get_message(message_ids[0]))
+                self.assertEqual(3, len(connection.get_outbox()))
+                # Only the index is read since every message is in the LRU from get_outbox() above
+                get_many.assert_not_called()
+
+            # A delete by any connection changes the generation the LRU entries are for
+            mail.get_connection(self.connection_backend).delete_message(message_ids[1])
+            self.assertIsNone(connection.get_message(message_ids[1]))
+            self.assertEqual([message_ids[0], message_ids[2]], [m.get("message-id") for m in connection.get_outbox()])
+            self.assertIsNot(message, connection.get_message(message_ids[0]))
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_CACHE_LRU_MAX_MESSAGES", 10)
+    def test_get_message_missing_does_not_write(self):
+        """
+        Test that looking up a message which is not in the cache with the LRU enabled does not rewrite the index
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(1, connection)
+            with mock.patch.object(connection.cache, "set_many", wraps=connection.cache.set_many) as set_many:
+                self.assertIsNone(connection.get_message("<missing@example.com>"))
+                set_many.assert_not_called()
+            self.assertEqual(1, len(connection.get_outbox()))
+
+    def test_message_lru_bounds(self):
+        lru = _MessageLRU(max_messages=2, max_bytes=100)
+        lru.set("a", "A", 10)
+        lru.set("b", "B", 10)
+        lru.get("a")
+        lru.set("c", "C", 10)
+        self.assertEqual(["a", "c"], list(lru.entries))
+        lru.set("d", "D", 85)
+        self.assertEqual(["c", "d"], list(lru.entries))
+        lru.set("e", "E", 101)
+        self.assertIsNone(lru.get("e"))
+        self.assertEqual(95, lru.bytes)
+
+    def test_reads_prune_missing_messages_from_index(self):
+        """
+        Test that the ids of messages which were evicted from the cache are removed from the index entries read
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            evicted = connection.get_outbox(recipient="someone@example.com")[0].get("message-id")
+            self.mail_cache.delete(connection.message_key(evicted))
+
+            self.assertEqual(
+                ["Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertNotIn(evicted, self.mail_cache.get(connection.recipient_key("someone@example.com")))
+            self.assertNotIn(evicted, self.mail_cache.get(connection.cache_keys_key))
+            self.assertNotIn(evicted, [i for _, i in self.mail_cache.get(connection.date_index_key)])
+            self.assertIsNone(self.mail_cache.get(connection.summary_key(evicted)))
+
+    def test_compact_index(self):
+        """
+        Test that compact_index() rebuilds every index entry from the messages still in the cache
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            evicted = connection.get_outbox(recipient="someone@example.com")[0].get("message-id")
+            self.mail_cache.delete(connection.message_key(evicted))
+
+            self.assertEqual({"messages": 3, "removed": 1}, connection.compact_index(batch_size=2))
+            self.assertEqual(3, len(self.mail_cache.get(connection.cache_keys_key)))
+            self.assertEqual(2, len(self.mail_cache.get(connection.recipient_key("someone@example.com"))))
+            self.assertEqual(3, len(self.mail_cache.get(connection.date_index_key)))
+            self.assertEqual(
+                ["Cc", "Bcc", "Other"], [m.get("subject") for m in connection.get_outbox(recipient="other@example.com")]
+            )
+
+    def test_compact_index_removes_entries_with_no_messages_left(self):
+        """
+        Test that compact_index() deletes the address and thread entries of messages which were all evicted, and
+        rebuilds a summary evicted without its message
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            send_addressed_messages(connection)
+            for message_id in ["<other@example.com>", connection.get_outbox(subject="To")[0].get("message-id")]:
+                self.mail_cache.delete(connection.message_key(message_id))
+            other_thread_key = connection.thread_key("<other@example.com>")
+            self.assertIsNotNone(self.mail_cache.get(other_thread_key))
+            self.mail_cache.delete(connection.summary_key("<reply@example.com>"))
+
+            self.assertEqual({"messages": 7, "removed": 2}, connection.compact_index(batch_size=3))
+            self.assertIsNone(self.mail_cache.get(other_thread_key))
+            # The evicted To email is removed, leaving the Cc and Bcc email
+            self.assertEqual(2, len(self.mail_cache.get(connection.recipient_key("someone@example.com"))))
+            self.assertEqual(
+                ["Late reply", "Middle", "Reply", "Start"],
+                sorted(m.get("subject") for m in connection.get_thread("<reply@example.com>")),
+            )
+            self.assertEqual(
+                ["Reply", "Late reply"], [m.get("subject") for m in connection.get_outbox(subject="reply")]
+            )
+
+    def test_compact_index_deletes_entries_of_fully_evicted_recipient(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(1, connection)
+            mail.EmailMessage(
+                "Only", "Email text", "only@example.com", ["gone@example.com"], connection=connection
+            ).send()
+            message_id = connection.get_outbox(recipient="gone@example.com")[0].get("message-id")
+            self.mail_cache.delete(connection.message_key(message_id))
+            self.assertEqual({"messages": 1, "removed": 1}, connection.compact_index())
+            self.assertIsNone(self.mail_cache.get(connection.recipient_key("gone@example.com")))
+            self.assertIsNone(self.mail_cache.get(connection.sender_key("only@example.com")))
+            self.assertEqual(1, len(self.mail_cache.get(connection.recipient_key("to1@example.com"))))
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_CACHE_TIMEOUT", 60)
+    def test_messages_and_index_share_timeout(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            with mock.patch.object(connection.cache, "set_many", wraps=connection.cache.set_many) as set_many:
+                send_plaintext_messages(1, connection)
+        self.assertEqual(2, set_many.call_count)
+        for call in set_many.call_args_list:
+            self.assertEqual(60, call.args[1])
+
     def test_cache_lock(self):
         """
         Test that the cache_lock() method works with multiple threads.
@@ -213,48 +1011,740 @@ class CacheBackendTest(SimpleTestCase):
                 self.assertIn(sent_message_before_message_id, original_messages_before_message_id)
 
 
-class DatabaseBackendTest(TestCase):
+class ShardedCacheBackendTest(SimpleTestCase):
     """
-    Test django_mail_viewer.backends.cache.EmailBackend
+    Test django_mail_viewer.backends.cache.ShardedEmailBackend
     """
 
-    connection_backend = "django_mail_viewer.backends.database.backend.EmailBackend"
+    connection_backend = "django_mail_viewer.backends.cache.ShardedEmailBackend"
 
-    @classmethod
-    def tearDownClass(cls) -> None:
-        try:
-            shutil.rmtree(settings.MEDIA_ROOT)
-        finally:
-            super().tearDownClass()
+    def setUp(self):
+        self.shard_caches = [cache.caches[alias] for alias in settings.MAILVIEWER_CACHE_SHARDS]
+        for shard_cache in self.shard_caches:
+            shard_cache.clear()
 
-    def test_send_plaintext_email(self):
-        original_email_count = EmailMessage.objects.count()
-        m = mail.EmailMultiAlternatives(
-            "Email subject", "Email text", "test@example.com", ["to1@example.com", "to2.example.com"]
-        )
+    def test_send_messages_spreads_messages_across_shards(self):
         with mail.get_connection(self.connection_backend) as connection:
-            self.assertEqual(1, connection.send_messages([m]))
+            send_plaintext_messages(20, connection)
+            shard_keys = [shard_cache.get("message_keys", []) for shard_cache in self.shard_caches]
+            self.assertTrue(all(shard_keys))
+            self.assertEqual(20, sum(len(keys) for keys in shard_keys))
+            outbox = connection.get_outbox()
+            self.assertEqual(20, len(outbox))
+            message_id = outbox[0].get("message-id")
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+            connection.delete_message(message_id)
+            self.assertIsNone(connection.get_message(message_id))
+            self.assertEqual(19, len(connection.get_outbox()))
 
-        self.assertEqual(original_email_count + 1, EmailMessage.objects.count())
-        email = EmailMessage.objects.latest("id")
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
 
-        expected_headers = {
-            "Content-Type": 'text/plain; charset="utf-8"',
-            "MIME-Version": "1.0",
-            "Content-Transfer-Encoding": "7bit",
-            "Subject": "Email subject",
-            "From": "test@example.com",
-            "To": "to1@example.com, to2.example.com",
-            "Message-ID": email.message_id,
-        }
-        actual_headers = json.loads(email.message_headers)
-        # Make sure there is a `Date` key in the headers and it has a value, but am not trying to match it up since
-        # I have no good way of knowing what it should be.
-        self.assertTrue(actual_headers.get("Date"))
-        # Now remove the `Date` key so that the dicts can be compared.
-        del actual_headers["Date"]
-        self.assertEqual(expected_headers, actual_headers)
-        self.assertEqual("Email text", email.content)
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+
+    def test_get_outbox_in_send_order(self):
+        """
+        Test that without an ordering the outbox is in the order the email was sent, not by its Date header
+        """
+        subjects = [f"Email {i}" for i in range(10)]
+        # Sent faster than time() changes, which is common
+        with mail.get_connection(self.connection_backend) as connection, mock.patch(
+            "django_mail_viewer.backends.cache.time", return_value=time.time()
+        ):
+            for i, subject in enumerate(subjects):
+                date = datetime.datetime(2024, 1, 10 - i, tzinfo=datetime.timezone.utc)
+                mail.EmailMessage(
+                    subject,
+                    "Email text",
+                    "a@example.com",
+                    ["b@example.com"],
+                    headers={"Date": email.utils.format_datetime(date)},
+                    connection=connection,
+                ).send()
+            shard_keys = [shard_cache.get("message_keys", []) for shard_cache in self.shard_caches]
+            self.assertTrue(all(shard_keys))
+            self.assertEqual(subjects, [m.get("subject") for m in connection.get_outbox()])
+            self.assertEqual(subjects[:3], [m.get("subject") for m in connection.get_outbox(limit=3)])
+            self.assertEqual(subjects[::-1], [m.get("subject") for m in connection.get_outbox(ordering="date")])
+
+    def test_get_outbox_ordering_without_valid_date(self):
+        """
+        Test that email without a valid Date header is ordered by when it was stored, as in a single cache
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            for subject, date in [
+                ("Invalid date", "not a date"),
+                ("Older", "Mon, 01 Jan 2024 10:00:00 -0000"),
+                ("Newer", "Tue, 02 Jan 2024 10:00:00 -0000"),
+            ]:
+                mail.EmailMessage(
+                    subject,
+                    "Email text",
+                    "a@example.com",
+                    ["b@example.com"],
+                    headers={"Date": date},
+                    connection=connection,
+                ).send()
+            self.assertEqual(
+                ["Older", "Newer", "Invalid date"], [m.get("subject") for m in connection.get_outbox(ordering="date")]
+            )
+            self.assertEqual(
+                ["Invalid date"], [m.get("subject") for m in connection.get_outbox(ordering="-date", limit=1)]
+            )
+
+    def test_hash_ring_moves_few_keys_when_adding_a_cache(self):
+        keys = [f"<{i}@example.com>" for i in range(1000)]
+        before = _HashRing(["a", "b", "c"])
+        after = _HashRing(["a", "b", "c", "d"])
+        moved = [key for key in keys if before.get(key) != after.get(key)]
+        # About a quarter of the keys move, all of them to the new cache
+        self.assertLess(len(moved), 400)
+        self.assertEqual({"d"}, {after.get(key) for key in moved})
+
+
+class RedisBackendRequirementsTest(SimpleTestCase):
+    """
+    Test the configuration django_mail_viewer.backends.redis.EmailBackend requires, without a Redis server
+    """
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_REDIS_URL", None)
+    def test_requires_redis_url_or_redis_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            mail.get_connection("django_mail_viewer.backends.redis.EmailBackend")
+
+
+@skipUnless(redis_available(), f"No Redis server at {REDIS_TEST_URL}, set MAILVIEWER_TEST_REDIS_URL to use another")
+class RedisBackendTest(SimpleTestCase):
+    """
+    Test django_mail_viewer.backends.redis.EmailBackend
+    """
+
+    connection_backend = "django_mail_viewer.backends.redis.EmailBackend"
+
+    def setUp(self):
+        self.client = redis.Redis.from_url(REDIS_TEST_URL)
+        self.client.flushdb()
+        patcher = mock.patch.object(mailviewer_settings, "MAILVIEWER_REDIS_URL", REDIS_TEST_URL)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            outbox = connection.get_outbox()
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            message_id = outbox[1].get("message-id")
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+            self.assertIsNone(connection.get_message("<missing@example.com>"))
+
+    def test_delete_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            target_id = connection.get_outbox()[1].get("message-id")
+            connection.delete_message(target_id)
+            self.assertIsNone(connection.get_message(target_id))
+            self.assertEqual(
+                ["Email subject 0", "Email subject 2"], [m.get("subject") for m in connection.get_outbox()]
+            )
+            self.assertEqual(2, self.client.zcard(connection.date_index_key))
+
+    def test_get_outbox_recipient(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertEqual(
+                ["Cc", "Bcc"],
+                [
+                    m.get("subject")
+                    for m in connection.get_outbox(recipient="other@example.com", sender="sender@example.com")
+                ],
+            )
+            connection.delete_message(connection.get_outbox(recipient="someone@example.com")[0].get("message-id"))
+            self.assertEqual(
+                ["Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_outbox_pages_until_limit(self):
+        """
+        Test that get_outbox() reads more pages of the sorted sets until it has found `limit` matching messages
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.page_size = 2
+            send_plaintext_messages(7, connection)
+            self.assertEqual(
+                ["Email subject 0", "Email subject 1", "Email subject 2"],
+                [m.get("subject") for m in connection.get_outbox(subject="subject", limit=3)],
+            )
+            self.assertEqual(
+                ["Email subject 6"], [m.get("subject") for m in connection.get_outbox(subject="subject 6")]
+            )
+
+    def test_get_outbox_reads_only_headers(self):
+        """
+        Test that listing email reads only `limit` Message-IDs and the headers in their summaries, and only reads a
+        message when its body is used
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            with mock.patch.object(connection.client, "zrange", wraps=connection.client.zrange) as zrange:
+                with mock.patch.object(connection.client, "mget") as mget:
+                    outbox = connection.get_outbox(limit=2)
+                    self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+                    mget.assert_not_called()
+            zrange.assert_called_once_with(connection.stored_key, 0, 1)
+            self.assertEqual("Email text 1", outbox[1].get_payload())
+            self.assertIn(b"Email text 0", outbox[0].as_bytes())
+            # Deleted after the outbox was read, the headers read with it are still there
+            connection.delete_message(outbox[0].get("message-id"))
+            self.assertEqual("Email subject 0", outbox[0]["subject"])
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_REDIS_URL", None)
+    def test_client(self):
+        """
+        Test using the backend with a redis client passed to it
+        """
+        with mail.get_connection(self.connection_backend, client=self.client) as connection:
+            send_plaintext_messages(1, connection)
+            self.assertEqual(1, self.client.zcard(connection.stored_key))
+
+
+class FilesystemBackendTest(SimpleTestCase):
+    """
+    Test django_mail_viewer.backends.filesystem.EmailBackend
+    """
+
+    connection_backend = "django_mail_viewer.backends.filesystem.EmailBackend"
+
+    def setUp(self):
+        self.file_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.file_path)
+        patcher = mock.patch.object(mailviewer_settings, "MAILVIEWER_FILE_PATH", self.file_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_send_messages_writes_eml_files(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            outbox = connection.get_outbox()
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            message_id = outbox[1].get("message-id")
+            path = connection.message_path(message_id)
+            self.assertEqual(Path(self.file_path, "default", "messages"), path.parents[2])
+            self.assertIn(b"Email text 1", path.read_bytes())
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+            self.assertIsNone(connection.get_message("<missing@example.com>"))
+
+    def test_delete_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            target_id = connection.get_outbox()[1].get("message-id")
+            connection.delete_message(target_id)
+            self.assertFalse(connection.message_path(target_id).exists())
+            self.assertEqual(
+                ["Email subject 0", "Email subject 2"], [m.get("subject") for m in connection.get_outbox()]
+            )
+
+    def test_get_outbox_recipient(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+
+    def test_get_outbox_reads_only_the_index(self):
+        """
+        Test that listing email answers from the headers in the index and only reads a message's file when its body
+        is used
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            with mock.patch("email.message_from_binary_file", wraps=email.message_from_binary_file) as parse:
+                outbox = connection.get_outbox()
+                self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+                self.assertEqual(1, len(connection.get_outbox(subject="subject 1", ordering="-date")))
+                parse.assert_not_called()
+                self.assertEqual("Email text 1", outbox[1].get_payload())
+                parse.assert_called_once()
+            self.assertIn(b"Email text 0", outbox[0].as_bytes())
+
+    def test_index_reader_replays_deletes_and_replacements(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(4, connection)
+            message_ids = [m.get("message-id") for m in connection.get_outbox()]
+            connection.delete_message(message_ids[0])
+            connection.delete_message(message_ids[2])
+            # The same Message-ID stored again replaces the message and moves it to the end
+            mail.EmailMessage(
+                "Again",
+                "Email text",
+                "a@example.com",
+                ["b@example.com"],
+                headers={"Message-ID": message_ids[1]},
+                connection=connection,
+            ).send()
+            # A new reader replays them all in one refresh
+            reader = _IndexReader(connection.index_path)
+            self.assertEqual([message_ids[3], message_ids[1]], [m.get("message-id") for m in reader.refresh().outbox])
+            self.assertEqual(0, reader.stale)
+            self.assertEqual(["Email subject 3", "Again"], [m.get("subject") for m in connection.get_outbox()])
+
+    def test_compact_index(self):
+        """
+        Test that compact_index() rewrites the index with a line for each message still stored, in the order they
+        were stored, and that readers and later appends use the new file
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(4, connection)
+            message_ids = [m.get("message-id") for m in connection.get_outbox()]
+            connection.delete_message(message_ids[0])
+            mail.EmailMessage(
+                "Again",
+                "Email text",
+                "a@example.com",
+                ["b@example.com"],
+                headers={"Message-ID": message_ids[1]},
+                connection=connection,
+            ).send()
+            # Gone without a delete entry in the index
+            connection.message_path(message_ids[2]).unlink()
+            self.assertEqual({"messages": 2, "removed": 4}, connection.compact_index(batch_size=1))
+            self.assertEqual(2, len(connection.index_path.read_bytes().splitlines()))
+            self.assertEqual(["Email subject 3", "Again"], [m.get("subject") for m in connection.get_outbox()])
+            send_plaintext_messages(1, connection)
+            self.assertEqual(3, len(connection.index_path.read_bytes().splitlines()))
+            self.assertEqual(
+                ["Email subject 3", "Again", "Email subject 0"], [m.get("subject") for m in connection.get_outbox()]
+            )
+
+    def test_index_reader_reads_only_complete_appended_entries(self):
+        """
+        Test that another process reading the index picks up only what was appended since it last read it, leaving
+        a line still being written for later
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(1, connection)
+            reader = _IndexReader(connection.index_path)
+            self.assertEqual(1, len(reader.refresh().outbox))
+            offset = reader.offset
+            send_plaintext_messages(1, connection)
+            with open(connection.index_path, "ab") as f:
+                f.write(b'{"op":"delete"')
+            self.assertEqual(2, len(reader.refresh().outbox))
+            self.assertLess(offset, reader.offset)
+            self.assertEqual(connection.index_path.stat().st_size - len(b'{"op":"delete"'), reader.offset)
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_FILE_PATH", None)
+    def test_requires_file_path(self):
+        with self.settings(EMAIL_FILE_PATH=None):
+            with self.assertRaises(ImproperlyConfigured):
+                mail.get_connection(self.connection_backend)
+
+
+class MboxBackendTest(SimpleTestCase):
+    """
+    Test django_mail_viewer.backends.mbox.EmailBackend
+    """
+
+    connection_backend = "django_mail_viewer.backends.mbox.EmailBackend"
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.mbox_path = Path(directory, "mail.mbox")
+        patcher = mock.patch.object(mailviewer_settings, "MAILVIEWER_MBOX_PATH", str(self.mbox_path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            outbox = connection.get_outbox()
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            message_id = outbox[1].get("message-id")
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+            self.assertIsNone(connection.get_message("<missing@example.com>"))
+
+    def test_mbox_file_opens_in_mail_clients(self):
+        """
+        Test that the file is a valid mbox, with lines starting with From quoted in the file but not in the messages
+        """
+        body = "From the start\n>From quoted\nEnd"
+        with mail.get_connection(self.connection_backend) as connection:
+            mail.EmailMessage("First", body, "a@example.com", ["b@example.com"], connection=connection).send()
+            mail.EmailMessage("Second", "Email text", "a@example.com", ["b@example.com"], connection=connection).send()
+            # mbox messages always end with a line break
+            self.assertEqual(body + "\n", connection.get_outbox()[0].get_payload())
+        messages = list(mailbox.mbox(str(self.mbox_path)))
+        self.assertEqual(["First", "Second"], [m.get("subject") for m in messages])
+        self.assertTrue(messages[0].get_from().startswith("a@example.com "))
+
+    def test_get_outbox_parses_only_messages_accessed(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(5, connection)
+            outbox = connection.get_outbox()
+            with mock.patch("email.message_from_bytes", wraps=email.message_from_bytes) as message_from_bytes:
+                self.assertEqual(5, len(outbox))
+                self.assertEqual(["Email subject 3", "Email subject 4"], [m.get("subject") for m in outbox[3:]])
+            self.assertEqual(2, message_from_bytes.call_count)
+
+    def test_index_scans_only_appended_messages(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(1, connection)
+            self.assertEqual(1, len(connection.get_outbox()))
+            index = _mbox_index(self.mbox_path)
+            scanned = index.scanned
+            send_plaintext_messages(2, connection)
+            with mock.patch.object(index, "_add", wraps=index._add) as add:
+                self.assertEqual(3, len(connection.get_outbox()))
+            self.assertEqual(2, add.call_count)
+            self.assertEqual(scanned, index.starts[1])
+
+    def test_delete_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            target_id = connection.get_outbox()[1].get("message-id")
+            connection.delete_message(target_id)
+            self.assertIsNone(connection.get_message(target_id))
+            self.assertEqual(
+                ["Email subject 0", "Email subject 2"], [m.get("subject") for m in connection.get_outbox()]
+            )
+
+    def test_message_sent_again_after_delete(self):
+        """
+        Test that a message stored again with the Message-ID of a deleted message is not deleted, also when the
+        files are indexed from the start by another process
+        """
+
+        def send(subject):
+            mail.EmailMessage(
+                subject,
+                "Email text",
+                "a@example.com",
+                ["b@example.com"],
+                headers={"Message-ID": "<again@example.com>"},
+                connection=connection,
+            ).send()
+
+        with mail.get_connection(self.connection_backend) as connection:
+            send("First")
+            connection.delete_message("<again@example.com>")
+            send("Second")
+            self.assertEqual(["Second"], [m.get("subject") for m in connection.get_outbox()])
+            with mock.patch.dict("django_mail_viewer.backends.mbox._indexes", clear=True):
+                self.assertEqual(["Second"], [m.get("subject") for m in connection.get_outbox()])
+            # Deletes recorded with only the Message-ID still delete every message with it stored by then
+            deleted_path = self.mbox_path.with_name(self.mbox_path.name + ".deleted")
+            deleted_path.write_bytes(b"<again@example.com>\n")
+            with mock.patch.dict("django_mail_viewer.backends.mbox._indexes", clear=True):
+                self.assertEqual([], list(connection.get_outbox()))
+
+    @mock.patch("django_mail_viewer.backends.mbox._message_id_hash", lambda message_id: 1)
+    def test_message_id_hash_collisions(self):
+        """
+        Test that messages whose Message-IDs have the same hash are told apart
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            message_ids = [m.get("message-id") for m in connection.get_outbox()]
+            connection.delete_message(message_ids[0])
+            self.assertIsNone(connection.get_message(message_ids[0]))
+            self.assertEqual("Email subject 2", connection.get_message(message_ids[2]).get("subject"))
+
+    def test_date_index_out_of_order(self):
+        def send(day):
+            date = datetime.datetime(2024, 1, day, tzinfo=datetime.timezone.utc)
+            mail.EmailMessage(
+                f"Day {day}",
+                "Email text",
+                "a@example.com",
+                ["b@example.com"],
+                headers={"Date": email.utils.format_datetime(date)},
+                connection=connection,
+            ).send()
+
+        with mail.get_connection(self.connection_backend) as connection:
+            # Out of order within one scan of the file and then in a later scan
+            for day in [3, 1, 4]:
+                send(day)
+            connection.get_outbox()
+            send(2)
+            self.assertEqual(
+                ["Day 1", "Day 2", "Day 3", "Day 4"], [m.get("subject") for m in connection.get_outbox(ordering="date")]
+            )
+            self.assertEqual(
+                ["Day 2", "Day 3"],
+                [
+                    m.get("subject")
+                    for m in connection.get_outbox(
+                        since=datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc),
+                        until=datetime.datetime(2024, 1, 4, tzinfo=datetime.timezone.utc),
+                    )
+                ],
+            )
+
+    def test_threads_are_indexed_on_first_use(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            index = _mbox_index(self.mbox_path)
+            self.assertEqual(5, len(connection.get_outbox()))
+            self.assertEqual(0, index.threaded)
+            assert_threads(self, connection)
+            self.assertEqual(5, index.threaded)
+
+    def test_get_outbox_recipient(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+        self.assertTrue(self.mbox_path.with_name("mail.tenant-a.mbox").exists())
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    """
+    Test django_mail_viewer.backends.sqlite.EmailBackend
+    """
+
+    connection_backend = "django_mail_viewer.backends.sqlite.EmailBackend"
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.sqlite_path = str(Path(directory, "mail.sqlite3"))
+        patcher = mock.patch.object(mailviewer_settings, "MAILVIEWER_SQLITE_PATH", self.sqlite_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            outbox = connection.get_outbox()
+            self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+            message_id = outbox[1].get("message-id")
+            self.assertEqual(message_id, connection.get_message(message_id).get("message-id"))
+            self.assertIsNone(connection.get_message("<missing@example.com>"))
+            self.assertEqual("wal", connection.database.execute("PRAGMA journal_mode").fetchone()[0])
+
+    def test_send_messages_in_one_transaction(self):
+        messages = [mail.EmailMessage(f"Email {i}", "Email text", "a@example.com", ["b@example.com"]) for i in range(3)]
+        with mail.get_connection(self.connection_backend) as connection:
+            statements = []
+            connection.database.set_trace_callback(statements.append)
+            try:
+                self.assertEqual(3, connection.send_messages(messages))
+            finally:
+                connection.database.set_trace_callback(None)
+            self.assertEqual("BEGIN IMMEDIATE", statements[0])
+            self.assertEqual("COMMIT", statements[-1])
+            self.assertEqual(3, len([s for s in statements if s.startswith("INSERT OR REPLACE INTO messages")]))
+            self.assertEqual(3, len(connection.get_outbox()))
+
+    def test_delete_message(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            target_id = connection.get_outbox()[1].get("message-id")
+            connection.delete_message(target_id)
+            self.assertIsNone(connection.get_message(target_id))
+            self.assertEqual(
+                ["Email subject 0", "Email subject 2"], [m.get("subject") for m in connection.get_outbox()]
+            )
+            self.assertEqual(
+                0,
+                connection.database.execute(
+                    "SELECT COUNT(*) FROM addresses WHERE message_id = ?", (target_id,)
+                ).fetchone()[0],
+            )
+
+    def test_get_outbox_recipient(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_query(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_reads_only_headers(self):
+        """
+        Test that listing email reads the headers table, only as many messages as the limit, and only reads a
+        message's body when it is used
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(3, connection)
+            statements = []
+            connection.database.set_trace_callback(statements.append)
+            try:
+                outbox = connection.get_outbox(limit=2)
+                self.assertEqual(["Email subject 0", "Email subject 1"], [m.get("subject") for m in outbox])
+                self.assertFalse([s for s in statements if "SELECT message " in s])
+                self.assertTrue([s for s in statements if s.endswith("LIMIT 2")])
+                self.assertEqual("Email text 1", outbox[1].get_payload())
+                self.assertEqual(1, len([s for s in statements if "SELECT message " in s]))
+            finally:
+                connection.database.set_trace_callback(None)
+            self.assertIn(b"Email text 0", outbox[0].as_bytes())
+            # Deleted after the outbox was read, the headers read with it are still there
+            connection.delete_message(outbox[0].get("message-id"))
+            self.assertEqual("Email subject 0", outbox[0]["subject"])
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            assert_inline_attachments(self, connection)
+
+    def test_get_thread(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_get_thread_within_one_batch(self):
+        """
+        Test that messages sent in the same call to send_messages() join the threads of the messages before them
+        """
+        reply = mail.EmailMessage(
+            "Reply", "Email text", "a@example.com", ["b@example.com"], headers={"In-Reply-To": "<start@example.com>"}
+        )
+        start = mail.EmailMessage(
+            "Start", "Email text", "a@example.com", ["b@example.com"], headers={"Message-ID": "<start@example.com>"}
+        )
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.send_messages([reply, start])
+            self.assertEqual(
+                ["Reply", "Start"], sorted(m.get("subject") for m in connection.get_thread("<start@example.com>"))
+            )
+
+    def test_mailboxes(self):
+        assert_mailboxes(self, self.connection_backend)
+
+    def test_concurrent_send_messages(self):
+        def send():
+            with mail.get_connection(self.connection_backend) as connection:
+                send_plaintext_messages(10, connection)
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual(40, len(connection.get_outbox()))
+
+
+class DatabaseBackendTest(TestCase):
+    """
+    Test django_mail_viewer.backends.cache.EmailBackend
+    """
+
+    databases = {"default", "mailviewer"}
+    connection_backend = "django_mail_viewer.backends.database.backend.EmailBackend"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        try:
+            shutil.rmtree(settings.MEDIA_ROOT)
+        finally:
+            super().tearDownClass()
+
+    def test_send_plaintext_email(self):
+        original_email_count = EmailMessage.objects.count()
+        m = mail.EmailMultiAlternatives(
+            "Email subject", "Email text", "test@example.com", ["to1@example.com", "to2.example.com"]
+        )
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual(1, connection.send_messages([m]))
+
+        self.assertEqual(original_email_count + 1, EmailMessage.objects.count())
+        email = EmailMessage.objects.latest("id")
+
+        expected_headers = {
+            "content-type": 'text/plain; charset="utf-8"',
+            "mime-version": "1.0",
+            "content-transfer-encoding": "7bit",
+            "subject": "Email subject",
+            "from": "test@example.com",
+            "to": "to1@example.com, to2.example.com",
+            "message-id": email.message_id,
+        }
+        actual_headers = dict(email.message_headers)
+        # Make sure there is a `date` key in the headers and it has a value, but am not trying to match it up since
+        # I have no good way of knowing what it should be.
+        self.assertTrue(actual_headers.get("date"))
+        # Now remove the `date` key so that the dicts can be compared.
+        del actual_headers["date"]
+        self.assertEqual(expected_headers, actual_headers)
+        self.assertEqual("Email text", email.content)
 
     def test_send_html_email_with_attachment(self):
         original_email_count = EmailMessage.objects.count()
@@ -280,12 +1770,12 @@ class DatabaseBackendTest(TestCase):
         parts_test_matrix = {
             "multipart/mixed": {
                 "headers": {
-                    "Content-Type": "multipart/mixed",
-                    "MIME-Version": "1.0",
-                    "Subject": "Email subject",
-                    "From": "test@example.com",
-                    "To": "to1@example.com, to2.example.com",
-                    "Message-ID": email.message_id,
+                    "content-type": "multipart/mixed",
+                    "mime-version": "1.0",
+                    "subject": "Email subject",
+                    "from": "test@example.com",
+                    "to": "to1@example.com, to2.example.com",
+                    "message-id": email.message_id,
                 },
                 "content": "",
                 "attachment": "",
@@ -293,8 +1783,8 @@ class DatabaseBackendTest(TestCase):
             },
             "multipart/alternative": {
                 "headers": {
-                    "Content-Type": "multipart/alternative",
-                    "MIME-Version": "1.0",
+                    "content-type": "multipart/alternative",
+                    "mime-version": "1.0",
                 },
                 "content": "",
                 "attachment": "",
@@ -302,9 +1792,9 @@ class DatabaseBackendTest(TestCase):
             },
             "text/plain": {
                 "headers": {
-                    "Content-Type": 'text/plain; charset="utf-8"',
-                    "MIME-Version": "1.0",
-                    "Content-Transfer-Encoding": "7bit",
+                    "content-type": 'text/plain; charset="utf-8"',
+                    "mime-version": "1.0",
+                    "content-transfer-encoding": "7bit",
                 },
                 "content": "Email text",
                 "attachment": "",
@@ -312,9 +1802,9 @@ class DatabaseBackendTest(TestCase):
             },
             "text/html": {
                 "headers": {
-                    "Content-Type": 'text/html; charset="utf-8"',
-                    "MIME-Version": "1.0",
-                    "Content-Transfer-Encoding": "7bit",
+                    "content-type": 'text/html; charset="utf-8"',
+                    "mime-version": "1.0",
+                    "content-transfer-encoding": "7bit",
                 },
                 "content": '<html><body><p style="background-color: #AABBFF; color: white">Email html</p></body></html>',
                 "attachment": "",
@@ -322,10 +1812,10 @@ class DatabaseBackendTest(TestCase):
             },
             "image/gif": {
                 "headers": {
-                    "Content-Type": "image/gif",
-                    "MIME-Version": "1.0",
-                    "Content-Transfer-Encoding": "base64",
-                    "Content-Disposition": 'attachment; filename="icon.gif"',
+                    "content-type": "image/gif",
+                    "mime-version": "1.0",
+                    "content-transfer-encoding": "base64",
+                    "content-disposition": 'attachment; filename="icon.gif"',
                 },
                 "content": "",
                 "attachment": "mailviewer_attachments/icon.gif",
@@ -342,11 +1832,11 @@ class DatabaseBackendTest(TestCase):
             with self.subTest(content_type=content_type):
                 current_test = parts_test_matrix[content_type]
                 tested_parts.append(content_type)
-                actual_headers = json.loads(part.message_headers)
-                if actual_headers.get("Date"):
-                    # Now remove the `Date` key so that the dicts can be compared for the multipart/mixed
+                actual_headers = dict(part.message_headers)
+                if actual_headers.get("date"):
+                    # Now remove the `date` key so that the dicts can be compared for the multipart/mixed
                     # would love to find a way to properly compare them
-                    del actual_headers["Date"]
+                    del actual_headers["date"]
                 self.assertEqual(current_test["headers"], actual_headers)
                 self.assertEqual(current_test["content"], part.content)
                 self.assertEqual(current_test["attachment"], str(part.file_attachment))
@@ -372,6 +1862,114 @@ class DatabaseBackendTest(TestCase):
             self.assertEqual(2, len(connection.get_outbox()))
             self.assertEqual(list(EmailMessage.objects.all()), list(connection.get_outbox()))
 
+    def test_get_outbox_recipient(self):
+        """
+        Test that get_outbox(recipient=...) finds the messages sent To, Cc, or Bcc an address
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_addressed_messages(connection)
+            self.assertEqual(
+                ["To", "Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+            self.assertEqual(
+                ["Cc", "Bcc", "Other"], [m.get("subject") for m in connection.get_outbox(recipient="Other@example.com")]
+            )
+            self.assertEqual([], list(connection.get_outbox(recipient="nobody@example.com")))
+
+            connection.delete_message(connection.get_outbox(recipient="someone@example.com")[0].get("message-id"))
+            self.assertEqual(
+                ["Cc", "Bcc"], [m.get("subject") for m in connection.get_outbox(recipient="someone@example.com")]
+            )
+
+    def test_get_outbox_defers_content(self):
+        """
+        Test that message bodies are only loaded by get_outbox() when asked for
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(2, connection)
+            self.assertEqual({"content"}, connection.get_outbox()[0].get_deferred_fields())
+            with self.assertNumQueries(1, using="mailviewer"):
+                self.assertEqual(
+                    ["Email text 0", "Email text 1"], [m.content for m in connection.get_outbox(with_content=True)]
+                )
+
+    def test_get_outbox_headers(self):
+        """
+        Test filtering get_outbox() by header values
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            for campaign in ["welcome", "welcome", "reminder"]:
+                mail.EmailMessage(
+                    "Email subject",
+                    "Email text",
+                    "test@example.com",
+                    ["to@example.com"],
+                    headers={"X-Campaign": campaign},
+                    connection=connection,
+                ).send()
+
+            self.assertEqual(2, len(connection.get_outbox(headers={"X-Campaign": "welcome"})))
+            self.assertEqual(1, len(connection.get_outbox(headers={"x-campaign": "reminder"})))
+            self.assertEqual(0, len(connection.get_outbox(headers={"X-Campaign": "welcome", "Subject": "Other"})))
+            self.assertEqual(3, len(connection.get_outbox(headers={"Subject": "Email subject"})))
+
+    def test_get_outbox_query(self):
+        """
+        Test that get_outbox() filters, orders, and limits the messages by the OutboxQuery keyword arguments
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_filterable_messages(connection)
+            self.addCleanup(lambda: [connection.delete_message(m.message_id) for m in connection.get_outbox()])
+            assert_outbox_queries(self, connection)
+
+    def test_get_outbox_inline_attachments(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_inline_messages(connection)
+            part = EmailMessage.objects.exclude(file_attachment="").get()
+            # Other tests expect the stored file name to not have been de-duplicated
+            self.addCleanup(part.file_attachment.delete, save=False)
+            assert_inline_attachments(self, connection)
+
+    def test_send_messages_sets_sent_at(self):
+        """
+        Test that the Date header is parsed into sent_at, falling back to when the email was captured
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            mail.EmailMessage(
+                "Dated",
+                "Email text",
+                "test@example.com",
+                ["to@example.com"],
+                headers={"Date": "Tue, 02 Jan 2024 10:00:00 +0200"},
+                connection=connection,
+            ).send()
+            mail.EmailMessage(
+                "Undated",
+                "Email text",
+                "test@example.com",
+                ["to@example.com"],
+                headers={"Date": "not a date"},
+                connection=connection,
+            ).send()
+        dated = EmailMessage.objects.using("mailviewer").get(message_headers__subject="Dated")
+        self.assertEqual(datetime.datetime(2024, 1, 2, 8, tzinfo=datetime.timezone.utc), dated.sent_at)
+        undated = EmailMessage.objects.using("mailviewer").get(message_headers__subject="Undated")
+        self.assertEqual(undated.created_at.replace(microsecond=0), undated.sent_at.replace(microsecond=0))
+
+    def test_get_thread(self):
+        """
+        Test that get_thread() finds the messages related by their Message-ID, In-Reply-To, and References headers
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            send_threaded_messages(connection)
+            assert_threads(self, connection)
+
+    def test_mailboxes(self):
+        """
+        Test that each mailbox only has the email sent to it
+        """
+        assert_mailboxes(self, self.connection_backend)
+
     def test_delete_message(self):
         """
         Test the delete() method of the backend deletes the message from the outbox
@@ -386,3 +1984,224 @@ class DatabaseBackendTest(TestCase):
                 self.assertNotEqual(
                     target_id, message.get("message-id"), f"Message with id {target_id} found in outbox after delete."
                 )
+
+    def test_uses_mailviewer_database_alias(self):
+        """
+        Test that messages are written to and read from the database set with MAILVIEWER_DATABASE_ALIAS
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            self.assertEqual("mailviewer", connection.using)
+            send_plaintext_messages(1, connection)
+            self.assertEqual(1, EmailMessage.objects.using("mailviewer").count())
+            self.assertEqual("mailviewer", connection.get_outbox().db)
+
+    def test_send_messages_not_rolled_back_with_default_database(self):
+        """
+        Test that mail captured while the application's transaction on the default database is rolled back
+        is still stored.
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            try:
+                with transaction.atomic(using="default"):
+                    send_plaintext_messages(1, connection)
+                    raise RuntimeError("Rollback the default database")
+            except RuntimeError:
+                pass
+            self.assertEqual(1, len(connection.get_outbox()))
+
+    def test_send_messages_uses_bulk_insert(self):
+        """
+        Test that all of the messages passed to send_messages() are written with one query each for the main
+        messages, their parts, and their addresses.
+        """
+        messages = []
+        for x in range(3):
+            m = mail.EmailMultiAlternatives(
+                f"Email subject {x}", f"Email text {x}", "test@example.com", ["to@example.com"]
+            )
+            m.attach_alternative(f"<html><body>Email html {x}</body></html>", "text/html")
+            messages.append(m)
+
+        with mail.get_connection(self.connection_backend) as connection:
+            # savepoint, SELECT related thread ids, INSERT main messages, INSERT parts, INSERT addresses,
+            # release savepoint
+            with self.assertNumQueries(6, using="mailviewer"):
+                self.assertEqual(3, connection.send_messages(messages))
+        self.assertEqual(3, EmailMessage.objects.filter(parent=None).count())
+        self.assertEqual(6, EmailMessage.objects.exclude(parent=None).count())
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_DATABASE_ON_COMMIT_ALIAS", "default")
+    def test_send_messages_on_commit(self):
+        """
+        Test that messages sent during a transaction are written together once the transaction commits
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            with self.captureOnCommitCallbacks(using="default") as callbacks:
+                send_plaintext_messages(2, connection)
+                send_plaintext_messages(1, connection)
+                self.assertEqual(0, EmailMessage.objects.count())
+            with CaptureQueriesContext(connections["mailviewer"]) as queries:
+                for callback in callbacks:
+                    callback()
+            inserts = [q["sql"] for q in queries if q["sql"].startswith(f'INSERT INTO "{EmailMessage._meta.db_table}"')]
+            self.assertEqual(1, len(inserts))
+            self.assertEqual(3, len(connection.get_outbox()))
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_DATABASE_ON_COMMIT_ALIAS", "default")
+    def test_send_messages_on_commit_rollback(self):
+        """
+        Test that messages sent during a savepoint which is rolled back are not written
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            with self.captureOnCommitCallbacks(using="default", execute=True):
+                send_plaintext_messages(1, connection)
+                try:
+                    with transaction.atomic(using="default"):
+                        send_plaintext_messages(2, connection)
+                        raise RuntimeError("Rollback the savepoint")
+                except RuntimeError:
+                    pass
+            self.assertEqual(1, len(connection.get_outbox()))
+
+    @mock.patch.object(mailviewer_settings, "MAILVIEWER_DATABASE_ON_COMMIT_ALIAS", "default")
+    def test_send_messages_on_commit_after_rollback_of_first_batch(self):
+        """
+        Test that messages sent after the savepoint the batch was started in is rolled back are still written
+        """
+        with mail.get_connection(self.connection_backend) as connection:
+            with self.captureOnCommitCallbacks(using="default", execute=True):
+                try:
+                    with transaction.atomic(using="default"):
+                        send_plaintext_messages(2, connection)
+                        raise RuntimeError("Rollback the savepoint")
+                except RuntimeError:
+                    pass
+                send_plaintext_messages(1, connection)
+            self.assertEqual(["Email subject 0"], [m.get("subject") for m in connection.get_outbox()])
+
+    def test_attachment_size_and_hash(self):
+        """
+        Test that the attachment's decoded size and sha256 hash are stored along with the file
+        """
+        current_dir = Path(__file__).resolve().parent
+        file_data = (current_dir / "test_files" / "icon.gif").read_bytes()
+        m = mail.EmailMultiAlternatives("Email subject", "Email text", "test@example.com", ["to1@example.com"])
+        m.attach_file(current_dir / "test_files" / "icon.gif", "image/gif")
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.send_messages([m])
+
+        part = EmailMessage.objects.exclude(file_attachment="").get()
+        # Other tests expect the stored file name to not have been de-duplicated
+        self.addCleanup(part.file_attachment.delete, save=False)
+        self.assertEqual(len(file_data), part.file_size)
+        self.assertEqual(hashlib.sha256(file_data).hexdigest(), part.file_sha256)
+        self.assertEqual(file_data, part.file_attachment.read())
+
+    def test_inline_text_part_is_not_an_attachment(self):
+        """
+        Test that inline text parts without a filename are stored as bodies and inline parts with one as attachments
+        """
+        current_dir = Path(__file__).resolve().parent
+        m = mail.EmailMessage("Email subject", "Email text", "test@example.com", ["to1@example.com"])
+        inline_text = MIMEText("Inline text", "plain")
+        inline_text.add_header("Content-Disposition", "inline")
+        m.attach(inline_text)
+        m.attach_file(current_dir / "test_files" / "icon.gif", "image/gif")
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.send_messages([m])
+
+        inline_part = EmailMessage.objects.get(content="Inline text")
+        self.assertFalse(inline_part.file_attachment)
+        part = EmailMessage.objects.exclude(file_attachment="").get()
+        self.addCleanup(part.file_attachment.delete, save=False)
+        self.assertEqual("icon.gif", Path(part.file_attachment.name).name)
+
+    def test_attachment_temporary_file_closed_on_error(self):
+        """
+        Test that the temporary file an attachment is decoded into is closed when decoding it fails
+        """
+
+        def fail_decoding(part):
+            yield b"data"
+            raise ValueError("Bad payload")
+
+        temp_files = []
+        temporary_file_class = tempfile.TemporaryFile
+
+        def temporary_file():
+            temp_files.append(temporary_file_class())
+            return temp_files[-1]
+
+        part = MIMEApplication(b"data")
+        part.add_header("Content-Disposition", "attachment", filename="data.bin")
+        with mock.patch("django_mail_viewer.backends.database.backend._iter_decoded_payload", fail_decoding):
+            with mock.patch("tempfile.TemporaryFile", temporary_file):
+                with mail.get_connection(self.connection_backend) as connection:
+                    with self.assertRaisesMessage(ValueError, "Bad payload"):
+                        connection._decode_attachment_to_file(part)
+        self.assertTrue(temp_files[0].closed)
+
+    def test_iter_decoded_payload(self):
+        """
+        Test that decoding payloads in chunks gets the same data as get_payload(decode=True)
+        """
+        data = bytes(range(256)) * 50 + "a,b,ü\r\n".encode() * 1000
+        test_matrix = [
+            {"cte": "base64", "part": MIMEApplication(data, _encoder=encoders.encode_base64)},
+            {"cte": "quoted-printable", "part": MIMEApplication(data, _encoder=encoders.encode_quopri)},
+            {"cte": "7bit", "part": MIMEApplication(b"ascii only\r\n" * 1000, _encoder=encoders.encode_7or8bit)},
+        ]
+        for t in test_matrix:
+            part = t["part"]
+            self.assertEqual(t["cte"], part.get("content-transfer-encoding"))
+            for chunk_size in [3, 76, 1000, 100000]:
+                with self.subTest(cte=t["cte"], chunk_size=chunk_size):
+                    self.assertEqual(
+                        part.get_payload(decode=True), b"".join(_iter_decoded_payload(part, chunk_size=chunk_size))
+                    )
+
+    def test_delete_message_deletes_attachment_files(self):
+        current_dir = Path(__file__).resolve().parent
+        m = mail.EmailMultiAlternatives("Email subject", "Email text", "test@example.com", ["to1@example.com"])
+        m.attach_file(current_dir / "test_files" / "icon.gif", "image/gif")
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.send_messages([m])
+            part = EmailMessage.objects.exclude(file_attachment="").get()
+            storage = part.file_attachment.storage
+            self.assertTrue(storage.exists(part.file_attachment.name))
+            connection.delete_message(part.parent.message_id)
+
+        self.assertEqual(0, EmailMessage.objects.count())
+        self.assertFalse(storage.exists(part.file_attachment.name))
+
+    def test_prune_messages_keep(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_plaintext_messages(5, connection)
+            kept = list(connection.get_outbox().order_by("-pk")[:2])
+            result = connection.prune_messages(keep=2, batch_size=2)
+            self.assertEqual(3, result["messages"])
+            self.assertEqual(sorted(kept, key=lambda m: m.pk), list(connection.get_outbox()))
+            self.assertEqual(0, connection.prune_messages(keep=2)["messages"])
+
+    def test_prune_messages_older_than(self):
+        current_dir = Path(__file__).resolve().parent
+        m = mail.EmailMultiAlternatives("Email subject", "Email text", "test@example.com", ["to1@example.com"])
+        m.attach_file(current_dir / "test_files" / "icon.gif", "image/gif")
+        with mail.get_connection(self.connection_backend) as connection:
+            connection.send_messages([m])
+            send_plaintext_messages(2, connection)
+            part = EmailMessage.objects.exclude(file_attachment="").get()
+            storage = part.file_attachment.storage
+            EmailMessage.objects.filter(pk__in=[part.pk, part.parent_id]).update(
+                created_at=timezone.now() - datetime.timedelta(days=3)
+            )
+
+            result = connection.prune_messages(older_than=datetime.timedelta(days=2))
+            self.assertEqual({"messages": 1, "files": 1}, {k: result[k] for k in ["messages", "files"]})
+            self.assertEqual(2, EmailMessage.objects.count())
+            self.assertFalse(storage.exists(part.file_attachment.name))
+
+    def test_prune_messages_requires_criteria(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            with self.assertRaises(ValueError):
+                connection.prune_messages()
@@ -0,0 +1,161 @@
+import mailbox
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core import cache, mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from django_mail_viewer import settings as mailviewer_settings
+from django_mail_viewer.backends.database.models import EmailMessage
+
+
+class MailViewerPruneCommandTest(TestCase):
+    databases = {"default", "mailviewer"}
+    connection_backend = "django_mail_viewer.backends.database.backend.EmailBackend"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        try:
+            shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        finally:
+            super().tearDownClass()
+
+    def test_prune(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            for x in range(3):
+                mail.EmailMessage(
+                    f"Email subject {x}", "Email text", "test@example.com", ["to@example.com"], connection=connection
+                ).send()
+
+        out = StringIO()
+        call_command("mail_viewer_prune", keep=1, backend=self.connection_backend, stdout=out)
+        self.assertEqual(1, EmailMessage.objects.count())
+        self.assertIn("Deleted 2 emails and 0 attachment files", out.getvalue())
+
+    def test_requires_days_or_keep(self):
+        with self.assertRaises(CommandError):
+            call_command("mail_viewer_prune", backend=self.connection_backend)
+
+    def test_backend_without_prune(self):
+        with self.assertRaises(CommandError):
+            call_command("mail_viewer_prune", keep=1, backend="django_mail_viewer.backends.locmem.EmailBackend")
+
+
+class MailViewerCompactCommandTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.cache.EmailBackend"
+
+    def setUp(self):
+        cache.caches[settings.MAILVIEWER_CACHE].clear()
+
+    def test_compact(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            for x in range(3):
+                mail.EmailMessage(
+                    f"Email subject {x}", "Email text", "test@example.com", ["to@example.com"], connection=connection
+                ).send()
+            evicted = connection.cache.get(connection.cache_keys_key)[0]
+            connection.cache.delete(connection.message_key(evicted))
+
+            out = StringIO()
+            call_command("mail_viewer_compact", backend=self.connection_backend, stdout=out)
+            self.assertIn("Removed 1 index entries of email no longer stored, leaving 2 emails", out.getvalue())
+            self.assertNotIn(evicted, connection.cache.get(connection.cache_keys_key))
+
+    def test_compact_filesystem(self):
+        backend = "django_mail_viewer.backends.filesystem.EmailBackend"
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.object(mailviewer_settings, "MAILVIEWER_FILE_PATH", directory):
+                with mail.get_connection(backend) as connection:
+                    for x in range(3):
+                        mail.EmailMessage(
+                            f"Email subject {x}",
+                            "Email text",
+                            "test@example.com",
+                            ["to@example.com"],
+                            connection=connection,
+                        ).send()
+                    connection.delete_message(connection.get_outbox()[0].get("message-id"))
+
+                    out = StringIO()
+                    call_command("mail_viewer_compact", backend=backend, stdout=out)
+                    self.assertIn("Removed 2 index entries of email no longer stored, leaving 2 emails", out.getvalue())
+                    self.assertEqual(2, len(connection.index_path.read_bytes().splitlines()))
+
+    def test_backend_without_index(self):
+        with self.assertRaises(CommandError):
+            call_command("mail_viewer_compact", backend="django_mail_viewer.backends.locmem.EmailBackend")
+
+
+class MailViewerImportCommandTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+
+    def test_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for x in range(3):
+                Path(directory, f"{x}.eml").write_bytes(
+                    f"From: test@example.com\nTo: to@example.com\nSubject: Email subject {x}\n\nEmail text\n".encode()
+                )
+            out = StringIO()
+            call_command(
+                "mail_viewer_import",
+                directory,
+                workers=0,
+                backend=self.connection_backend,
+                mailbox="import",
+                stdout=out,
+            )
+        self.assertIn("Imported 3 emails in", out.getvalue())
+        self.assertEqual(
+            ["Email subject 0", "Email subject 1", "Email subject 2"],
+            [m.get("subject") for m in mail.mailviewer_outboxes["import"]],
+        )
+
+    def test_missing_path(self):
+        with self.assertRaises(CommandError):
+            call_command("mail_viewer_import", "/does/not/exist", backend=self.connection_backend)
+
+
+class MailViewerExportCommandTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        with mail.get_connection(self.connection_backend) as connection:
+            for x in range(3):
+                mail.EmailMessage(
+                    f"Email subject {x}", "Email text", "test@example.com", ["to@example.com"], connection=connection
+                ).send()
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "export.mbox")
+            out = StringIO()
+            call_command("mail_viewer_export", str(path), limit="2", backend=self.connection_backend, stdout=out)
+            self.assertIn("Exported 2 emails", out.getvalue())
+            self.assertEqual(
+                ["Email subject 0", "Email subject 1"], [m.get("subject") for m in mailbox.mbox(str(path))]
+            )
+            self.assertEqual(["export.mbox"], os.listdir(directory))
+
+    def test_invalid_filter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(CommandError):
+                call_command(
+                    "mail_viewer_export",
+                    str(Path(directory, "export.mbox")),
+                    since="soon",
+                    backend=self.connection_backend,
+                )
+            self.assertEqual([], os.listdir(directory))
@@ -0,0 +1,91 @@
+"""
+Test django_mail_viewer.export
+"""
+
+import io
+import mailbox
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core import mail
+from django.test import SimpleTestCase, TestCase
+
+from django_mail_viewer.export import iter_mbox, iter_messages, iter_zip
+
+
+def send_export_messages(connection):
+    for subject, body in [("First", "From the start\n"), ("Second", "Email text\n"), ("Third", "Email text\n")]:
+        mail.EmailMessage(subject, body, "test@example.com", ["to@example.com"], connection=connection).send()
+
+
+class ExportTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+
+    def test_iter_messages(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_export_messages(connection)
+            self.assertEqual(["Second"], [m.get("subject") for m in iter_messages(connection, subject="Second")])
+            message_ids = [mail.outbox[2].get("message-id"), "<missing@example.com>", mail.outbox[0].get("message-id")]
+            self.assertEqual(["Third", "First"], [m.get("subject") for m in iter_messages(connection, message_ids)])
+
+    def test_iter_mbox(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_export_messages(connection)
+            data = b"".join(iter_mbox(iter_messages(connection)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "export.mbox")
+            path.write_bytes(data)
+            messages = list(mailbox.mbox(str(path)))
+        self.assertEqual(["First", "Second", "Third"], [m.get("subject") for m in messages])
+        # Quoted in the file so that it is not read as the start of another email
+        self.assertEqual(">From the start\n", messages[0].get_payload())
+        self.assertTrue(messages[0].get_from().startswith("test@example.com "))
+
+    def test_iter_zip(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_export_messages(connection)
+            chunks = list(iter_zip(iter_messages(connection)))
+        # A piece of the zip file for each email and then its directory
+        self.assertEqual(4, len(chunks))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(["000001-first.eml", "000002-second.eml", "000003-third.eml"], archive.namelist())
+            self.assertEqual(mail.outbox[1].as_bytes(), archive.read("000002-second.eml"))
+
+
+class DatabaseExportTest(TestCase):
+    databases = {"default", "mailviewer"}
+    connection_backend = "django_mail_viewer.backends.database.backend.EmailBackend"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        try:
+            shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        finally:
+            super().tearDownClass()
+
+    def test_iter_mbox(self):
+        with mail.get_connection(self.connection_backend) as connection:
+            send_export_messages(connection)
+            m = mail.EmailMultiAlternatives("Fourth", "Email text", "test@example.com", ["to@example.com"])
+            m.attach_alternative("<p>Email html</p>", "text/html")
+            m.attach("notes.txt", "Attached text", "text/plain")
+            connection.send_messages([m])
+            # One query for the messages and one for their parts
+            with self.assertNumQueries(2, using="mailviewer"):
+                data = b"".join(iter_mbox(iter_messages(connection, ordering="-date")))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "export.mbox")
+            path.write_bytes(data)
+            messages = list(mailbox.mbox(str(path)))
+        self.assertEqual(["Fourth", "Third", "Second", "First"], [m.get("subject") for m in messages])
+        self.assertEqual(
+            ["text/plain", "text/html", "text/plain"], [p.get_content_type() for p in messages[0].get_payload()]
+        )
+        self.assertEqual(b"Attached text", messages[0].get_payload()[2].get_payload(decode=True))
@@ -0,0 +1,102 @@
+"""
+Test django_mail_viewer.importer
+"""
+
+import io
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+
+from django.core import mail
+from django.test import SimpleTestCase
+
+from django_mail_viewer.backends.utils import mbox_entry
+from django_mail_viewer.importer import import_messages, iter_raw_messages
+
+
+def raw_email(subject: str, body: str = "Email text\n", headers: str = "") -> bytes:
+    return (
+        f"From: sender@example.com\nTo: to@example.com\n{headers}Subject: {subject}\n"
+        f"Message-ID: <{subject.replace(' ', '-')}@example.com>\n\n{body}"
+    ).encode()
+
+
+class ImporterTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        emls = self.directory / "emls" / "nested"
+        emls.mkdir(parents=True)
+        (emls / "1.eml").write_bytes(raw_email("Eml 1").replace(b"\n", b"\r\n"))
+        (emls / "2.eml").write_bytes(raw_email("Eml 2", headers="Bcc: hidden@example.com\n"))
+        (emls / "notes.txt").write_bytes(b"Not an email")
+
+        self.mbox_path = self.directory / "archive.mbox"
+        self.mbox_path.write_bytes(
+            mbox_entry(raw_email("Mbox 1", "From here\n>From there\n"), "sender@example.com", 0)
+            + mbox_entry(raw_email("Mbox 2", "No trailing newline"), "sender@example.com", 0)
+        )
+
+        self.tar_path = self.directory / "archive.tar.gz"
+        with tarfile.open(self.tar_path, "w:gz") as tar:
+            for name, data in [
+                ("tar/1.eml", raw_email("Tar 1")),
+                ("tar/mbox", mbox_entry(raw_email("Tar mbox"), "sender@example.com", 0)),
+                ("tar/readme", b"Not an email"),
+            ]:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+    def test_iter_raw_messages(self):
+        self.assertEqual(
+            [
+                (raw_email("Mbox 1", ">From here\n>>From there\n"), True),
+                (raw_email("Mbox 2", "No trailing newline\n"), True),
+            ],
+            list(iter_raw_messages([self.mbox_path])),
+        )
+        self.assertEqual(6, len(list(iter_raw_messages([self.directory]))))
+
+    def test_import_messages(self):
+        for workers in [0, 2]:
+            with self.subTest(workers=workers):
+                mail.outbox = []
+                progress = []
+                with mail.get_connection(self.connection_backend) as connection:
+                    result = import_messages(
+                        connection,
+                        [self.directory / "emls", self.mbox_path, self.tar_path],
+                        workers=workers,
+                        batch_size=2,
+                        chunk_size=1,
+                        progress=lambda count, seconds: progress.append(count),
+                    )
+                    self.assertEqual(6, result["messages"])
+                    self.assertEqual([2, 4, 6], progress)
+                    self.assertEqual(
+                        ["Eml 1", "Eml 2", "Mbox 1", "Mbox 2", "Tar 1", "Tar mbox"],
+                        [m.get("subject") for m in connection.get_outbox()],
+                    )
+                    self.assertEqual("Email text\n", connection.get_message("<Eml-1@example.com>").get_payload())
+                    self.assertEqual(
+                        "From here\n>From there\n", connection.get_message("<Mbox-1@example.com>").get_payload()
+                    )
+                    self.assertEqual(
+                        ["Eml 2"], [m.get("subject") for m in connection.get_outbox(recipient="hidden@example.com")]
+                    )
+
+    def test_adds_missing_message_id(self):
+        path = self.directory / "no-id.eml"
+        path.write_bytes(b"Subject: No id\n\nEmail text\n")
+        with mail.get_connection(self.connection_backend) as connection:
+            import_messages(connection, [path], workers=0)
+            message = connection.get_outbox()[0]
+            self.assertTrue(message.get("message-id"))
+            self.assertEqual(message, connection.get_message(message.get("message-id")))
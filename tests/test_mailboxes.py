@@ -0,0 +1,47 @@
+"""
+Test django_mail_viewer.mailboxes
+"""
+
+from email.message import Message
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from django_mail_viewer import settings as mailviewer_settings
+from django_mail_viewer.mailboxes import (
+    MAILBOX_HEADER,
+    get_current_mailbox,
+    message_mailbox,
+    use_mailbox,
+    validate_mailbox,
+)
+
+
+class MailboxesTest(SimpleTestCase):
+    def test_validate_mailbox(self):
+        self.assertEqual("tenant-1.example@host_name", validate_mailbox(" tenant-1.example@host_name "))
+        self.assertEqual("", validate_mailbox(""))
+        for name in ["has space", "colon:", "x" * 101, "ünicode"]:
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                validate_mailbox(name)
+
+    def test_use_mailbox(self):
+        self.assertEqual("", get_current_mailbox())
+        with use_mailbox("outer"):
+            self.assertEqual("outer", get_current_mailbox())
+            with use_mailbox(""):
+                self.assertEqual("", get_current_mailbox())
+            self.assertEqual("outer", get_current_mailbox())
+        self.assertEqual("", get_current_mailbox())
+
+    def test_get_current_mailbox_defaults_to_setting(self):
+        with mock.patch.object(mailviewer_settings, "MAILVIEWER_MAILBOX", "staging"):
+            self.assertEqual("staging", get_current_mailbox())
+            with use_mailbox("worker-1"):
+                self.assertEqual("worker-1", get_current_mailbox())
+
+    def test_message_mailbox(self):
+        message = Message()
+        self.assertEqual("default", message_mailbox(message, "default"))
+        message[MAILBOX_HEADER] = "from-header"
+        self.assertEqual("from-header", message_mailbox(message, "default"))
@@ -1,5 +1,6 @@
-from pathlib import Path
+import email
 import shutil
+from pathlib import Path
 
 from django.conf import settings
 from django.core import mail
@@ -9,6 +10,7 @@ from django_mail_viewer.backends.database.models import EmailMessage
 
 
 class DatabaseBackendEmailMessageTest(TestCase):
+    databases = {"default", "mailviewer"}
     connection_backend = "django_mail_viewer.backends.database.backend.EmailBackend"
 
     @classmethod
@@ -87,3 +89,19 @@ class DatabaseBackendEmailMessageTest(TestCase):
     def test_get_filename(self):
         m = self.multipart_message.parts.exclude(file_attachment="").get()
         self.assertEqual("icon.gif", m.get_filename())
+
+    def test_as_bytes(self):
+        message = email.message_from_bytes(self.multipart_message.as_bytes())
+        self.assertEqual("Email subject", message.get("subject"))
+        self.assertEqual(self.multipart_message.get("message-id"), message.get("message-id"))
+        self.assertEqual(
+            ["multipart/mixed", "text/plain", "text/html", "image/gif"], [m.get_content_type() for m in message.walk()]
+        )
+        parts = list(message.walk())
+        self.assertEqual(b"Email text", parts[1].get_payload(decode=True))
+        self.assertIn(b"Email html", parts[2].get_payload(decode=True))
+        self.assertEqual("icon.gif", parts[3].get_filename())
+        self.assertEqual(
+            (Path(__file__).resolve().parent / "test_files" / "icon.gif").read_bytes(),
+            parts[3].get_payload(decode=True),
+        )
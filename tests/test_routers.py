@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+
+from django_mail_viewer import settings as mailviewer_settings
+from django_mail_viewer.backends.database.models import EmailMessage
+from django_mail_viewer.backends.database.routers import MailViewerRouter
+
+
+class MailViewerRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = MailViewerRouter()
+
+    def test_db_for_read(self):
+        self.assertEqual("mailviewer", self.router.db_for_read(EmailMessage))
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_db_for_write(self):
+        self.assertEqual("mailviewer", self.router.db_for_write(EmailMessage))
+        self.assertIsNone(self.router.db_for_write(User))
+
+    def test_allow_migrate(self):
+        test_matrix = [
+            {"db": "mailviewer", "app_label": "mail_viewer_database_backend", "expected": True},
+            {"db": "default", "app_label": "mail_viewer_database_backend", "expected": False},
+            {"db": "mailviewer", "app_label": "auth", "expected": None},
+            {"db": "default", "app_label": "auth", "expected": None},
+        ]
+        for t in test_matrix:
+            with self.subTest(db=t["db"], app_label=t["app_label"]):
+                self.assertEqual(t["expected"], self.router.allow_migrate(t["db"], t["app_label"]))
+
+    def test_custom_backend_model(self):
+        """
+        A custom MAILVIEWER_DATABASE_BACKEND_MODEL in another app is routed to the mail viewer database as well.
+        """
+        with mock.patch.object(mailviewer_settings, "MAILVIEWER_DATABASE_BACKEND_MODEL", "auth.User"):
+            self.assertEqual("mailviewer", self.router.db_for_read(User))
+            self.assertTrue(self.router.allow_migrate("mailviewer", "auth", model_name="user"))
+            self.assertFalse(self.router.allow_migrate("default", "auth", model_name="user"))
+            self.assertIsNone(self.router.allow_migrate("default", "auth", model_name="group"))
+
+    def test_database_alias_setting(self):
+        with mock.patch.object(mailviewer_settings, "MAILVIEWER_DATABASE_ALIAS", "default"):
+            self.assertEqual("default", self.router.db_for_write(EmailMessage))
+            self.assertTrue(self.router.allow_migrate("default", "mail_viewer_database_backend"))
@@ -0,0 +1,133 @@
+"""
+Test django_mail_viewer.smtp
+"""
+
+import asyncio
+import functools
+import smtplib
+import threading
+from email.message import EmailMessage as PythonEmailMessage
+from unittest import mock
+
+from django.core import mail
+from django.test import SimpleTestCase
+
+from django_mail_viewer.mailboxes import MAILBOX_HEADER
+from django_mail_viewer.smtp import ReceivedMessage, SMTPServer
+
+
+class ReceivedMessageTest(SimpleTestCase):
+    def test_addresses(self):
+        message = ReceivedMessage(
+            "bounce@example.com",
+            ["to@example.com", "CC@example.com", "hidden@example.com"],
+            b'From: "Sender" <sender@example.com>\r\nTo: to@example.com\r\nCc: Someone <cc@example.com>\r\n'
+            b"Subject: Hello\r\n\r\nBody\r\n",
+        )
+        self.assertEqual("sender@example.com", message.from_email)
+        self.assertEqual(["to@example.com"], message.to)
+        self.assertEqual(["cc@example.com"], message.cc)
+        self.assertEqual(["hidden@example.com"], message.bcc)
+
+    def test_message_adds_missing_headers(self):
+        message = ReceivedMessage("sender@example.com", ["to@example.com"], b"Subject: Hello\r\n\r\nBody\r\n")
+        self.assertEqual("sender@example.com", message.from_email)
+        m = message.message()
+        self.assertIs(m, message.message())
+        self.assertTrue(m.get("message-id"))
+        self.assertTrue(m.get("date"))
+        self.assertEqual("Body\r\n", m.get_payload())
+
+
+class SMTPServerTest(SimpleTestCase):
+    connection_backend = "django_mail_viewer.backends.locmem.EmailBackend"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.server = SMTPServer(
+            functools.partial(mail.get_connection, self.connection_backend), port=0, max_message_size=10000
+        )
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def smtp(self) -> smtplib.SMTP:
+        return smtplib.SMTP(self.server.host, self.server.port)
+
+    def test_receives_email(self):
+        message = PythonEmailMessage()
+        message["From"] = "sender@example.com"
+        message["To"] = "to@example.com"
+        message["Subject"] = "Hello"
+        message.set_content(".leading dot\nEmail text\n")
+        with self.smtp() as client:
+            client.send_message(message, to_addrs=["to@example.com", "bcc@example.com"])
+
+        with mail.get_connection(self.connection_backend) as connection:
+            outbox = connection.get_outbox()
+            self.assertEqual(["Hello"], [m.get("subject") for m in outbox])
+            self.assertEqual(".leading dot\nEmail text\n", outbox[0].get_payload())
+            self.assertEqual(1, len(connection.get_outbox(recipient="bcc@example.com")))
+
+    def test_mailbox_header(self):
+        with self.smtp() as client:
+            client.sendmail(
+                "sender@example.com",
+                ["to@example.com"],
+                f"{MAILBOX_HEADER}: tenant-a\r\nSubject: Hello\r\n\r\nEmail text\r\n",
+            )
+        with mail.get_connection(self.connection_backend, mailbox="tenant-a") as connection:
+            self.assertEqual(["Hello"], [m.get("subject") for m in connection.get_outbox()])
+        self.assertEqual([], mail.outbox)
+
+    def test_many_clients(self):
+        """
+        Test that email from clients sending at the same time is all stored, in fewer batches than emails
+        """
+
+        def send(n):
+            with self.smtp() as client:
+                for i in range(25):
+                    client.sendmail("sender@example.com", ["to@example.com"], f"Subject: {n} {i}\r\n\r\nText\r\n")
+
+        threads = [threading.Thread(target=send, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(200, len(mail.outbox))
+        self.assertEqual(200, self.server.batcher.stored)
+        self.assertLessEqual(self.server.batcher.batches, 200)
+
+    def test_errors(self):
+        with self.smtp() as client:
+            self.assertEqual(503, client.rcpt("to@example.com")[0])
+            self.assertEqual(250, client.mail("sender@example.com")[0])
+            self.assertEqual(503, client.mail("sender@example.com")[0])
+            self.assertEqual(503, client.docmd("DATA")[0])
+            self.assertEqual(500, client.docmd("BOGUS")[0])
+            client.rcpt("to@example.com")
+            self.assertEqual(552, client.data("Subject: Big\r\n\r\n" + "x" * 20000)[0])
+            # After EHLO the client says how large the message is up front
+            with self.assertRaises(smtplib.SMTPSenderRefused):
+                client.sendmail("sender@example.com", ["to@example.com"], "Subject: Big\r\n\r\n" + "x" * 20000)
+            # The connection can still be used after a message which is too large
+            client.sendmail("sender@example.com", ["to@example.com"], "Subject: Small\r\n\r\nText\r\n")
+        self.assertEqual(["Small"], [m.get("subject") for m in mail.outbox])
+
+    def test_store_error(self):
+        with mock.patch.object(self.server.batcher, "_send", side_effect=RuntimeError("Backend down")):
+            with self.assertLogs("django_mail_viewer.smtp", "ERROR") as logs, self.smtp() as client:
+                with self.assertRaises(smtplib.SMTPDataError) as e:
+                    client.sendmail("sender@example.com", ["to@example.com"], "Subject: Hello\r\n\r\nText\r\n")
+        self.assertEqual(451, e.exception.smtp_code)
+        self.assertIn("Failed to store the email from sender@example.com to to@example.com", "\n".join(logs.output))
+        self.assertIn("RuntimeError: Backend down", "\n".join(logs.output))
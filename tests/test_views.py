@@ -1,10 +1,32 @@
+import io
 import os
+import zipfile
 
-from django.core import mail
-from django.test import SimpleTestCase
+from django.conf import settings
+from django.core import cache, mail
+from django.test import SimpleTestCase, TestCase
 from django.test.utils import override_settings
 from django.urls import reverse
 
+# Backends the list and export views are tested with, each storing and filtering email its own way
+VIEW_BACKENDS = [
+    "django_mail_viewer.backends.locmem.EmailBackend",
+    "django_mail_viewer.backends.cache.EmailBackend",
+    "django_mail_viewer.backends.database.backend.EmailBackend",
+]
+
+
+def send_view_email():
+    mail.send_mail("Welcome", "Email 1 text", "a@example.com", ["to1@example.com"])
+    mail.send_mail("Invoice", "Email 2 text", "b@example.com", ["to1@example.com"])
+    mail.EmailMessage(
+        "Welcome back", "Email 3 text", "a@example.com", ["to2@example.com"], headers={"X-Campaign": "return"}
+    ).send()
+
+
+def outbox_subjects(response):
+    return [m.get("subject") for m in response.context["outbox"]]
+
 
 @override_settings(EMAIL_BACKEND="django_mail_viewer.backends.locmem.EmailBackend")
 class EmailListViewTest(SimpleTestCase):
@@ -41,12 +63,205 @@ class EmailListViewTest(SimpleTestCase):
         self.assertEqual(response.context["outbox"][0].get("subject"), "Email 1 subject")
         self.assertEqual(response.context["outbox"][1].get("subject"), "Email 2 subject")
 
+    def test_get_filtered_by_recipient(self):
+        mail.outbox = []
+        mail.send_mail("Email 1 subject", "Email 1 text", "test@example.com", ["to1@example.com"])
+        mail.send_mail("Email 2 subject", "Email 2 text", "test@example.com", ["to2@example.com"])
+
+        response = self.client.get(reverse(self.URL_NAME), {"recipient": "to2@example.com"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("to2@example.com", response.context["recipient"])
+        self.assertEqual([mail.outbox[1]], response.context["outbox"])
+
+    def test_get_filtered_by_query_params(self):
+        mail.outbox = []
+        mail.send_mail("Welcome", "Email 1 text", "a@example.com", ["to1@example.com"])
+        mail.send_mail("Invoice", "Email 2 text", "b@example.com", ["to1@example.com"])
+        mail.EmailMessage(
+            "Welcome back", "Email 3 text", "a@example.com", ["to2@example.com"], headers={"X-Campaign": "return"}
+        ).send()
+
+        response = self.client.get(reverse(self.URL_NAME), {"subject": "welcome", "from": "a@example.com"})
+        self.assertEqual([mail.outbox[0], mail.outbox[2]], response.context["outbox"])
+
+        response = self.client.get(reverse(self.URL_NAME), {"ordering": "-date", "limit": "1"})
+        self.assertEqual(1, len(response.context["outbox"]))
+
+        response = self.client.get(reverse(self.URL_NAME), {"header": "X-Campaign: return"})
+        self.assertEqual([mail.outbox[2]], response.context["outbox"])
+
+    def test_get_with_invalid_filter_ignores_it(self):
+        mail.outbox = []
+        mail.send_mail("Email 1 subject", "Email 1 text", "test@example.com", ["to1@example.com"])
+
+        response = self.client.get(reverse(self.URL_NAME), {"ordering": "subject", "subject": "nothing"})
+        self.assertEqual(200, response.status_code)
+        self.assertIn("ordering", response.context["filter_form"].errors)
+        self.assertEqual(mail.outbox, response.context["outbox"])
+
+    def test_get_switches_mailbox(self):
+        mail.outbox = []
+        mail.mailviewer_outboxes = {}
+        mail.send_mail("Default subject", "Email text", "test@example.com", ["to1@example.com"])
+        mail.EmailMessage(
+            "Tenant subject",
+            "Email text",
+            "test@example.com",
+            ["to1@example.com"],
+            headers={"X-Mailviewer-Mailbox": "tenant"},
+        ).send()
+
+        response = self.client.get(reverse(self.URL_NAME), {"mailbox": "tenant"})
+        self.assertEqual(mail.mailviewer_outboxes["tenant"], response.context["outbox"])
+        self.assertEqual("tenant", response.context["mailbox"])
+        self.assertEqual("tenant", response.cookies["mailviewer_mailbox"].value)
+
+        # The mailbox is remembered for the rest of the viewer
+        response = self.client.get(reverse(self.URL_NAME))
+        self.assertEqual(mail.mailviewer_outboxes["tenant"], response.context["outbox"])
+        lookup_id = mail.mailviewer_outboxes["tenant"][0].get("message-id").strip("<>")
+        response = self.client.get(reverse("mail_viewer_detail", args=[lookup_id]))
+        self.assertEqual(200, response.status_code)
+
+        response = self.client.get(reverse(self.URL_NAME), {"mailbox": ""})
+        self.assertEqual(mail.outbox, response.context["outbox"])
+        self.assertEqual("", response.cookies["mailviewer_mailbox"].value)
+
     def test_get_with_empty_list_has_200_response(self):
         mail.outbox = []
         response = self.client.get(reverse(self.URL_NAME))
         self.assertEqual(200, response.status_code)
 
 
+class EmailViewBackendsTest(TestCase):
+    """
+    Test the list and export views with each of VIEW_BACKENDS
+    """
+
+    databases = {"default", "mailviewer"}
+
+    def setUp(self):
+        super().setUp()
+        mail.outbox = []
+        cache.caches[settings.MAILVIEWER_CACHE].clear()
+
+    def test_list_filters(self):
+        url = reverse("mail_viewer_list")
+        for backend in VIEW_BACKENDS:
+            with self.subTest(backend=backend), override_settings(EMAIL_BACKEND=backend):
+                send_view_email()
+
+                response = self.client.get(url)
+                self.assertEqual(200, response.status_code)
+                self.assertEqual(["Welcome", "Invoice", "Welcome back"], outbox_subjects(response))
+
+                response = self.client.get(url, {"recipient": "to1@example.com"})
+                self.assertEqual("to1@example.com", response.context["recipient"])
+                self.assertEqual(["Welcome", "Invoice"], outbox_subjects(response))
+
+                response = self.client.get(url, {"subject": "welcome", "from": "a@example.com"})
+                self.assertEqual(["Welcome", "Welcome back"], outbox_subjects(response))
+
+                response = self.client.get(url, {"ordering": "-date", "limit": "1"})
+                self.assertEqual(1, len(response.context["outbox"]))
+
+                response = self.client.get(url, {"header": "X-Campaign: return"})
+                self.assertEqual(["Welcome back"], outbox_subjects(response))
+
+                response = self.client.get(url, {"ordering": "subject", "subject": "nothing"})
+                self.assertIn("ordering", response.context["filter_form"].errors)
+                self.assertEqual(3, len(response.context["outbox"]))
+
+    def test_export(self):
+        url = reverse("mail_viewer_export")
+        for backend in VIEW_BACKENDS:
+            with self.subTest(backend=backend), override_settings(EMAIL_BACKEND=backend):
+                send_view_email()
+
+                response = self.client.get(url, {"from": "b@example.com"})
+                self.assertEqual(200, response.status_code)
+                content = b"".join(response.streaming_content)
+                self.assertTrue(content.startswith(b"From b@example.com "))
+                # The database backend keeps header names lower cased
+                self.assertIn(b"subject: invoice", content.lower())
+                self.assertNotIn(b"subject: welcome", content.lower())
+
+                message_id = mail.get_connection().get_outbox(subject="invoice")[0].get("message-id").strip("<>")
+                response = self.client.get(url, {"format": "zip", "message_id": message_id})
+                with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+                    self.assertEqual(["000001-invoice.eml"], archive.namelist())
+
+                self.assertEqual(400, self.client.get(url, {"since": "not a date"}).status_code)
+
+
+@override_settings(EMAIL_BACKEND="django_mail_viewer.backends.locmem.EmailBackend")
+class EmailThreadViewTest(SimpleTestCase):
+    URL_NAME = "mail_viewer_thread"
+
+    def setUp(self, *args, **kwargs):
+        super().setUp(*args, **kwargs)
+        mail.outbox = []
+
+    def test_get_returns_thread(self):
+        mail.EmailMessage(
+            "Start",
+            "Text",
+            "a@example.com",
+            ["b@example.com"],
+            headers={"Message-ID": "<start@x>", "Date": "Mon, 01 Jan 2024 10:00:00 -0000"},
+        ).send()
+        mail.send_mail("Other", "Text", "a@example.com", ["b@example.com"])
+        mail.EmailMessage(
+            "Re: Start",
+            "Text",
+            "b@example.com",
+            ["a@example.com"],
+            headers={"In-Reply-To": "<start@x>", "Date": "Mon, 01 Jan 2024 11:00:00 -0000"},
+        ).send()
+
+        response = self.client.get(reverse(self.URL_NAME, args=["start@x"]))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([mail.outbox[0], mail.outbox[2]], response.context["outbox"])
+        self.assertContains(response, reverse("mail_viewer_list"))
+
+    def test_get_missing_message_is_404(self):
+        response = self.client.get(reverse(self.URL_NAME, args=["missing@x"]))
+        self.assertEqual(404, response.status_code)
+
+
+@override_settings(EMAIL_BACKEND="django_mail_viewer.backends.locmem.EmailBackend")
+class EmailExportViewTest(SimpleTestCase):
+    URL_NAME = "mail_viewer_export"
+
+    def setUp(self):
+        mail.outbox = []
+        mail.send_mail("Welcome", "Email 1 text", "a@example.com", ["to1@example.com"])
+        mail.send_mail("Invoice", "Email 2 text", "b@example.com", ["to1@example.com"])
+
+    def test_get_streams_mbox(self):
+        response = self.client.get(reverse(self.URL_NAME), {"from": "b@example.com"})
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual("application/mbox", response["Content-Type"])
+        self.assertEqual('attachment; filename="mail-viewer-export.mbox"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content)
+        self.assertTrue(content.startswith(b"From b@example.com "))
+        self.assertIn(b"Subject: Invoice", content)
+        self.assertNotIn(b"Subject: Welcome", content)
+
+    def test_get_streams_selected_messages_as_zip(self):
+        message_id = mail.outbox[0].get("message-id").strip("<>")
+        response = self.client.get(reverse(self.URL_NAME), {"format": "zip", "message_id": message_id})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/zip", response["Content-Type"])
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(["000001-welcome.eml"], archive.namelist())
+
+    def test_get_with_invalid_format_or_filter(self):
+        self.assertEqual(400, self.client.get(reverse(self.URL_NAME), {"format": "pdf"}).status_code)
+        self.assertEqual(400, self.client.get(reverse(self.URL_NAME), {"since": "not a date"}).status_code)
+
+
 @override_settings(EMAIL_BACKEND="django_mail_viewer.backends.locmem.EmailBackend")
 class EmailDetailViewTest(SimpleTestCase):
     URL_NAME = "mail_viewer_detail"